@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    name = 'AutoServiceAdmin'
+    label = 'metrics'
+    verbose_name = 'Метрики'
+
+    def ready(self):
+        from . import metrics
+
+        metrics.connect_signals()
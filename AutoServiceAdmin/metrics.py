@@ -0,0 +1,302 @@
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+
+# Метрики: {название: (тип, описание)}
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Время обработки запроса по имени URL.'),
+    'http_requests_total': ('counter', 'Кол-во запросов по имени URL, методу и коду ответа.'),
+    'http_request_db_queries_total': ('counter', 'Кол-во запросов к базе данных по имени URL.'),
+    'statistics_cache_hits_total': ('counter', 'Кол-во чтений статистики из кэша.'),
+    'statistics_cache_misses_total': ('counter', 'Кол-во вычислений статистики при промахе кэша.'),
+    'statistics_cache_hit_ratio': ('gauge', 'Доля чтений статистики из кэша.'),
+    'mail_send_duration_seconds': ('histogram', 'Время отправки письма по виду письма.'),
+    'mail_send_failures_total': ('counter', 'Кол-во писем, которые не удалось отправить.'),
+    'mail_queue_depth': ('gauge', 'Кол-во писем, ожидающих отправки.'),
+    'product_sales_total': ('counter', 'Кол-во продаж через Product.sell().'),
+    'product_sold_quantity_total': ('counter', 'Кол-во товаров, проданных через Product.sell().'),
+}
+
+pending_samples = ContextVar('metrics_pending_samples', default=None)
+
+
+def labels_key(labels):
+    return json.dumps(sorted(labels.items()), ensure_ascii=False)
+
+
+class MetricsStore:
+    """
+    Значения метрик в общем файле SQLite: каждый процесс прибавляет свои изменения
+    к общим значениям (INSERT ... ON CONFLICT DO UPDATE), поэтому /metrics в любом
+    из процессов WSGI-сервера отдает итоги всех процессов.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS samples ('
+                'name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, '
+                'PRIMARY KEY (name, labels))'
+            )
+            self._local.connection = connection
+        return connection
+
+    def add(self, samples):
+        """
+        Прибавляет изменения samples - список (название, метки, изменение) -
+        одной транзакцией
+        """
+
+        if not samples:
+            return
+
+        rows = [(name, labels_key(labels), value) for name, labels, value in samples]
+        connection = self.connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                rows
+            )
+
+    def samples(self):
+        rows = self.connection.execute('SELECT name, labels, value FROM samples ORDER BY name, labels')
+        return [(name, dict(json.loads(labels)), value) for name, labels, value in rows]
+
+    def clear(self):
+        self.connection.execute('DELETE FROM samples')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Хранилище метрик из настройки METRICS_PATH или None, если метрики выключены
+    """
+
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        return None
+
+    path = str(settings.METRICS_PATH)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = MetricsStore(path)
+        return _stores[path]
+
+
+def record(samples, defer=True):
+    """
+    Записывает изменения метрик. Во время запроса изменения копятся
+    и записываются одной транзакцией в конце запроса (см. MetricsMiddleware),
+    если не указано defer=False.
+    Ошибка записи метрик не прерывает работу приложения.
+    """
+
+    pending = pending_samples.get()
+    if defer and pending is not None:
+        pending.extend(samples)
+        return
+
+    store = get_store()
+    if store is None:
+        return
+
+    try:
+        store.add(samples)
+    except sqlite3.Error:
+        logger.exception('Не удалось записать метрики')
+
+
+def inc(name, value=1, defer=True, **labels):
+    record([(name, labels, value)], defer)
+
+
+def histogram_samples(name, value, **labels):
+    """
+    Изменения гистограммы при наблюдении value: накопительные корзины, сумма и кол-во.
+    Корзины меньше value получают нулевое изменение, чтобы в выводе были все корзины.
+    """
+
+    samples = [
+        (f'{name}_bucket', {**labels, 'le': str(bucket)}, int(value <= bucket))
+        for bucket in BUCKETS
+    ]
+    samples.append((f'{name}_bucket', {**labels, 'le': '+Inf'}, 1))
+    samples.append((f'{name}_sum', labels, value))
+    samples.append((f'{name}_count', labels, 1))
+    return samples
+
+
+def track_mail(kind, send):
+    """
+    Оборачивает отправку письма send: пока письмо не отправлено, оно учитывается
+    в mail_queue_depth, после отправки записывается ее время
+    """
+
+    # Письмо отправляется в отдельном потоке и может уйти раньше, чем закончится запрос,
+    # поэтому очередь увеличивается сразу, а не в конце запроса
+    inc('mail_queue_depth', defer=False, kind=kind)
+
+    def process():
+        start = time.perf_counter()
+        try:
+            return send()
+        except Exception:
+            inc('mail_send_failures_total', kind=kind)
+            raise
+        finally:
+            record([
+                ('mail_queue_depth', {'kind': kind}, -1),
+                *histogram_samples('mail_send_duration_seconds', time.perf_counter() - start, kind=kind),
+            ])
+
+    return process
+
+
+def count_statistics_cache_read(sender, hit, **kwargs):
+    inc('statistics_cache_hits_total' if hit else 'statistics_cache_misses_total')
+
+
+def count_product_sale(sender, quantity, **kwargs):
+    record([('product_sales_total', {}, 1), ('product_sold_quantity_total', {}, quantity)])
+
+
+def connect_signals():
+    """
+    Подписывает метрики на сигналы приложений (см. showroom/events.py).
+    Вызывается из MetricsConfig.ready().
+    """
+
+    from showroom import events
+
+    events.statistics_cache_read.connect(count_statistics_cache_read, dispatch_uid='metrics_statistics_cache')
+    events.product_sold.connect(count_product_sale, dispatch_uid='metrics_product_sold')
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_sample(name, labels, value):
+    if labels:
+        labels = ','.join(f'{key}="{escape(value)}"' for key, value in labels.items())
+        name = f'{name}{{{labels}}}'
+    if float(value).is_integer():
+        return f'{name} {int(value)}'
+    return f'{name} {value!r}'
+
+
+def family(name):
+    for suffix in HISTOGRAM_SUFFIXES:
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return name
+
+
+def sample_order(sample):
+    """
+    Порядок строк семейства: по меткам, затем корзины гистограммы по возрастанию, сумма и кол-во
+    """
+
+    name, labels, _ = sample
+    suffix = name[len(family(name)):]
+    le = labels.get('le')
+    return (
+        sorted((key, value) for key, value in labels.items() if key != 'le'),
+        HISTOGRAM_SUFFIXES.index(suffix) if suffix else 0,
+        math.inf if le == '+Inf' else float(le or 0),
+    )
+
+
+def render(samples):
+    """
+    Метрики в текстовом формате Prometheus
+    """
+
+    hits = sum(value for name, _, value in samples if name == 'statistics_cache_hits_total')
+    misses = sum(value for name, _, value in samples if name == 'statistics_cache_misses_total')
+    samples = samples + [('statistics_cache_hit_ratio', {}, hits / (hits + misses) if hits + misses else 0)]
+
+    families = {}
+    for sample in samples:
+        families.setdefault(family(sample[0]), []).append(sample)
+
+    lines = []
+    for name, (metric_type, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for sample in sorted(families.get(name, []), key=sample_order):
+            lines.append(format_sample(*sample))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Время обработки, код ответа и кол-во запросов к базе данных каждого запроса
+    по имени URL (statistics_list, showroom_detail, ...).
+    Изменения метрик за запрос записываются одной транзакцией.
+    Включается настройкой METRICS_ENABLED, иначе Django исключает промежуточный слой при запуске.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        samples = []
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        token = pending_samples.set(samples)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count_query))
+                response = self.get_response(request)
+        finally:
+            pending_samples.reset(token)
+
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        url_name = match.view_name if match else 'unmatched'
+
+        samples += histogram_samples('http_request_duration_seconds', duration, url_name=url_name)
+        samples.append(('http_requests_total', {
+            'url_name': url_name,
+            'method': request.method,
+            'status': str(response.status_code),
+        }, 1))
+        samples.append(('http_request_db_queries_total', {'url_name': url_name}, queries))
+        record(samples)
+        return response
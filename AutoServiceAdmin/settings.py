@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'crispy_forms',
     'crispy_bootstrap4',
     'django_tables2',
+    'AutoServiceAdmin.apps.MetricsConfig',
     'account',
     'showroom'
 ]
@@ -56,6 +57,9 @@ INSTALLED_APPS = [
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    'showroom.profiling.ServerTimingMiddleware',
+    'showroom.profiling.SlowQueryMiddleware',
+    'AutoServiceAdmin.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -164,3 +168,52 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 PHONENUMBER_DEFAULT_REGION = 'RU'
+
+# Способ расчета себестоимости проданного товара: fifo или average (см. showroom/costing.py)
+SHOWROOM_COSTING_METHOD = config.get('STATISTICS', 'COSTING_METHOD', fallback='fifo')
+
+# Заголовок Server-Timing и журнал времени этапов каждого запроса (см. showroom/profiling.py).
+# Заголовок виден клиентам, поэтому на открытых серверах включать только на время разбора.
+SHOWROOM_SERVER_TIMING = config.getboolean('PROFILING', 'SERVER_TIMING', fallback=False)
+
+# Порог медленного запроса к базе данных в миллисекундах (0 - журнал выключен)
+# и файл журнала медленных запросов с планами выполнения (см. showroom/profiling.py)
+SHOWROOM_SLOW_QUERY_MS = config.getfloat('PROFILING', 'SLOW_QUERY_MS', fallback=0)
+SHOWROOM_SLOW_QUERY_LOG = config.get('PROFILING', 'SLOW_QUERY_LOG', fallback=str(BASE_DIR / 'slow_queries.log'))
+
+# Метрики для Prometheus на /metrics (см. AutoServiceAdmin/metrics.py).
+# Файл METRICS_PATH общий для всех процессов WSGI-сервера одной установки.
+METRICS_ENABLED = config.getboolean('METRICS', 'ENABLED', fallback=False)
+METRICS_PATH = config.get('METRICS', 'PATH', fallback=str(BASE_DIR / 'metrics.sqlite3'))
+# Токен, с которым Prometheus собирает метрики: заголовок "Authorization: Bearer <токен>"
+# (bearer_token в настройках scrape_config). Пустой токен - только сессия сотрудника.
+METRICS_TOKEN = config.get('METRICS', 'TOKEN', fallback='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SHOWROOM_SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'showroom.profiling': {
+            'handlers': ['console'],
+            'level': 'DEBUG' if SHOWROOM_SERVER_TIMING else 'INFO',
+        },
+        'showroom.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
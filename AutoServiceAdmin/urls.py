@@ -22,5 +22,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('account/', include('account.urls')),
     path('showrooms/', include('showroom.urls')),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
     path('', views.IndexView.as_view(), name='index')
 ]
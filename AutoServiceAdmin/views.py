@@ -1,5 +1,11 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
 from django.views.generic import TemplateView
 
+from . import metrics
+
 
 class IndexView(TemplateView):
     """
@@ -7,3 +13,44 @@ class IndexView(TemplateView):
     """
 
     template_name = 'index.html'
+
+
+class MetricsView(View):
+    """
+    Метрики в текстовом формате Prometheus для сотрудников сервиса.
+    Кроме сессии принимается заголовок "Authorization: Bearer <токен>"
+    с токеном METRICS_TOKEN, чтобы Prometheus мог собирать метрики без входа на сайт.
+    Токен сравнивается за постоянное время и без хэширования пароля на каждый сбор.
+    """
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def has_access(self, request):
+        """
+        None - нет авторизации, False - нет прав, True - доступ разрешен
+        """
+
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer':
+            expected = getattr(settings, 'METRICS_TOKEN', '')
+            return bool(expected and constant_time_compare(token.strip(), expected)) or None
+
+        if not request.user.is_authenticated:
+            return None
+        return request.user.is_staff
+
+    def get(self, request):
+        access = self.has_access(request)
+        if access is None:
+            response = HttpResponse('Требуется авторизация.', status=401, content_type=self.content_type)
+            response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+            return response
+
+        if not access:
+            return HttpResponse('Метрики доступны только сотрудникам сервиса.', status=403)
+
+        store = metrics.get_store()
+        if store is None:
+            return HttpResponse('Метрики выключены (METRICS_ENABLED).', status=404)
+
+        return HttpResponse(metrics.render(store.samples()), content_type=self.content_type)
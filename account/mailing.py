@@ -5,6 +5,8 @@ from django.contrib.sites.shortcuts import get_current_site
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 
+from AutoServiceAdmin import metrics
+
 USER_MODEL = get_user_model()
 
 
@@ -53,7 +55,7 @@ class Mailing:
                 from_email=None
             )
 
-        return cls.to_thread(process, ())
+        return cls.to_thread(metrics.track_mail('email_verification', process), ())
 
     @classmethod
     def authentication_mail(cls, request):
@@ -83,7 +85,7 @@ class Mailing:
                 from_email=None
             )
 
-        return cls.to_thread(process, ())
+        return cls.to_thread(metrics.track_mail('authentication', process), ())
 
 
 mailing = Mailing
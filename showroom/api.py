@@ -0,0 +1,309 @@
+import json
+from uuid import UUID
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from . import models, services
+from .conditional import ShowroomConditionalMixin
+from .views import StatisticsPeriodMixin, statistics_models
+
+
+def json_error(status, *messages):
+    return JsonResponse({'errors': list(messages)}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ShowroomAPIView(View):
+    """
+    Базовое представление JSON API кассовых терминалов.
+    Автосалон определяется по API-токену из заголовка "Authorization: Token <токен>",
+    сессии, шаблоны и формы не используются.
+    """
+
+    showroom = None
+    showroom_fields = [
+        'pk',
+        'slug',
+        'version',
+        'date_modified',
+        'statistics_generation',
+        'statistics_modified',
+    ]
+
+    def dispatch(self, request, *args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme != 'Token' or not token:
+            return json_error(401, 'Укажите API-токен автосалона в заголовке Authorization.')
+
+        self.showroom = models.Showroom.objects.filter(
+            api_token_hash=models.Showroom.hash_api_token(token.strip())
+        ).only(*self.showroom_fields).first()
+
+        if self.showroom is None:
+            return json_error(401, 'Неверный API-токен.')
+
+        return super().dispatch(request, *args, **kwargs)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = json_error(405, 'Метод не поддерживается.')
+        response['Allow'] = ', '.join(method.upper() for method in self._allowed_methods())
+        return response
+
+    def json_body(self):
+        try:
+            return json.loads(self.request.body)
+        except (ValueError, UnicodeDecodeError):
+            raise ValidationError('Тело запроса должно быть корректным JSON.')
+
+
+class ProductStockAPIView(ShowroomAPIView):
+    """
+    Остатки и цены товаров автосалона.
+    Параметры slug (можно указать несколько раз) ограничивают выборку указанными товарами.
+    """
+
+    fields = ['slug', 'title', 'price', 'quantity', 'version']
+
+    def get(self, request, *args, **kwargs):
+        products = models.Product.objects.filter(showroom=self.showroom).order_by('pk')
+
+        slugs = request.GET.getlist('slug')
+        if slugs:
+            try:
+                products = products.filter(slug__in=slugs)
+            except ValidationError:
+                return json_error(400, 'Некорректная ссылка на товар.')
+
+        return JsonResponse({'products': list(products.values(*self.fields))}, json_dumps_params={'ensure_ascii': False})
+
+
+class SaleAPIView(ShowroomAPIView):
+    """
+    Оформление продажи:
+    {"employee": ссылка на сотрудника или null, "lines": [{"product": ссылка на товар, "quantity": кол-во}]}
+
+    Терминал может отправить несколько накопленных продаж одним запросом:
+    {"sales": [продажа, ...]}. Пакет оформляется одной транзакцией (см. services.checkout_many),
+    ответ содержит результат каждой продажи в том же порядке.
+    """
+
+    max_batch_size = 500
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = self.json_body()
+            if not isinstance(data, dict):
+                raise ValidationError('Ожидается JSON-объект.')
+
+            if 'sales' in data:
+                return self.post_many(data['sales'])
+
+            cart, employee = sale_cart(
+                data,
+                product_ids(self.showroom, [data]),
+                sale_employees(self.showroom, [data])
+            )
+            sale = services.checkout(self.showroom, cart, employee=employee)
+
+        except ValidationError as error:
+            return json_error(400, *error.messages)
+
+        except models.ConcurrentUpdateError as error:
+            return json_error(409, str(error))
+
+        return JsonResponse(sale_result(sale), status=201)
+
+    def post_many(self, sales):
+        if not isinstance(sales, list) or not sales:
+            raise ValidationError('Укажите продажи (sales).')
+
+        if len(sales) > self.max_batch_size:
+            raise ValidationError(f'В одном запросе можно передать не больше {self.max_batch_size} продаж.')
+
+        products = product_ids(self.showroom, sales)
+        employees = sale_employees(self.showroom, sales)
+        carts = []
+        errors = {}
+        for index, data in enumerate(sales):
+            try:
+                carts.append(sale_cart(data, products, employees))
+            except ValidationError as error:
+                errors[index] = error
+                carts.append(([], None))
+
+        results = services.checkout_many(self.showroom, carts)
+        return JsonResponse({
+            'sales': [
+                {'errors': errors.get(index, result).messages}
+                if index in errors or isinstance(result, ValidationError)
+                else sale_result(result)
+                for index, result in enumerate(results)
+            ]
+        }, json_dumps_params={'ensure_ascii': False})
+
+
+def sale_result(sale):
+    return {'sale': sale.slug, 'date_created': sale.date_created}
+
+
+def sale_slugs(lines):
+    try:
+        requested = [(UUID(str(line['product'])), line['quantity']) for line in lines]
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError('Каждая строка продажи должна содержать ссылку на товар product и целое кол-во quantity.')
+
+    return [(slug, line_quantity(quantity)) for slug, quantity in requested]
+
+
+def line_quantity(value):
+    """
+    Кол-во товара строки продажи: целое число больше нуля
+    или строка с таким числом. Дробное кол-во не округляется, а отклоняется.
+    """
+
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValidationError('Кол-во товара должно быть целым числом.')
+
+    quantity = services.parse_count(value, 'Кол-во товара')
+    if not quantity:
+        raise ValidationError('Кол-во товара должно быть больше нуля.')
+    return quantity
+
+
+def parse_slug(value):
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def product_ids(showroom, sales):
+    """
+    Первичные ключи товаров всех продаж запроса {ссылка: id} - одним запросом.
+    Некорректные строки пропускаются, ошибки о них выдает sale_cart().
+    """
+
+    slugs = set()
+    for data in sales:
+        try:
+            slugs.update(slug for slug, _ in sale_slugs(data.get('lines') or []))
+        except (ValidationError, AttributeError):
+            continue
+
+    return dict(
+        models.Product.objects.filter(showroom=showroom, slug__in=slugs).values_list('slug', 'pk')
+    )
+
+
+def sale_employees(showroom, sales):
+    """
+    Сотрудники всех продаж запроса {ссылка: сотрудник} - одним запросом.
+    Некорректные ссылки пропускаются, ошибки о них выдает sale_cart().
+    """
+
+    slugs = set()
+    for data in sales:
+        if isinstance(data, dict) and data.get('employee'):
+            slugs.add(parse_slug(data['employee']))
+    slugs.discard(None)
+
+    if not slugs:
+        return {}
+
+    employees = models.Employee.objects.filter(showroom=showroom, slug__in=slugs).only('pk', 'slug')
+    return {employee.slug: employee for employee in employees}
+
+
+def sale_cart(data, products, employees):
+    """
+    Корзина [(id товара, кол-во)] и сотрудник продажи из запроса.
+    products - {ссылка на товар: id} (см. product_ids),
+    employees - {ссылка на сотрудника: сотрудник} (см. sale_employees).
+    """
+
+    if not isinstance(data, dict):
+        raise ValidationError('Продажа должна быть JSON-объектом.')
+
+    lines = data.get('lines')
+    if not isinstance(lines, list) or not lines:
+        raise ValidationError('Укажите строки продажи (lines).')
+
+    requested = sale_slugs(lines)
+    missing = sorted(str(slug) for slug, _ in requested if slug not in products)
+    if missing:
+        raise ValidationError(f'Товары не найдены в автосалоне: {", ".join(missing)}.')
+
+    cart = [(products[slug], quantity) for slug, quantity in requested]
+    return cart, sale_employee(data.get('employee'), employees)
+
+
+def sale_employee(slug, employees):
+    if not slug:
+        return None
+
+    employee = employees.get(parse_slug(slug))
+    if employee is None:
+        raise ValidationError('Сотрудник не найден в автосалоне.')
+    return employee
+
+
+class StatisticsAPIView(ShowroomConditionalMixin, StatisticsPeriodMixin, ShowroomAPIView):
+    """
+    Статистика в JSON без форматирования и шаблонов (для внешних систем отчетности).
+    Период задается теми же GET-параметрами, что и на страницах статистики.
+    Ответ поддерживает условные запросы: пока данные автосалона не менялись,
+    повторный запрос с If-None-Match или If-Modified-Since получает 304
+    без вычисления статистики.
+
+    По умолчанию отдает статистику автосалона за период,
+    наследники переопределяют get_statistics().
+    """
+
+    def get(self, request, *args, **kwargs):
+        if str(self.showroom.slug) != str(self.kwargs.get('showroom_slug')):
+            return json_error(404, 'Автосалон не найден.')
+
+        if self.period_form.is_bound and not self.period_form.is_valid():
+            messages = [message for errors in self.period_form.errors.values() for message in errors]
+            return json_error(400, *messages)
+
+        return self.conditional_response(self.showroom, self.render_statistics)
+
+    def get_statistics(self):
+        return self.showroom.statistics(**self.period)
+
+    def render_statistics(self):
+        try:
+            statistics = self.get_statistics()
+        except ObjectDoesNotExist:
+            return json_error(404, 'Объект не найден.')
+
+        return JsonResponse({'statistics': statistics}, json_dumps_params={'ensure_ascii': False})
+
+    def get_model(self):
+        model = statistics_models.get(self.kwargs.get('model_name'))
+        if not model:
+            raise ObjectDoesNotExist
+        return model
+
+
+class ShowroomStatisticsAPIView(StatisticsAPIView):
+    pass
+
+
+class SectionStatisticsAPIView(StatisticsAPIView):
+    def get_statistics(self):
+        queryset = self.get_model().objects.filter(showroom=self.showroom)
+        return queryset.statistics(showroom=self.showroom, **self.period)
+
+
+class ObjectStatisticsAPIView(StatisticsAPIView):
+    def get_statistics(self):
+        try:
+            model_object = self.get_model().objects.get(slug=self.kwargs.get('object_slug'), showroom=self.showroom)
+        except ValidationError:
+            raise ObjectDoesNotExist
+        return model_object.statistics(**self.period)
@@ -5,3 +5,6 @@ class ShowroomConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'showroom'
     verbose_name = 'Автосалоны'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,356 @@
+import json
+import platform
+import random
+import subprocess
+import time
+from contextlib import nullcontext
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, models as db_models, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import dataset, models, services
+from .caching import statistics_cache
+
+
+def dataset_showroom(sale_items, seed=0):
+    """
+    Автосалон набора данных seed (см. dataset.generate_dataset()) с sale_items строками продаж.
+    Вызывается внутри транзакции, которая откатывается после замера,
+    поэтому набор данных seed не должен быть создан заранее.
+    """
+
+    showroom, = dataset.generate_dataset(sale_items, seed=seed, write=lambda message: None)
+    return showroom
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def benchmark_statistics(sizes, repeat=5, seed=0, write=print):
+    """
+    Замеряет время вычисления статистики для автосалонов разного размера.
+    Данные создаются внутри транзакции и откатываются после замера.
+    """
+
+    statistics_querysets = {
+        'showroom': lambda showroom: models.Showroom.objects.filter(pk=showroom.pk),
+        'employees': lambda showroom: models.Employee.objects.filter(showroom=showroom),
+        'products': lambda showroom: models.Product.objects.filter(showroom=showroom),
+        'dealers': lambda showroom: models.Dealer.objects.filter(showroom=showroom),
+        'categories': lambda showroom: models.ProductCategory.objects.filter(showroom=showroom),
+    }
+
+    write(f"{'sale items':>12} {'section':>12} {'min, ms':>10} {'avg, ms':>10}")
+
+    for size in sizes:
+        with transaction.atomic():
+            showroom = dataset_showroom(size, seed=seed)
+
+            for name, get_queryset in statistics_querysets.items():
+                queryset = get_queryset(showroom)
+                timings = measure(queryset.statistics, repeat)
+                write(
+                    f'{size:>12} {name:>12} '
+                    f'{min(timings) * 1000:>10.1f} {sum(timings) / len(timings) * 1000:>10.1f}'
+                )
+
+            transaction.set_rollback(True)
+
+
+def benchmark_checkout(sales, lines=(1, 5, 20), seed=0, write=print):
+    """
+    Замеряет пропускную способность оформления продаж (services.checkout)
+    для корзин разного размера. Данные откатываются после замера.
+    """
+
+    rnd = random.Random(seed)
+    write(f"{'lines':>8} {'sales':>8} {'sales/s':>10} {'ms/sale':>10}")
+
+    for line_count in lines:
+        with transaction.atomic():
+            showroom = dataset_showroom(max(line_count * 100, 1000), seed=seed)
+            products = list(models.Product.objects.filter(showroom=showroom).values_list('pk', flat=True))
+            models.Product.objects.filter(showroom=showroom).update(quantity=sales * line_count)
+
+            def sell():
+                cart = [(product_id, 1) for product_id in rnd.sample(products, line_count)]
+                services.checkout(showroom, cart)
+
+            elapsed = sum(measure(sell, sales))
+            write(
+                f'{line_count:>8} {sales:>8} '
+                f'{sales / elapsed:>10.1f} {elapsed / sales * 1000:>10.2f}'
+            )
+
+            transaction.set_rollback(True)
+
+
+def benchmark_api(sales, lines=(1, 5, 20), batch=1, seed=0, write=print):
+    """
+    Замеряет пропускную способность JSON API продаж (api/sales/) вместе с разбором
+    запроса и промежуточными слоями Django. При batch > 1 терминал отправляет
+    продажи пакетами по batch штук. Данные откатываются после замера.
+    """
+
+    rnd = random.Random(seed)
+    client = Client()
+    write(f"{'lines':>8} {'batch':>8} {'sales':>8} {'sales/s':>10} {'ms/sale':>10}")
+
+    for line_count in lines:
+        with transaction.atomic():
+            showroom = dataset_showroom(max(line_count * 100, 1000), seed=seed)
+            token = showroom.issue_api_token()
+            products = [
+                str(slug) for slug in models.Product.objects.filter(showroom=showroom).values_list('slug', flat=True)
+            ]
+            models.Product.objects.filter(showroom=showroom).update(quantity=sales * line_count)
+
+            def sale():
+                return {'lines': [{'product': slug, 'quantity': 1} for slug in rnd.sample(products, line_count)]}
+
+            def post():
+                body = sale() if batch == 1 else {'sales': [sale() for _ in range(batch)]}
+                response = client.post(
+                    reverse('api_sales'),
+                    json.dumps(body),
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=f'Token {token}'
+                )
+                if response.status_code not in (200, 201):
+                    raise RuntimeError(response.content.decode())
+
+            requests = max(sales // batch, 1)
+            elapsed = sum(measure(post, requests))
+            sold = requests * batch
+            write(
+                f'{line_count:>8} {batch:>8} {sold:>8} '
+                f'{sold / elapsed:>10.1f} {elapsed / sold * 1000:>10.2f}'
+            )
+
+            transaction.set_rollback(True)
+
+
+def percentile(values, fraction):
+    """
+    Перцентиль с линейной интерполяцией между соседними значениями
+    """
+
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(timings, queries):
+    """
+    Итоги замера: перцентили времени в миллисекундах и кол-во запросов к базе данных
+    """
+
+    timings = [timing * 1000 for timing in timings]
+    return {
+        'runs': len(timings),
+        'queries': max(queries),
+        'min_ms': round(min(timings), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def measure_case(func, repeat, warmup=1, cold=True):
+    """
+    Выполняет func warmup раз без замера, затем repeat раз с замером времени
+    и кол-ва запросов. Замер идет в собственном пространстве ключей кэша статистики
+    (StatisticsCache.isolated()), при cold - в новом перед каждым выполнением,
+    поэтому замеряется вычисление статистики, а не чтение из кэша.
+    """
+
+    timings = []
+    queries = []
+    with statistics_cache.isolated():
+        for attempt in range(warmup + repeat):
+            with statistics_cache.isolated() if cold else nullcontext():
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    func()
+                    elapsed = time.perf_counter() - start
+
+            if attempt >= warmup:
+                timings.append(elapsed)
+                queries.append(len(context.captured_queries))
+
+    return summarize(timings, queries)
+
+
+def suite_cases(showroom, client):
+    """
+    Замеряемые операции над автосалоном: {название: функция}.
+    Продажа Product.sell() изменяет данные, поэтому идет последней.
+    """
+
+    from .views import statistics_models
+
+    def page(name, **kwargs):
+        url = reverse(name, kwargs={'showroom_slug': showroom.slug, **kwargs})
+
+        def get():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url}: {response.status_code}')
+            if response.streaming:
+                b''.join(response.streaming_content)
+
+        return get
+
+    cases = {'view:showroom_detail': page('showroom_detail')}
+
+    for model_name, model in statistics_models.items():
+        cases[f'view:statistics_list:{model_name}'] = page('statistics_list', model_name=model_name)
+        cases[f'view:statistics_stat:{model_name}'] = page('statistics_stat', model_name=model_name)
+
+        # Объект раздела выбирается детерминированно - первый по первичному ключу
+        instance = model.objects.filter(showroom=showroom).order_by('pk').first()
+        if instance is not None:
+            cases[f'view:statistics_detail:{model_name}'] = page(
+                'statistics_detail',
+                model_name=model_name,
+                object_slug=instance.slug
+            )
+
+    cases['statistics:showroom'] = showroom.statistics
+    for model_name, model in statistics_models.items():
+        queryset = model.objects.filter(showroom=showroom)
+        cases[f'statistics:{model_name}'] = queryset.statistics
+
+    product = models.Product.objects.filter(showroom=showroom).order_by('pk').first()
+    cases['model:product_sell'] = lambda: product.sell(1)
+    return cases
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(showroom, repeat=20, warmup=1, cold=True, write=print):
+    """
+    Замеряет страницы автосалона, вычисление статистики разделов и продажу товара
+    на наборе данных автосалона showroom. Продажи откатываются после замера.
+    Возвращает результаты в виде словаря, пригодного для записи в JSON
+    и сравнения с результатами другого коммита (compare_results()).
+    """
+
+    client = Client()
+    client.force_login(showroom.owner)
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'date': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'showroom': str(showroom.slug),
+            'sale_items': models.ProductSaleItem.objects.filter(sale__showroom=showroom).count(),
+            'repeat': repeat,
+            'warmup': warmup,
+            'cold': cold,
+        },
+        'cases': {},
+    }
+
+    write(f"{'case':<40} {'queries':>8} {'p50, ms':>10} {'p95, ms':>10} {'p99, ms':>10}")
+
+    with transaction.atomic():
+        # Продажа должна быть возможна при каждом повторе
+        models.Product.objects.filter(showroom=showroom).update(quantity=db_models.F('quantity') + warmup + repeat)
+
+        for name, func in suite_cases(showroom, client).items():
+            result = measure_case(func, repeat, warmup, cold)
+            results['cases'][name] = result
+            write(
+                f"{name:<40} {result['queries']:>8} "
+                f"{result['p50_ms']:>10.1f} {result['p95_ms']:>10.1f} {result['p99_ms']:>10.1f}"
+            )
+
+        transaction.set_rollback(True)
+
+    return results
+
+
+def compare_results(base, current, threshold=0.1, metric='p50_ms'):
+    """
+    Сравнивает результаты двух запусков run_suite().
+    Операция считается замедлившейся, если выросло кол-во запросов
+    или значение metric выросло больше чем на threshold (доля).
+    Возвращает список строк (операция, было, стало, изменение, запросов было, стало, статус).
+    """
+
+    rows = []
+    for name in sorted(set(base['cases']) | set(current['cases'])):
+        before = base['cases'].get(name)
+        after = current['cases'].get(name)
+        if before is None:
+            rows.append((name, None, after[metric], None, None, after['queries'], 'added'))
+            continue
+        if after is None:
+            rows.append((name, before[metric], None, None, before['queries'], None, 'removed'))
+            continue
+
+        change = (after[metric] - before[metric]) / before[metric] if before[metric] else 0
+        if after['queries'] > before['queries'] or change > threshold:
+            status = 'slower'
+        elif after['queries'] < before['queries'] or change < -threshold:
+            status = 'faster'
+        else:
+            status = 'same'
+
+        rows.append((name, before[metric], after[metric], change, before['queries'], after['queries'], status))
+    return rows
+
+
+def load_dataset_showroom(seed, sale_items, write=print):
+    """
+    Автосалон набора данных seed (см. dataset.generate_dataset()) с наибольшим кол-вом продаж.
+    Если набор данных еще не создан, он создается с sale_items строками продаж.
+    """
+
+    username = dataset.owner_username(seed)
+    if not get_user_model().objects.filter(username=username).exists():
+        dataset.generate_dataset(sale_items, seed=seed, write=write)
+
+    return models.Showroom.objects.filter(owner__username=username).annotate(
+        sale_items=db_models.Count('sales__sold_products')
+    ).order_by('-sale_items', 'pk').select_related('owner').first()
+
+
+def read_results(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def write_results(results, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
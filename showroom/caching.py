@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import uuid4
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+
+from . import events
+from .profiling import statistics_scope
+
+key_namespace = ContextVar('statistics_key_namespace', default=None)
+
+
+class StatisticsCache:
+    """
+    Кэш статистики автосалонов.
+
+    Ключ включает поколение статистики автосалона (Showroom.statistics_generation),
+    которое увеличивается в базе данных при любом изменении связанных с ним данных.
+    Поэтому после записи старые значения больше никогда не читаются,
+    а удалять их из кэша не нужно - они истекают сами.
+
+    Поколение берется из объекта автосалона, прочитанного из базы данных
+    (в представлениях - в начале запроса), поэтому кэш может быть своим
+    у каждого процесса. Объект, который хранится дольше запроса, обновляют
+    операции записи (см. services.checkout) или refresh_from_db().
+    """
+
+    key_prefix = 'statistics'
+    timeout = 60 * 60 * 24
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def isolated(self):
+        """
+        Отдельное пространство ключей на время блока: значения, вычисленные внутри,
+        не видны снаружи, а снаружи внутри не видно ничего (кэш пуст).
+        Нужно замерам и планам запросов (benchmark, explain_statistics), которые
+        изменяют данные и откатывают транзакцию: поколения из откаченной транзакции
+        потом выдаются повторно, и их значения в общем пространстве были бы неверными.
+        Очищать весь кэш для этого нельзя - он может быть общим для всех процессов.
+        """
+
+        token = key_namespace.set(uuid4().hex)
+        try:
+            yield
+        finally:
+            key_namespace.reset(token)
+
+    def make_key(self, queryset, showroom, metric_set='all'):
+        query_hash = hashlib.sha1(str(queryset.query).encode()).hexdigest()
+        namespace = key_namespace.get()
+        return ':'.join([
+            f'{self.key_prefix}:{namespace}' if namespace else self.key_prefix,
+            str(showroom.pk),
+            str(showroom.statistics_generation),
+            queryset.model._meta.label_lower,
+            query_hash,
+            metric_set,
+        ])
+
+    def get_or_compute(self, queryset, showroom, compute, metric_set='all'):
+        try:
+            key = self.make_key(queryset, showroom, metric_set)
+        except EmptyResultSet:
+            with statistics_scope(queryset, showroom, metric_set):
+                return compute(queryset)
+
+        statistics = cache.get(key)
+
+        if statistics is not None:
+            self._count(hit=True)
+            return statistics
+
+        self._count(hit=False)
+        with statistics_scope(queryset, showroom, metric_set):
+            statistics = compute(queryset)
+        cache.set(key, statistics, self.timeout)
+        return statistics
+
+    def _count(self, hit):
+        events.statistics_cache_read.send(sender=type(self), hit=hit)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+    def reset_counters(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+statistics_cache = StatisticsCache()
@@ -0,0 +1,38 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class ShowroomConditionalMixin:
+    """
+    Условные GET-запросы (If-None-Match / If-Modified-Since) к страницам автосалона.
+
+    ETag и Last-Modified вычисляются по строке автосалона (поколение статистики,
+    версия и время изменения статистики), поэтому неизмененная страница
+    отдается ответом 304 без вычисления статистики и отрисовки.
+    """
+
+    def get_etag_parts(self):
+        """
+        То, от чего еще зависит ответ, кроме состояния автосалона
+        """
+
+        return [self.request.get_full_path()]
+
+    def conditional_response(self, showroom, render):
+        """
+        Ответ 304, если у клиента актуальная версия, иначе результат render()
+        с заголовками ETag и Last-Modified
+        """
+
+        etag = quote_etag(showroom.statistics_etag(*self.get_etag_parts()))
+        last_modified = int(showroom.statistics_last_modified.timestamp())
+
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Клиент может хранить ответ, но обязан проверять его актуальность
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
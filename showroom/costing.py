@@ -0,0 +1,206 @@
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, transaction
+
+
+COSTING_METHODS = {
+    'fifo': 'По партиям в порядке поставки (FIFO)',
+    'average': 'По средневзвешенной цене остатков',
+}
+
+CENT = Decimal('0.01')
+
+
+def costing_method():
+    """
+    Способ расчета себестоимости из настройки SHOWROOM_COSTING_METHOD
+    """
+
+    method = getattr(settings, 'SHOWROOM_COSTING_METHOD', 'fifo')
+    if method not in COSTING_METHODS:
+        raise ImproperlyConfigured(f'Unknown SHOWROOM_COSTING_METHOD {method!r}')
+    return method
+
+
+def consume(stock, quantity, method, last_price=None):
+    """
+    Списывает quantity единиц товара с партий stock (в порядке поставки)
+    и возвращает себестоимость единицы и список измененных партий.
+
+    При FIFO себестоимость - средняя цена списанных единиц,
+    при средневзвешенном способе - средняя цена всех остатков до списания.
+    Единицы сверх остатков оцениваются по цене последней поставки last_price.
+    Если товар ни разу не поставлялся, себестоимость неизвестна (None).
+    """
+
+    units = sum(batch.quantity_left for batch in stock)
+    average_cost = None
+    if units:
+        average_cost = Decimal(sum(batch.supply_price * batch.quantity_left for batch in stock)) / units
+
+    needed = quantity
+    cost = 0
+    changed = []
+
+    for batch in stock:
+        if not needed:
+            break
+
+        taken = min(needed, batch.quantity_left)
+        batch.quantity_left -= taken
+        needed -= taken
+        cost += taken * batch.supply_price
+        changed.append(batch)
+
+    covered = quantity - needed
+
+    if method == 'average' and average_cost is not None:
+        unit_cost = average_cost
+    elif not quantity:
+        unit_cost = stock[0].supply_price if stock else last_price
+    elif last_price is not None:
+        unit_cost = Decimal(cost + needed * last_price) / quantity
+    elif covered:
+        unit_cost = Decimal(cost) / covered
+    else:
+        unit_cost = None
+
+    if unit_cost is None:
+        return None, changed
+    return Decimal(unit_cost).quantize(CENT, ROUND_HALF_UP), changed
+
+
+def assign_cost(sale_item, method=None):
+    assign_costs([sale_item], method)
+
+
+def assign_costs(sale_items, method=None):
+    """
+    Определяет себестоимость новых строк продаж и списывает их кол-во с остатков партий.
+    Партии товаров блокируются до конца транзакции, поэтому одновременные продажи
+    одного товара списывают остатки по очереди.
+    Кол-во запросов не зависит от кол-ва строк.
+    """
+
+    method = method or costing_method()
+    supply_item_model = apps.get_model('showroom', 'ProductSupplyItem')
+    product_model = apps.get_model('showroom', 'Product')
+    product_ids = {sale_item.product_id for sale_item in sale_items}
+
+    with transaction.atomic(savepoint=False):
+        stock = defaultdict(list)
+        batches = supply_item_model.objects.select_for_update().filter(
+            product_id__in=product_ids,
+            quantity_left__gt=0
+        ).order_by('product_id', 'date_created', 'pk')
+
+        for batch in batches:
+            stock[batch.product_id].append(batch)
+
+        needed = defaultdict(int)
+        for sale_item in sale_items:
+            needed[sale_item.product_id] += sale_item.quantity
+
+        # Цена последней поставки нужна только товарам, которым не хватает остатков
+        short_ids = [
+            product_id for product_id in product_ids
+            if sum(batch.quantity_left for batch in stock[product_id]) < needed[product_id]
+        ]
+        last_prices = {}
+        if short_ids:
+            last_supply = supply_item_model.objects.filter(
+                product=models.OuterRef('pk')
+            ).order_by('-date_created', '-pk').values('supply_price')[:1]
+
+            last_prices = dict(
+                product_model.objects.filter(pk__in=short_ids).annotate(
+                    last_price=models.Subquery(last_supply)
+                ).values_list('pk', 'last_price')
+            )
+
+        changed = {}
+        for sale_item in sale_items:
+            product_stock = [batch for batch in stock[sale_item.product_id] if batch.quantity_left]
+            sale_item.unit_cost, consumed = consume(
+                product_stock,
+                sale_item.quantity,
+                method,
+                last_prices.get(sale_item.product_id)
+            )
+            changed.update((batch.pk, batch) for batch in consumed)
+
+        supply_item_model.objects.bulk_update(changed.values(), ['quantity_left'])
+
+
+def recalculate_costs(showroom_id, method=None, batch_size=1000, product_ids=None):
+    """
+    Заново определяет себестоимость всех строк продаж автосалона
+    (или только строк товаров product_ids):
+    остатки партий восстанавливаются, а продажи списываются с них в хронологическом порядке.
+    Каждая продажа видит только партии, поставленные до нее.
+    Возвращает даты строк продаж, себестоимость которых изменилась.
+    """
+
+    method = method or costing_method()
+    supply_item_model = apps.get_model('showroom', 'ProductSupplyItem')
+    sale_item_model = apps.get_model('showroom', 'ProductSaleItem')
+
+    # Поставки автосалона - подзапросом, а не соединением: иначе FOR UPDATE
+    # в PostgreSQL заблокировал бы и строки поставок
+    supply_items = supply_item_model.objects.filter(
+        supply__in=apps.get_model('showroom', 'ProductSupply').objects.filter(showroom=showroom_id).values('pk')
+    )
+    sale_items = sale_item_model.objects.filter(sale__showroom=showroom_id)
+    if product_ids is not None:
+        supply_items = supply_items.filter(product__in=product_ids)
+        sale_items = sale_items.filter(product__in=product_ids)
+
+    with transaction.atomic():
+        # Партии блокируются в том же порядке, что и в assign_costs(): остатки
+        # записываются абсолютными значениями, и списание одновременной продажи
+        # иначе было бы перезаписано
+        batches = defaultdict(list)
+        supply_items = supply_items.select_for_update().order_by('product_id', 'date_created', 'pk').only(
+            'product', 'quantity', 'supply_price', 'date_created'
+        )
+
+        for batch in supply_items:
+            batch.quantity_left = batch.quantity
+            batches[batch.product_id].append(batch)
+
+        batch_dates = {
+            product_id: [batch.date_created for batch in product_batches]
+            for product_id, product_batches in batches.items()
+        }
+
+        sale_items = sale_items.order_by('date_created', 'pk').values_list(
+            'pk', 'product', 'quantity', 'date_created', 'unit_cost'
+        )
+
+        updated = []
+        changed_dates = []
+        for pk, product_id, quantity, date_created, current_cost in sale_items:
+            product_batches = batches.get(product_id, [])
+            available = product_batches[:bisect_right(batch_dates.get(product_id, []), date_created)]
+
+            unit_cost, _ = consume(
+                [batch for batch in available if batch.quantity_left],
+                quantity,
+                method,
+                available[-1].supply_price if available else None
+            )
+            if unit_cost != current_cost:
+                updated.append(sale_item_model(pk=pk, unit_cost=unit_cost))
+                changed_dates.append(date_created)
+
+        sale_item_model.objects.bulk_update(updated, ['unit_cost'], batch_size=batch_size)
+        supply_item_model.objects.bulk_update(
+            [batch for product_batches in batches.values() for batch in product_batches],
+            ['quantity_left'],
+            batch_size=batch_size
+        )
+    return changed_dates
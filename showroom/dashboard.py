@@ -0,0 +1,92 @@
+from django.db import models as db_models
+
+from . import models
+from .caching import statistics_cache
+from .statistics import find_group, leaderboard
+
+
+def objects_count(model):
+    objects = model.objects.filter(
+        showroom=db_models.OuterRef('pk')
+    ).order_by().values('showroom').annotate(count=db_models.Count('pk')).values('count')
+    return db_models.Subquery(objects, output_field=db_models.IntegerField())
+
+
+def headlines_queryset(showroom, sections):
+    """
+    Один запрос, возвращающий кол-во объектов и основные показатели каждого раздела.
+    Каждый показатель - коррелированный подзапрос к дневным сводкам автосалона,
+    поэтому кол-во запросов не зависит от кол-ва разделов.
+    """
+
+    expressions = {}
+    for section, model in sections.items():
+        expressions[f'{section}__count'] = objects_count(model)
+
+        for name in model.statistics_headline_fields or []:
+            expressions[f'{section}__{name}'] = find_group(model, name).showroom_subquery(name)
+
+    return models.Showroom.objects.filter(pk=showroom.pk).values(**expressions)
+
+
+def load_dashboard(showroom, sections):
+    """
+    Данные для страницы автосалона: общая статистика и показатели разделов.
+    Оба результата кэшируются до следующего изменения данных автосалона.
+    """
+
+    headlines = statistics_cache.get_or_compute(
+        headlines_queryset(showroom, sections),
+        showroom,
+        lambda queryset: queryset.first(),
+        metric_set='dashboard'
+    )
+
+    dashboard_sections = []
+    for section, model in sections.items():
+        verbose_names = model.statistics_fields_verbose_names or {}
+        dashboard_sections.append({
+            'short': section,
+            'model': model,
+            'count': headlines[f'{section}__count'] or 0,
+            'headlines': {
+                verbose_names.get(name, name): headlines[f'{section}__{name}']
+                for name in model.statistics_headline_fields or []
+            },
+        })
+
+    return {
+        'statistics': showroom.statistics(verbose_names=True),
+        'sections': dashboard_sections,
+    }
+
+
+def load_leaderboards(showroom, sections, limit=10):
+    """
+    Лучшие объекты каждого раздела автосалона по метрике statistics_leaderboard_field модели.
+    Каждый рейтинг кэшируется до следующего изменения данных автосалона.
+    """
+
+    leaderboards = []
+    for section, model in sections.items():
+        name = model.statistics_leaderboard_field
+        if not name:
+            continue
+
+        queryset = model.objects.filter(showroom=showroom)
+        leaders = statistics_cache.get_or_compute(
+            queryset,
+            showroom,
+            lambda queryset: leaderboard(queryset, name, limit),
+            metric_set=f'leaderboard:{name}:{limit}'
+        )
+
+        verbose_names = model.statistics_fields_verbose_names or {}
+        leaderboards.append({
+            'short': section,
+            'model': model,
+            'metric': verbose_names.get(name, name),
+            'leaders': leaders,
+        })
+
+    return leaderboards
@@ -0,0 +1,521 @@
+import math
+import random
+from array import array
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from itertools import accumulate
+from uuid import UUID
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, models as db_models, transaction
+from django.utils import timezone
+
+from . import costing, models, rollups
+
+
+CATEGORY_NAMES = [
+    'Шины', 'Диски', 'Моторные масла', 'Аккумуляторы', 'Фильтры', 'Тормозные колодки',
+    'Свечи зажигания', 'Амортизаторы', 'Щетки стеклоочистителя', 'Лампы', 'Ремни ГРМ',
+    'Автохимия', 'Аксессуары', 'Коврики', 'Инструменты',
+]
+
+BRANDS = [
+    'Bosch', 'Michelin', 'Castrol', 'Mann', 'Brembo', 'NGK', 'Varta', 'Sachs',
+    'Valeo', 'Philips', 'Gates', 'Liqui Moly', 'Continental', 'Hella', 'Febi',
+]
+
+FIRST_NAMES = ['Иван', 'Петр', 'Алексей', 'Сергей', 'Андрей', 'Дмитрий', 'Михаил', 'Николай']
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов']
+SURNAMES = ['Иванович', 'Петрович', 'Сергеевич', 'Андреевич', 'Алексеевич', 'Николаевич']
+
+# Продажи по дням недели (пн - вс) и часам работы автосалона
+WEEKDAY_WEIGHTS = [0.8, 0.9, 0.95, 1.0, 1.2, 1.5, 1.3]
+OPENING_HOUR = 9
+CLOSING_HOUR = 21
+
+# Кол-во строк в продаже и кол-во товара в строке
+SALE_LINES = [1, 2, 3, 4, 5]
+SALE_LINES_WEIGHTS = list(accumulate([55, 25, 10, 6, 4]))
+LINE_QUANTITIES = [1, 2, 3, 4]
+LINE_QUANTITIES_WEIGHTS = list(accumulate([80, 12, 5, 3]))
+
+
+def owner_username(seed):
+    return f'dataset-{seed}'
+
+
+def clamp(value, lower, upper):
+    return max(lower, min(upper, value))
+
+
+def random_slug(rnd):
+    return UUID(int=rnd.getrandbits(128), version=4)
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=db_models.Max('pk'))['last'] or 0) + 1
+
+
+def split(total, parts, rnd, sigma=0.7):
+    """
+    Делит total на parts неравных частей (не меньше единицы каждая)
+    с логнормальным распределением размеров
+    """
+
+    weights = [rnd.lognormvariate(0, sigma) for _ in range(parts)]
+    scale = (total - parts) / sum(weights)
+    sizes = [1 + int(weight * scale) for weight in weights]
+
+    for index in range(total - sum(sizes)):
+        sizes[index % parts] += 1
+    return sizes
+
+
+def weighted_picker(rnd, weights):
+    cum_weights = list(accumulate(weights))
+    total = cum_weights[-1]
+    return lambda: bisect(cum_weights, rnd.random() * total)
+
+
+def day_weights(days, rnd, growth=0.3):
+    """
+    Доли продаж по дням периода: рост продаж к концу периода,
+    недельная сезонность и случайные колебания
+    """
+
+    return [
+        (1 + growth * index / max(len(days) - 1, 1))
+        * WEEKDAY_WEIGHTS[day.weekday()]
+        * clamp(rnd.gauss(1, 0.1), 0.5, 1.5)
+        for index, day in enumerate(days)
+    ]
+
+
+def sale_time(day, rnd):
+    """
+    Время продажи: пик продаж во второй половине рабочего дня
+    """
+
+    hours = CLOSING_HOUR - OPENING_HOUR
+    offset = rnd.triangular(0, hours * 3600, hours * 3600 * 0.6)
+    return timezone.make_aware(datetime.combine(day, time(OPENING_HOUR)) + timedelta(seconds=offset))
+
+
+def delivery_time(day):
+    # Поставки приходят до открытия автосалона
+    return timezone.make_aware(datetime.combine(day, time(OPENING_HOUR - 1)))
+
+
+@contextmanager
+def explicit_dates(*model_classes):
+    """
+    bulk_create заполняет поля auto_now_add текущим временем.
+    Внутри блока поля сохраняют переданные даты - так создается история продаж.
+    """
+
+    fields = [
+        field for model in model_classes for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class ShowroomGenerator:
+    """
+    Генерирует один автосалон с sale_items строками продаж за дни days.
+
+    Строки продаж создаются в хронологическом порядке и записываются порциями
+    по batch_size, поэтому память не зависит от кол-ва продаж. Первичные ключи
+    назначаются заранее: так строки продаж ссылаются на продажи без чтения
+    созданных записей (bulk_create на MySQL не возвращает первичные ключи).
+    """
+
+    def __init__(self, owner, number, sale_items, days, rnd, batch_size=5000, restock_days=30):
+        self.owner = owner
+        self.number = number
+        self.sale_items = sale_items
+        self.days = days
+        self.rnd = rnd
+        self.batch_size = batch_size
+        self.restock_days = restock_days
+
+        self.products_count = clamp(sale_items // 100, 20, 20_000)
+        self.categories_count = clamp(round(math.sqrt(self.products_count)), 5, 200)
+        self.employees_count = clamp(sale_items // 2000, 5, 500)
+        self.dealers_count = clamp(self.products_count // 100, 3, 200)
+
+    def generate(self):
+        self.create_showroom()
+        self.create_catalog()
+        self.create_history()
+        self.update_stock()
+        return self.showroom
+
+    def name(self, value):
+        # Названия категорий и дилеров уникальны во всей базе данных
+        return f'{value} ({self.showroom.slug.hex[:8]})'
+
+    def create_showroom(self):
+        self.showroom = models.Showroom(
+            pk=next_pk(models.Showroom),
+            title=f'Автосалон {self.number}',
+            phone_number=f'+7999{self.number:07d}',
+            slug=random_slug(self.rnd),
+            owner=self.owner,
+            date_created=delivery_time(self.days[0] - timedelta(days=1)),
+        )
+        models.Showroom.objects.bulk_create([self.showroom])
+
+    def create_catalog(self):
+        rnd = self.rnd
+        created = delivery_time(self.days[0] - timedelta(days=1))
+
+        start = next_pk(models.ProductCategory)
+        categories = models.ProductCategory.objects.bulk_create(
+            models.ProductCategory(
+                pk=start + index,
+                name=self.name(f'{CATEGORY_NAMES[index % len(CATEGORY_NAMES)]} {index // len(CATEGORY_NAMES) + 1}'),
+                slug=random_slug(rnd),
+                showroom=self.showroom,
+                date_created=created,
+            )
+            for index in range(self.categories_count)
+        )
+
+        start = next_pk(models.Dealer)
+        self.dealers = models.Dealer.objects.bulk_create(
+            models.Dealer(
+                pk=start + index,
+                name=self.name(f'Дилер {index + 1}'),
+                slug=random_slug(rnd),
+                showroom=self.showroom,
+                date_created=created,
+            )
+            for index in range(self.dealers_count)
+        )
+
+        start = next_pk(models.Employee)
+        self.employees = models.Employee.objects.bulk_create(
+            models.Employee(
+                pk=start + index,
+                first_name=rnd.choice(FIRST_NAMES),
+                last_name=rnd.choice(LAST_NAMES),
+                surname=rnd.choice(SURNAMES),
+                phone_number=f'+7998{rnd.randrange(10_000_000):07d}',
+                slug=random_slug(rnd),
+                showroom=self.showroom,
+                date_created=created,
+            )
+            for index in range(self.employees_count)
+        )
+
+        # Цены распределены логнормально, популярность товаров - по закону Ципфа
+        start = next_pk(models.Product)
+        self.products = models.Product.objects.bulk_create(
+            (
+                models.Product(
+                    pk=start + index,
+                    title=f'{rnd.choice(BRANDS)} {index + 1:05d}',
+                    price=clamp(int(round(rnd.lognormvariate(math.log(3000), 1.0), -1)), 50, 500_000),
+                    slug=random_slug(rnd),
+                    category=rnd.choice(categories),
+                    showroom=self.showroom,
+                    date_created=created,
+                )
+                for index in range(self.products_count)
+            ),
+            batch_size=self.batch_size
+        )
+
+        ranks = list(range(1, self.products_count + 1))
+        rnd.shuffle(ranks)
+        self.pick_product = weighted_picker(rnd, [1 / rank ** 1.1 for rank in ranks])
+        self.pick_employee = weighted_picker(rnd, [rnd.lognormvariate(0, 0.5) for _ in self.employees])
+        self.product_dealers = [rnd.randrange(self.dealers_count) for _ in self.products]
+
+    def periods(self):
+        """
+        Периоды между поставками: (номер периода, индекс первого дня, дни периода)
+        """
+
+        for number, start in enumerate(range(0, len(self.days), self.restock_days)):
+            yield number, start, self.days[start:start + self.restock_days]
+
+    def sales_per_day(self):
+        weights = day_weights(self.days, self.rnd)
+        lines_weights = [
+            weight - previous for weight, previous in zip(SALE_LINES_WEIGHTS, [0] + SALE_LINES_WEIGHTS)
+        ]
+        items_per_sale = sum(lines * weight for lines, weight in zip(SALE_LINES, lines_weights))
+        items_per_sale /= SALE_LINES_WEIGHTS[-1]
+
+        total = sum(weights)
+        return [weight / total * self.sale_items / items_per_sale for weight in weights]
+
+    def create_history(self):
+        """
+        История создается по периодам: сначала планируются продажи периода,
+        затем дилеры привозят в начале периода недостающий для них товар,
+        после чего продажи списываются с партий (costing.consume - тем же способом,
+        что и при оформлении продаж) и записываются вместе с себестоимостью.
+        """
+
+        self.method = costing.costing_method()
+        self.open_batches = [[] for _ in self.products]
+        self.last_prices = [None] * self.products_count
+        self.stock = array('q', bytes(8 * self.products_count))
+        self.supplies = []
+        self.supply_items = []
+
+        self.sale_pk = next_pk(models.ProductSale)
+        self.item_pk = next_pk(models.ProductSaleItem)
+        self.supply_pk = next_pk(models.ProductSupply)
+        self.supply_item_pk = next_pk(models.ProductSupplyItem)
+
+        sales_per_day = self.sales_per_day()
+        left = self.sale_items
+
+        for number, start, period in self.periods():
+            sales = []
+            for index, day in enumerate(period, start=start):
+                count = int(sales_per_day[index]) + (self.rnd.random() < sales_per_day[index] % 1)
+                if index == len(self.days) - 1:
+                    count = left
+
+                for date_created in sorted(sale_time(day, self.rnd) for _ in range(count)):
+                    if not left:
+                        break
+
+                    sale = self.plan_sale(date_created, left)
+                    left -= len(sale[2])
+                    sales.append(sale)
+
+            self.deliver(number, period[0], sales)
+            self.save_sales(sales)
+
+        models.ProductSupply.objects.bulk_create(self.supplies, batch_size=self.batch_size)
+        models.ProductSupplyItem.objects.bulk_create(self.supply_items, batch_size=self.batch_size)
+
+    def plan_sale(self, date_created, left):
+        """
+        Продажа: (дата, сотрудник, [(индекс товара, кол-во), ...]).
+        Популярные товары и продуктивные сотрудники встречаются чаще.
+        """
+
+        rnd = self.rnd
+        employee = None
+        if rnd.random() > 0.03:
+            employee = self.employees[self.pick_employee()]
+
+        lines = min(rnd.choices(SALE_LINES, cum_weights=SALE_LINES_WEIGHTS)[0], left)
+        products = set()
+        while len(products) < min(lines, self.products_count):
+            products.add(self.pick_product())
+
+        return date_created, employee, [
+            (product_index, rnd.choices(LINE_QUANTITIES, cum_weights=LINE_QUANTITIES_WEIGHTS)[0])
+            for product_index in sorted(products)
+        ]
+
+    def deliver(self, number, day, sales):
+        """
+        В начале периода каждый дилер привозит одну поставку своих товаров:
+        недостающее для продаж периода с небольшим запасом.
+        Партии сохраняются в конце генерации - с итоговыми остатками.
+        """
+
+        rnd = self.rnd
+        date_created = delivery_time(day)
+        inflation = 1 + 0.005 * number
+
+        demand = [0] * self.products_count
+        for _, _, lines in sales:
+            for product_index, quantity in lines:
+                demand[product_index] += quantity
+
+        supplies = {}
+        for product_index, product in enumerate(self.products):
+            needed = demand[product_index]
+            quantity = max(needed - self.stock[product_index], 0)
+            if needed or rnd.random() < 0.3:
+                quantity += rnd.randint(0, max(2, needed // 5))
+            if not number:
+                quantity += rnd.randint(1, 10)
+            if not quantity:
+                continue
+
+            dealer = self.dealers[self.product_dealers[product_index]]
+            if dealer.pk not in supplies:
+                supplies[dealer.pk] = models.ProductSupply(
+                    pk=self.supply_pk,
+                    dealer=dealer,
+                    showroom=self.showroom,
+                    slug=random_slug(rnd),
+                    date_created=date_created,
+                )
+                self.supply_pk += 1
+
+            batch = models.ProductSupplyItem(
+                pk=self.supply_item_pk,
+                product_id=product.pk,
+                supply_id=supplies[dealer.pk].pk,
+                quantity=quantity,
+                quantity_left=quantity,
+                slug=random_slug(rnd),
+                supply_price=max(1, round(product.price * rnd.uniform(0.5, 0.8) * inflation)),
+                date_created=date_created,
+            )
+            self.supply_item_pk += 1
+
+            self.supply_items.append(batch)
+            self.open_batches[product_index].append(batch)
+            self.last_prices[product_index] = batch.supply_price
+            self.stock[product_index] += quantity
+
+        self.supplies.extend(supplies.values())
+
+    def save_sales(self, sales):
+        rnd = self.rnd
+        sale_objects = []
+        items = []
+
+        for date_created, employee, lines in sales:
+            sale_objects.append(models.ProductSale(
+                pk=self.sale_pk,
+                employee=employee,
+                showroom=self.showroom,
+                slug=random_slug(rnd),
+                date_created=date_created,
+            ))
+
+            for product_index, quantity in lines:
+                product = self.products[product_index]
+                batches = self.open_batches[product_index]
+                unit_cost, _ = costing.consume(batches, quantity, self.method, self.last_prices[product_index])
+
+                # Партии списываются по порядку поставки, закончившиеся - в начале списка
+                while batches and not batches[0].quantity_left:
+                    batches.pop(0)
+                self.stock[product_index] -= quantity
+
+                items.append(models.ProductSaleItem(
+                    pk=self.item_pk,
+                    product_id=product.pk,
+                    sale_id=self.sale_pk,
+                    quantity=quantity,
+                    slug=random_slug(rnd),
+                    sale_price=product.price,
+                    unit_cost=unit_cost,
+                    date_created=date_created,
+                ))
+                self.item_pk += 1
+
+            self.sale_pk += 1
+
+            if len(items) >= self.batch_size:
+                self.flush_sales(sale_objects, items)
+
+        self.flush_sales(sale_objects, items)
+
+    def flush_sales(self, sales, items):
+        models.ProductSale.objects.bulk_create(sales, batch_size=self.batch_size)
+        models.ProductSaleItem.objects.bulk_create(items, batch_size=self.batch_size)
+        sales.clear()
+        items.clear()
+
+    def update_stock(self):
+        for product_index, product in enumerate(self.products):
+            product.quantity = self.stock[product_index]
+
+        models.Product.objects.bulk_update(self.products, ['quantity'], batch_size=1000)
+
+
+def finish_showroom(showroom):
+    """
+    bulk_create не отправляет сигналы, поэтому сводки пересчитываются после генерации
+    """
+
+    rollups.rebuild(showroom.pk)
+    models.Showroom.bump_generation(showroom.pk)
+
+
+def delete_dataset(seed):
+    """
+    Удаляет набор данных seed вместе с владельцем.
+    Поставки защищают дилеров от удаления, поэтому удаляются первыми.
+    Возвращает True, если набор данных был создан.
+    """
+
+    owner = get_user_model().objects.filter(username=owner_username(seed)).first()
+    if owner is None:
+        return False
+
+    with transaction.atomic():
+        models.ProductSupply.objects.filter(showroom__owner=owner).delete()
+        owner.delete()
+    return True
+
+
+def generate_dataset(
+    sale_items,
+    showrooms=1,
+    seed=0,
+    days=365,
+    end_date=None,
+    batch_size=5000,
+    password=None,
+    write=print
+):
+    """
+    Генерирует воспроизводимый набор данных: showrooms автосалонов владельца
+    dataset-<seed> с sale_items строками продаж за days дней до end_date.
+    При одинаковых параметрах (включая end_date) создаются одинаковые данные:
+    ссылки (slug), даты, цены и продажи зависят только от seed.
+    Возвращает созданные автосалоны.
+    """
+
+    rnd = random.Random(seed)
+    end_date = end_date or timezone.localdate()
+    period = [end_date - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+
+    owner = get_user_model().objects.create_user(
+        username=owner_username(seed),
+        email=f'{owner_username(seed)}@example.com',
+        password=password,
+        first_name='Владелец',
+        last_name='Тестовый',
+        is_email_verified=True
+    )
+
+    generated_models = [
+        models.Showroom, models.ProductCategory, models.Dealer, models.Employee, models.Product,
+        models.ProductSale, models.ProductSaleItem, models.ProductSupply, models.ProductSupplyItem,
+    ]
+
+    created = []
+    with explicit_dates(*generated_models):
+        for number, size in enumerate(split(sale_items, showrooms, rnd), start=1):
+            generator = ShowroomGenerator(owner, number, size, period, rnd, batch_size)
+            showroom = generator.generate()
+            write(
+                f'{showroom.slug}: строк продаж {size}, товаров {generator.products_count}, '
+                f'сотрудников {generator.employees_count}, дилеров {generator.dealers_count}'
+            )
+
+            finish_showroom(showroom)
+            created.append(showroom)
+
+    # Первичные ключи назначались явно, последовательности (PostgreSQL) нужно сдвинуть
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(no_style(), generated_models):
+            cursor.execute(statement)
+
+    return created
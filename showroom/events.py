@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Сигналы для внешнего учета работы автосалонов (например, метрик Prometheus).
+# Приложение только отправляет их, получатели подключаются в AppConfig.ready() своих приложений.
+
+# Чтение статистики через кэш: hit - значение найдено в кэше (иначе вычислено заново)
+statistics_cache_read = Signal()
+
+# Продажа через Product.sell(): product - товар, quantity - кол-во проданных единиц
+product_sold = Signal()
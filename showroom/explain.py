@@ -0,0 +1,158 @@
+import re
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import costing, models, rollups
+from .caching import statistics_cache
+from .dashboard import load_dashboard, load_leaderboards
+
+
+def capture_selects(func):
+    """
+    Выполняет func и возвращает ее запросы SELECT: [(sql, параметры), ...] без повторов
+    """
+
+    queries = {}
+
+    def collect(execute, sql, params, many, context):
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            queries.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(collect):
+        func()
+    return list(queries.items())
+
+
+def explain_rows(sql, params):
+    """
+    План выполнения запроса: список строк EXPLAIN в виде {столбец: значение}
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def plan_lines(rows):
+    return [' '.join(str(value) for value in row.values()) for row in rows]
+
+
+def resolve_table(name, sql):
+    """
+    Имя таблицы по псевдониму подзапроса (U0, U1, ...) из текста запроса
+    """
+
+    match = re.search(rf'"(\w+)" {re.escape(name)}\b', sql)
+    return match.group(1) if match else name
+
+
+def full_scans(rows, sql, vendor=None):
+    """
+    Полные просмотры таблиц в плане выполнения rows запроса sql: [(таблица, строка плана), ...].
+    Просмотр индекса целиком (SQLite: SCAN ... USING INDEX) полным просмотром не считается.
+    """
+
+    vendor = vendor or connection.vendor
+    scans = []
+    for row in rows:
+        if vendor == 'sqlite':
+            detail = row.get('detail', '')
+            match = re.match(r'SCAN (\w+)', detail)
+            if match and match.group(1) != 'CONSTANT' and 'USING' not in detail:
+                scans.append((resolve_table(match.group(1), sql), detail))
+        elif vendor == 'postgresql':
+            line = next(iter(row.values()), '')
+            match = re.search(r'Seq Scan on (\w+)', line)
+            if match:
+                scans.append((match.group(1), line.strip()))
+        elif vendor == 'mysql':
+            if row.get('type') == 'ALL':
+                scans.append((resolve_table(row.get('table'), sql), f"{row.get('table')} type ALL"))
+    return scans
+
+
+def table_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+
+def statistics_scenarios(showroom, sections):
+    """
+    Основные запросы статистики автосалона: {название: функция}.
+    Статистика объектов и страницы автосалона читается из кэша,
+    поэтому каждая функция выполняется в своем пустом пространстве ключей кэша.
+    """
+
+    today = timezone.localdate()
+    month = {'date_from': today - timedelta(days=30), 'date_to': today}
+    year = {'date_from': today - timedelta(days=365), 'date_to': today}
+
+    scenarios = {
+        'showroom:statistics': lambda: models.Showroom.objects.filter(pk=showroom.pk).statistics(),
+        'showroom:dashboard': lambda: load_dashboard(showroom, sections),
+        'showroom:leaderboards': lambda: load_leaderboards(showroom, sections),
+    }
+
+    for name, model in sections.items():
+        queryset = model.objects.filter(showroom=showroom)
+        scenarios.update({
+            f'{name}:statistics': queryset.statistics,
+            f'{name}:period': lambda queryset=queryset: queryset.statistics(**month, compare=True),
+            f'{name}:time_series': lambda queryset=queryset: queryset.statistics(**year, granularity='month'),
+            f'{name}:rows': lambda queryset=queryset: list(queryset.with_statistics().order_by('pk')[:25]),
+        })
+
+        instance = queryset.order_by('pk').first()
+        if instance is not None:
+            scenarios[f'{name}:object'] = instance.statistics
+
+    def refresh_day():
+        last_sale = models.ProductSale.objects.filter(showroom=showroom).order_by('-date_created').first()
+        if last_sale is not None:
+            rollups.refresh_sales(showroom.pk, [rollups.local_date(last_sale.date_created)])
+
+    def assign_costs():
+        products = models.Product.objects.filter(showroom=showroom).order_by('pk')[:5]
+        costing.assign_costs([models.ProductSaleItem(product=product, quantity=1) for product in products])
+
+    scenarios['rollups:refresh_day'] = refresh_day
+    scenarios['costing:assign_costs'] = assign_costs
+    return scenarios
+
+
+def explain_statistics(showroom, sections, min_rows=0):
+    """
+    Выполняет запросы statistics_scenarios() и строит их планы выполнения.
+    Полные просмотры таблиц меньше min_rows строк не учитываются:
+    такие таблицы планировщик просматривает целиком независимо от индексов.
+    Изменения данных откатываются.
+    Возвращает {сценарий: [(sql, строки плана, полные просмотры), ...]}.
+    """
+
+    sizes = {}
+
+    def is_large(table):
+        if not min_rows:
+            return True
+        if table not in sizes:
+            sizes[table] = table_rows(table)
+        return sizes[table] >= min_rows
+
+    report = {}
+    with transaction.atomic():
+        for name, func in statistics_scenarios(showroom, sections).items():
+            report[name] = []
+            with statistics_cache.isolated():
+                queries = capture_selects(func)
+
+            for sql, params in queries:
+                rows = explain_rows(sql, params)
+                scans = [(table, line) for table, line in full_scans(rows, sql) if is_large(table)]
+                report[name].append((sql, plan_lines(rows), scans))
+
+        transaction.set_rollback(True)
+    return report
@@ -0,0 +1,96 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+export_formats = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """
+    Кодировщик JSON для выгрузки.
+    Значения нестандартных типов (например, номера телефонов) выгружаются строкой.
+    """
+
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return str(o)
+
+
+class Echo:
+    """
+    Псевдофайл для csv.writer: вместо записи возвращает строку,
+    чтобы ее можно было сразу отдать клиенту
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_fields(model, with_statistics=False):
+    """
+    Поля выгрузки модели: [(название, заголовок), ...].
+    Поле автосалона не выгружается - оно одинаково у всех строк.
+    """
+
+    fields = [
+        (field.name, str(field.verbose_name))
+        for field in model._meta.concrete_fields
+        if field.name != 'showroom'
+    ]
+
+    if with_statistics:
+        verbose_names = model.statistics_fields_verbose_names or {}
+        fields += [
+            (name, verbose_names.get(name, name))
+            for name in model.statistics_row_fields or []
+        ]
+
+    return fields
+
+
+def export_rows(queryset, with_statistics=False, chunk_size=2000):
+    """
+    Строки выгрузки. Объекты читаются из базы данных порциями по chunk_size
+    (серверным курсором там, где он поддерживается), поэтому в памяти
+    одновременно находится не больше одной порции строк.
+    """
+
+    if with_statistics:
+        queryset = queryset.with_statistics()
+
+    names = [name for name, _ in export_fields(queryset.model, with_statistics)]
+    return queryset.order_by('pk').values_list(*names).iterator(chunk_size=chunk_size)
+
+
+def csv_lines(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([title for _, title in fields])
+
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(fields, rows):
+    names = [name for name, _ in fields]
+
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=ExportJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def export_lines(queryset, export_format, with_statistics=False, chunk_size=2000):
+    """
+    Генератор строк выгрузки выборки queryset в формате export_format (csv или jsonl)
+    """
+
+    fields = export_fields(queryset.model, with_statistics)
+    rows = export_rows(queryset, with_statistics, chunk_size)
+
+    if export_format == 'csv':
+        return csv_lines(fields, rows)
+    return jsonl_lines(fields, rows)
@@ -1,11 +1,35 @@
 from django import forms
+from django.utils import timezone
 from phonenumber_field.widgets import PhoneNumberPrefixWidget
 from AutoServiceAdmin.forms import CrispyForm
 import django_tables2 as tables
 from . import models
+from .imports import read_csv, read_csv_header
+from .statistics import GRANULARITIES
 
 
-class ShowroomForm(CrispyForm, forms.ModelForm):
+class VersionFormMixin(forms.Form):
+    """
+    Передает версию редактируемой записи через скрытое поле формы,
+    чтобы сохранение обнаружило изменения, сделанные после открытия формы
+    (см. AbstractStatisticsModel._do_update)
+    """
+
+    version = forms.IntegerField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['version'] = self.instance.version
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance.pk and cleaned_data.get('version') is not None:
+            self.instance.version = cleaned_data['version']
+        return cleaned_data
+
+
+class ShowroomForm(VersionFormMixin, CrispyForm, forms.ModelForm):
     """
     Универсальная форма для модели автосалона
     """
@@ -30,6 +54,145 @@ class ShowroomDeletionForm(CrispyForm, forms.Form):
     submit_field = 'Удалить'
 
 
+class StatisticsPeriodForm(CrispyForm, forms.Form):
+    """
+    Форма выбора периода и разбивки статистики
+    """
+
+    submit_field = 'Показать'
+
+    date_from = forms.DateField(
+        required=False,
+        label='С даты',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+
+    date_to = forms.DateField(
+        required=False,
+        label='По дату',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+
+    granularity = forms.ChoiceField(
+        required=False,
+        label='Разбивка',
+        choices=[('', 'Без разбивки')] + list(GRANULARITIES.items())
+    )
+
+    compare = forms.BooleanField(
+        required=False,
+        label='Сравнить с предыдущим периодом'
+    )
+
+    @property
+    def helper(self):
+        helper = super().helper
+        helper.form_method = 'get'
+        return helper
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError('Дата начала периода не может быть позже даты окончания.')
+
+        if cleaned_data.get('compare'):
+            if not date_from:
+                raise forms.ValidationError('Для сравнения укажите дату начала периода.')
+
+            if cleaned_data.get('granularity'):
+                raise forms.ValidationError('Сравнение периодов доступно только без разбивки.')
+
+            if not date_to:
+                cleaned_data['date_to'] = max(date_from, timezone.localdate())
+
+        return cleaned_data
+
+
+class SupplyManifestForm(CrispyForm, forms.Form):
+    """
+    Форма приема накладной поставки дилера: CSV-файл или строки, введенные вручную
+    """
+
+    submit_field = 'Принять поставку'
+
+    manifest_columns = ['product', 'quantity', 'supply_price']
+
+    dealer = forms.ModelChoiceField(
+        queryset=models.Dealer.objects.none(),
+        label='Дилер'
+    )
+
+    manifest_file = forms.FileField(
+        required=False,
+        label='Файл накладной (CSV)',
+        help_text='Колонки: product (ссылка или название товара), quantity, supply_price.'
+    )
+
+    manifest_text = forms.CharField(
+        required=False,
+        label='Строки накладной',
+        widget=forms.Textarea(attrs={'rows': 8}),
+        help_text='По одной позиции в строке: товар;кол-во;цена за штуку.'
+    )
+
+    def __init__(self, *args, showroom=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['dealer'].queryset = models.Dealer.objects.filter(showroom=showroom)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        manifest_file = cleaned_data.get('manifest_file')
+
+        if not manifest_file and not cleaned_data.get('manifest_text', '').strip():
+            raise forms.ValidationError('Загрузите файл накладной или введите ее строки.')
+
+        if manifest_file:
+            columns = [name.lower() for name in read_csv_header(manifest_file)]
+            missing = [name for name in self.manifest_columns if name not in columns]
+            if missing:
+                raise forms.ValidationError(f'В файле накладной нет колонок: {", ".join(missing)}.')
+
+        return cleaned_data
+
+    def manifest_lines(self):
+        """
+        Строки накладной: (номер строки, товар, кол-во, цена за штуку).
+        Файл читается построчно по мере обработки строк.
+        """
+
+        manifest_file = self.cleaned_data.get('manifest_file')
+        if manifest_file:
+            for number, row in read_csv(manifest_file):
+                # Колонки сверяются без учета регистра (см. clean)
+                row = {name.lower(): value for name, value in row.items() if name is not None}
+                yield (number, *(row.get(name) or '' for name in self.manifest_columns))
+            return
+
+        for number, line in enumerate(self.cleaned_data['manifest_text'].splitlines(), start=1):
+            if not line.strip():
+                continue
+
+            values = [value.strip() for value in line.split(';')]
+            values += [''] * (len(self.manifest_columns) - len(values))
+            yield (number, *values[:len(self.manifest_columns)])
+
+
+class StatisticsImportForm(CrispyForm, forms.Form):
+    """
+    Форма загрузки CSV-файла для импорта объектов раздела
+    """
+
+    submit_field = 'Импортировать'
+
+    import_file = forms.FileField(
+        label='Файл (CSV)',
+        help_text='Колонки называются как поля раздела или как заголовки выгрузки в CSV.'
+    )
+
+
 class ShowroomAdminForm(CrispyForm, forms.ModelForm):
     """
     Форма для редактирования и добавления данных по модели автосалона
@@ -62,7 +225,7 @@ class EmployeeAdminForm(CrispyForm, forms.ModelForm):
         }
 
 
-class EmployeeForm(CrispyForm, forms.ModelForm):
+class EmployeeForm(VersionFormMixin, CrispyForm, forms.ModelForm):
     """
     Универсальная форма для модели сотрудника
     """
@@ -72,12 +235,26 @@ class EmployeeForm(CrispyForm, forms.ModelForm):
     model = models.Employee
 
     class Meta:
+        model = models.Employee
         widgets = {
             'phone_number': PhoneNumberPrefixWidget()
         }
         exclude = ['showroom', 'slug']
 
 
+def statistics_columns(model):
+    """
+    Колонки таблицы для метрик statistics_row_fields модели.
+    Значения берутся из аннотаций StatisticsQuerySet.with_statistics().
+    """
+
+    verbose_names = model.statistics_fields_verbose_names or {}
+    return [
+        (name, tables.Column(verbose_name=verbose_names.get(name, name), default=0))
+        for name in model.statistics_row_fields or []
+    ]
+
+
 class EmployeeTable(tables.Table):
     """
     Табличное отображение модели сотрудника
@@ -89,7 +266,7 @@ class EmployeeTable(tables.Table):
         exclude = ['showroom', 'slug']
 
 
-class ProductCategoryForm(CrispyForm, forms.ModelForm):
+class ProductCategoryForm(VersionFormMixin, CrispyForm, forms.ModelForm):
     """
     Универсальная форма для модели категории товара
     """
@@ -99,6 +276,7 @@ class ProductCategoryForm(CrispyForm, forms.ModelForm):
     model = models.ProductCategory
 
     class Meta:
+        model = models.ProductCategory
         exclude = ['showroom', 'slug']
 
 
@@ -113,7 +291,7 @@ class ProductCategoryTable(tables.Table):
         exclude = ['showroom', 'slug']
 
 
-class ProductForm(CrispyForm, forms.ModelForm):
+class ProductForm(VersionFormMixin, CrispyForm, forms.ModelForm):
     """
     Универсальная форма для модели товара
     """
@@ -123,6 +301,7 @@ class ProductForm(CrispyForm, forms.ModelForm):
     model = models.Product
 
     class Meta:
+        model = models.Product
         exclude = ['showroom', 'slug']
 
 
@@ -233,7 +412,7 @@ class ProductSupplyTable(tables.Table):
         exclude = ['showroom', 'slug']
 
 
-class DealerForm(CrispyForm, forms.ModelForm):
+class DealerForm(VersionFormMixin, CrispyForm, forms.ModelForm):
     """
     Универсальная форма для модели дилера
     """
@@ -243,6 +422,7 @@ class DealerForm(CrispyForm, forms.ModelForm):
     model = models.Dealer
 
     class Meta:
+        model = models.Dealer
         exclude = ['showroom', 'slug']
 
 
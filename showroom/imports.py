@@ -0,0 +1,235 @@
+import csv
+import io
+from django import forms
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+
+from . import models
+from .services import batches
+
+
+def sniff_dialect(sample):
+    """
+    Диалект CSV по началу файла: разделитель - запятая или точка с запятой
+    """
+
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;')
+    except csv.Error:
+        return csv.excel
+
+
+def read_csv_header(uploaded_file, encoding='utf-8-sig'):
+    """
+    Названия колонок загруженного CSV-файла без пробелов по краям.
+    Файл после чтения возвращается в начало.
+    """
+
+    sample = uploaded_file.read(4096).decode(encoding, errors='replace')
+    uploaded_file.seek(0)
+    header = next(csv.reader(io.StringIO(sample), sniff_dialect(sample)), [])
+    return [name.strip() for name in header]
+
+
+def read_csv(uploaded_file, encoding='utf-8-sig'):
+    """
+    Читает загруженный CSV-файл построчно, не загружая его в память целиком.
+    Разделитель (запятая или точка с запятой) определяется по началу файла.
+    Возвращает генератор пар (номер строки файла, словарь {заголовок: значение}).
+    """
+
+    text = io.TextIOWrapper(uploaded_file.file, encoding=encoding, newline='')
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+
+        reader = csv.DictReader(text, dialect=sniff_dialect(sample))
+        reader.fieldnames = [name.strip() for name in reader.fieldnames or []]
+
+        for row in reader:
+            if not any(value for value in row.values() if isinstance(value, str)):
+                continue
+            yield reader.line_num, row
+    finally:
+        # Файл загрузки закрывает Django, обертка не должна закрыть его раньше
+        text.detach()
+
+
+class PreloadedChoiceField(forms.ModelChoiceField):
+    """
+    Поле выбора связанного объекта из заранее загруженных объектов.
+    В отличие от ModelChoiceField не выполняет запрос на каждую строку импорта.
+    Объект указывается первичным ключом (как в выгрузке) или названием.
+    """
+
+    def __init__(self, queryset, objects, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+
+        model_object = self.objects.get(str(value).strip())
+        if model_object is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return model_object
+
+
+def choice_objects(queryset):
+    """
+    Объекты выбора: {первичный ключ или название: объект}
+    """
+
+    objects = {}
+    for model_object in queryset:
+        objects[str(model_object)] = model_object
+        objects[str(model_object.pk)] = model_object
+    return objects
+
+
+def import_form_class(form_class, showroom):
+    """
+    Форма импорта на основе формы раздела form_class:
+
+    - связанные объекты выбираются только из объектов автосалона showroom
+      и загружаются один раз на весь импорт;
+    - уникальность полей проверяется порциями (см. import_rows),
+      а не отдельным запросом на каждую строку;
+    - составные виджеты (например, номер телефона с кодом страны)
+      заменяются обычным текстовым полем.
+    """
+
+    attrs = {}
+    for name, field in form_class.base_fields.items():
+        if not isinstance(field, forms.ModelChoiceField):
+            continue
+
+        queryset = field.queryset
+        if any(model_field.name == 'showroom' for model_field in queryset.model._meta.fields):
+            queryset = queryset.filter(showroom=showroom)
+
+        attrs[name] = PreloadedChoiceField(
+            queryset,
+            choice_objects(queryset),
+            required=field.required,
+            label=field.label,
+            help_text=field.help_text
+        )
+
+    def __init__(self, *args, **kwargs):
+        form_class.__init__(self, *args, **kwargs)
+        for field in self.fields.values():
+            if isinstance(field.widget, forms.MultiWidget):
+                field.widget = forms.TextInput()
+
+    def validate_unique(self):
+        pass
+
+    attrs.update(__init__=__init__, validate_unique=validate_unique)
+    return type(f'Import{form_class.__name__}', (form_class,), attrs)
+
+
+def import_columns(form_class):
+    """
+    Соответствие заголовков колонок CSV полям формы.
+    Колонка может называться как поле модели или как его заголовок в выгрузке.
+    """
+
+    model = form_class._meta.model
+    columns = {}
+    for name in form_class.base_fields:
+        columns[name] = name
+        try:
+            columns[str(model._meta.get_field(name).verbose_name)] = name
+        except FieldDoesNotExist:
+            pass
+    return columns
+
+
+def unique_fields(form_class):
+    model = form_class._meta.model
+    return [
+        field for field in model._meta.concrete_fields
+        if field.unique and not field.primary_key and field.name in form_class.base_fields
+    ]
+
+
+def form_errors(form):
+    """
+    Ошибки формы списком сообщений с названиями полей
+    """
+
+    messages = []
+    for name, field_errors in form.errors.items():
+        field = form.fields.get(name)
+        for message in field_errors:
+            messages.append(f'{field.label}: {message}' if field else message)
+    return messages
+
+
+def import_rows(showroom, form_class, rows, chunk_size=500, max_errors=100):
+    """
+    Импортирует строки rows - пары (номер строки, {колонка: значение}) -
+    в модель формы раздела form_class автосалона showroom.
+
+    Строки проверяются правилами формы порциями по chunk_size: уникальные поля
+    проверяются одним запросом на порцию, правильные строки порции сохраняются
+    одним bulk_create. Неправильные строки пропускаются.
+
+    Возвращает (кол-во созданных объектов, ошибки),
+    где ошибки - не больше max_errors пар (номер строки, [сообщения]).
+    """
+
+    model = form_class._meta.model
+    import_form = import_form_class(form_class, showroom)
+    columns = import_columns(form_class)
+    unique = unique_fields(form_class)
+
+    created = 0
+    errors = []
+    taken = {field.name: set() for field in unique}
+
+    for chunk in batches(rows, chunk_size):
+        chunk = [
+            (number, {columns[column]: value for column, value in row.items() if column in columns})
+            for number, row in chunk
+        ]
+
+        for field in unique:
+            values = {data[field.name].strip() for _, data in chunk if data.get(field.name)}
+            taken[field.name].update(
+                model.objects.filter(**{f'{field.name}__in': values}).values_list(field.name, flat=True)
+            )
+
+        objects = []
+        for number, data in chunk:
+            form = import_form(data=data)
+
+            if form.is_valid():
+                for field in unique:
+                    value = form.cleaned_data.get(field.name)
+                    if value in taken[field.name]:
+                        form.add_error(field.name, field.error_messages['unique'] % {
+                            'model_name': model._meta.verbose_name,
+                            'field_label': field.verbose_name
+                        })
+                    elif value is not None:
+                        taken[field.name].add(value)
+
+            if not form.is_valid():
+                if len(errors) < max_errors:
+                    errors.append((number, form_errors(form)))
+                continue
+
+            model_object = form.save(commit=False)
+            model_object.showroom = showroom
+            objects.append(model_object)
+
+        model.objects.bulk_create(objects)
+        created += len(objects)
+
+    if created:
+        # bulk_create не отправляет сигналы, поэтому поколение статистики обновляется явно
+        models.Showroom.bump_generation(showroom.pk)
+
+    return created, errors
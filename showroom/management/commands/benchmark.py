@@ -0,0 +1,168 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from showroom import benchmarks, dataset
+
+
+class Command(BaseCommand):
+    help = 'Замеры производительности вычисления статистики и оформления продаж'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help='Кол-ва строк продаж в тестовых автосалонах набора данных generate_dataset (откатываются после замера).'
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Кол-во повторов каждого замера.')
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed набора данных для замеров статистики и продаж. Набор данных не должен быть создан.'
+        )
+        parser.add_argument(
+            '--checkout',
+            type=int,
+            metavar='SALES',
+            help='Вместо статистики замерить оформление SALES продаж для корзин разного размера.'
+        )
+        parser.add_argument(
+            '--api',
+            type=int,
+            metavar='SALES',
+            help='Вместо статистики замерить оформление SALES продаж через JSON API кассовых терминалов.'
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=1,
+            help='Кол-во продаж в одном запросе к API при замере --api.'
+        )
+        parser.add_argument(
+            '--lines',
+            nargs='+',
+            type=int,
+            default=[1, 5, 20],
+            help='Кол-ва строк в корзине для замера оформления продаж (в том числе через API).'
+        )
+        parser.add_argument(
+            '--suite',
+            action='store_true',
+            help='Замерить страницы, статистику разделов и продажу товара на наборе данных generate_dataset.'
+        )
+        parser.add_argument(
+            '--dataset-seed',
+            type=int,
+            default=0,
+            help='Seed набора данных для --suite. Если набор данных не создан, он создается.'
+        )
+        parser.add_argument(
+            '--dataset-size',
+            type=int,
+            default=100_000,
+            help='Кол-во строк продаж в создаваемом для --suite наборе данных.'
+        )
+        parser.add_argument('--warmup', type=int, default=1, help='Кол-во повторов --suite без замера.')
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Не сбрасывать кэш статистики между повторами --suite (по умолчанию статистика вычисляется заново).'
+        )
+        parser.add_argument('--output', help='Файл для записи результатов --suite в JSON.')
+        parser.add_argument(
+            '--compare',
+            nargs=2,
+            metavar=('BASE', 'CURRENT'),
+            help='Сравнить два JSON-файла результатов --suite.'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.1,
+            help='Допустимое замедление p50 при --compare (доля, по умолчанию 0.1).'
+        )
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            self.compare(*options['compare'], threshold=options['threshold'])
+            return
+
+        if options['suite']:
+            showroom = benchmarks.load_dataset_showroom(
+                options['dataset_seed'],
+                options['dataset_size'],
+                write=self.stdout.write
+            )
+            results = benchmarks.run_suite(
+                showroom,
+                repeat=options['repeat'],
+                warmup=options['warmup'],
+                cold=not options['warm_cache'],
+                write=self.stdout.write
+            )
+            if options['output']:
+                benchmarks.write_results(results, options['output'])
+                self.stdout.write(f"Результаты записаны в {options['output']}")
+            return
+
+        username = dataset.owner_username(options['seed'])
+        if get_user_model().objects.filter(username=username).exists():
+            raise CommandError(
+                f'Набор данных с seed {options["seed"]} уже создан (владелец {username}). '
+                'Укажите другой --seed или замерьте его с --suite --dataset-seed.'
+            )
+
+        if options['api']:
+            benchmarks.benchmark_api(
+                sales=options['api'],
+                lines=options['lines'],
+                batch=options['batch'],
+                seed=options['seed'],
+                write=self.stdout.write
+            )
+            return
+
+        if options['checkout']:
+            benchmarks.benchmark_checkout(
+                sales=options['checkout'],
+                lines=options['lines'],
+                seed=options['seed'],
+                write=self.stdout.write
+            )
+            return
+
+        benchmarks.benchmark_statistics(
+            sizes=options['sizes'],
+            repeat=options['repeat'],
+            seed=options['seed'],
+            write=self.stdout.write
+        )
+
+    def compare(self, base_path, current_path, threshold):
+        try:
+            base = benchmarks.read_results(base_path)
+            current = benchmarks.read_results(current_path)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать результаты: {error}')
+
+        def value(number, pattern):
+            return '-' if number is None else format(number, pattern)
+
+        self.stdout.write(f"{base['meta'].get('commit')} -> {current['meta'].get('commit')}")
+        self.stdout.write(
+            f"{'case':<40} {'p50 before':>11} {'p50 after':>11} {'change':>8} {'queries':>9} {'status':>8}"
+        )
+
+        rows = benchmarks.compare_results(base, current, threshold)
+        for name, before, after, change, queries_before, queries_after, status in rows:
+            self.stdout.write(
+                f'{name:<40} {value(before, ".1f"):>11} {value(after, ".1f"):>11} '
+                f'{value(change, "+.0%"):>8} {value(queries_before, "d"):>4}->{value(queries_after, "d"):<4} '
+                f'{status:>8}'
+            )
+
+        slower = [row[0] for row in rows if row[-1] == 'slower']
+        if slower:
+            raise CommandError(f'Замедлились: {", ".join(slower)}')
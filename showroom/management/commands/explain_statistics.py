@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from showroom import dataset, explain, models
+from showroom.views import statistics_models
+
+
+class Command(BaseCommand):
+    help = 'Планы выполнения (EXPLAIN) основных запросов статистики автосалона и поиск полных просмотров таблиц'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--showroom', help='Ссылка (slug) автосалона.')
+        parser.add_argument(
+            '--dataset-seed',
+            type=int,
+            default=0,
+            help='Если автосалон не указан - последний автосалон набора данных generate_dataset с этим seed.'
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=10_000,
+            help='Не учитывать полные просмотры таблиц меньше этого кол-ва строк.'
+        )
+        parser.add_argument('--plans', action='store_true', help='Выводить SQL и план каждого запроса.')
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдены полные просмотры таблиц.'
+        )
+
+    def get_showroom(self, options):
+        showrooms = models.Showroom.objects.all()
+        if options['showroom']:
+            showroom = showrooms.filter(slug=options['showroom']).first()
+        else:
+            showroom = showrooms.filter(
+                owner__username=dataset.owner_username(options['dataset_seed'])
+            ).order_by('-pk').first()
+
+        if showroom is None:
+            raise CommandError(
+                'Автосалон не найден. Укажите --showroom или создайте набор данных командой generate_dataset: '
+                'на маленьких таблицах планировщик выбирает полный просмотр независимо от индексов.'
+            )
+        return showroom
+
+    def handle(self, *args, **options):
+        showroom = self.get_showroom(options)
+        self.stdout.write(f'Автосалон {showroom.slug} ({showroom})')
+
+        report = explain.explain_statistics(showroom, statistics_models, options['min_rows'])
+
+        scans = 0
+        for scenario, queries in report.items():
+            scenario_scans = [scan for _, _, query_scans in queries for scan in query_scans]
+            scans += len(scenario_scans)
+
+            status = self.style.ERROR('FULL SCAN') if scenario_scans else self.style.SUCCESS('OK')
+            self.stdout.write(f'{scenario:<32} запросов {len(queries):>3}  {status}')
+
+            for sql, plan, query_scans in queries:
+                if options['plans'] or query_scans:
+                    self.stdout.write(f'    {sql}')
+                    lines = plan if options['plans'] else [line for _, line in query_scans]
+                    for line in lines:
+                        self.stdout.write(f'      {line}')
+
+        if scans and options['fail_on_scan']:
+            raise CommandError(f'Найдено полных просмотров таблиц: {scans}')
+        self.stdout.write(f'Полных просмотров таблиц: {scans}')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+class Command(BaseCommand):
+    help = (
+        'Отмечает примененными начальные миграции (0001_initial) приложений, все таблицы которых уже существуют. '
+        'Нужна базам данных, созданным до появления миграций в репозитории: migrate --fake-initial '
+        'в них останавливается на проверке истории (admin.0001_initial применена раньше account.0001_initial). '
+        'После команды выполните migrate и rebuild_statistics --costs.'
+    )
+
+    # В порядке зависимостей: от пользователя account зависят admin и showroom
+    app_labels = ['account', 'showroom']
+    initial_migration = '0001_initial'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='База данных (по умолчанию default).')
+
+    def handle(self, *args, **options):
+        # В отличие от migrate, MigrationExecutor не проверяет согласованность истории миграций
+        executor = MigrationExecutor(connections[options['database']])
+        applied = executor.recorder.applied_migrations()
+
+        for app_label in self.app_labels:
+            key = (app_label, self.initial_migration)
+            if key in applied:
+                self.stdout.write(f'{app_label}.{self.initial_migration}: уже применена')
+                continue
+
+            soft_applied, _ = executor.detect_soft_applied(None, executor.loader.get_migration(*key))
+            if not soft_applied:
+                self.stdout.write(f'{app_label}.{self.initial_migration}: таблиц нет, ее применит migrate')
+                continue
+
+            executor.recorder.record_applied(*key)
+            self.stdout.write(self.style.SUCCESS(f'{app_label}.{self.initial_migration}: отмечена примененной'))
@@ -0,0 +1,90 @@
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from showroom import dataset
+
+
+def scale(value):
+    """
+    Кол-во строк продаж: число или число с суффиксом k / M (например, 10k, 2.5M)
+    """
+
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    value = value.strip().replace('_', '')
+
+    try:
+        multiplier = multipliers.get(value[-1:].lower())
+        if multiplier:
+            count = int(float(value[:-1]) * multiplier)
+        else:
+            count = int(value)
+    except ValueError:
+        raise CommandError(f'Неверное кол-во строк продаж: {value}')
+
+    if count <= 0:
+        raise CommandError('Кол-во строк продаж должно быть больше нуля.')
+    return count
+
+
+class Command(BaseCommand):
+    help = 'Генерация воспроизводимого набора данных для замеров производительности'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sale_items',
+            type=scale,
+            help='Кол-во строк продаж во всех автосалонах: число или число с суффиксом k / M (1k - 10M).'
+        )
+        parser.add_argument('--showrooms', type=int, default=1, help='Кол-во автосалонов.')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора данных.')
+        parser.add_argument('--days', type=int, default=365, help='Кол-во дней истории продаж.')
+        parser.add_argument(
+            '--end-date',
+            type=date.fromisoformat,
+            help='Последний день истории продаж (ГГГГ-ММ-ДД). По умолчанию - сегодня.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Кол-во строк в одном INSERT.'
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Удалить ранее созданный набор данных с тем же seed.'
+        )
+        parser.add_argument(
+            '--password',
+            help='Пароль владельца автосалонов. По умолчанию войти под владельцем нельзя.'
+        )
+
+    def handle(self, *args, **options):
+        if options['showrooms'] < 1 or options['showrooms'] > options['sale_items']:
+            raise CommandError('Кол-во автосалонов должно быть от 1 до кол-ва строк продаж.')
+
+        if options['days'] < 1:
+            raise CommandError('Кол-во дней должно быть больше нуля.')
+
+        username = dataset.owner_username(options['seed'])
+        if options['replace']:
+            if dataset.delete_dataset(options['seed']):
+                self.stdout.write(f'Удален прежний набор данных владельца {username}')
+        elif get_user_model().objects.filter(username=username).exists():
+            raise CommandError(
+                f'Набор данных с seed {options["seed"]} уже создан (владелец {username}). '
+                'Укажите --replace или другой --seed.'
+            )
+
+        showrooms = dataset.generate_dataset(
+            sale_items=options['sale_items'],
+            showrooms=options['showrooms'],
+            seed=options['seed'],
+            days=options['days'],
+            end_date=options['end_date'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+            write=self.stdout.write
+        )
+        self.stdout.write(self.style.SUCCESS(f'Создано автосалонов: {len(showrooms)}, владелец {username}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from showroom import models
+
+
+class Command(BaseCommand):
+    help = 'Выпуск API-токена кассовых терминалов автосалона (предыдущий токен перестает действовать)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('showroom', help='Ссылка (slug) автосалона.')
+
+    def handle(self, *args, **options):
+        showroom = models.Showroom.objects.filter(slug=options['showroom']).first()
+        if showroom is None:
+            raise CommandError(f'Автосалон {options["showroom"]} не найден.')
+
+        self.stdout.write(showroom.issue_api_token())
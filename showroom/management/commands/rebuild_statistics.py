@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from showroom import costing, models, rollups
+
+
+class Command(BaseCommand):
+    help = 'Полный пересчет дневных сводок продаж и поставок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--showroom',
+            dest='showrooms',
+            action='append',
+            help='Ссылка (slug) автосалона. По умолчанию пересчитываются все автосалоны.'
+        )
+        parser.add_argument(
+            '--costs',
+            action='store_true',
+            help='Перед пересчетом сводок заново определить себестоимость всех продаж.'
+        )
+        parser.add_argument(
+            '--costing-method',
+            choices=list(costing.COSTING_METHODS),
+            help='Способ расчета себестоимости. По умолчанию - настройка SHOWROOM_COSTING_METHOD.'
+        )
+
+    def handle(self, *args, **options):
+        showrooms = models.Showroom.objects.all()
+        if options['showrooms']:
+            showrooms = showrooms.filter(slug__in=options['showrooms'])
+
+        for showroom in showrooms.iterator():
+            if options['costs']:
+                costing.recalculate_costs(showroom.pk, options['costing_method'])
+                self.stdout.write(f'{showroom.slug}: себестоимость пересчитана')
+
+            rollups.rebuild(showroom.pk)
+            models.Showroom.bump_generation(showroom.pk)
+            self.stdout.write(f'{showroom.slug}: сводки пересчитаны')
@@ -0,0 +1,240 @@
+# Generated by Django 4.2.5 on 2026-10-17 11:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealerDailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(editable=False, verbose_name='Дата')),
+                ('supplies_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во поставок')),
+                ('items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во поставленных позиций')),
+                ('quantity_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Кол-во единиц поставленного товара')),
+                ('price_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Стоимость поставленного товара')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка дилера',
+                'verbose_name_plural': 'Дневные сводки дилеров',
+            },
+        ),
+        migrations.CreateModel(
+            name='EmployeeDailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(editable=False, verbose_name='Дата')),
+                ('sales_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во продаж')),
+                ('items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во проданных позиций')),
+                ('price_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Сумма цен проданного товара')),
+                ('price_min', models.IntegerField(editable=False, null=True, verbose_name='Минимальная цена проданного товара')),
+                ('price_max', models.IntegerField(editable=False, null=True, verbose_name='Максимальная цена проданного товара')),
+                ('quantity_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Кол-во единиц проданного товара')),
+                ('quantity_min', models.IntegerField(editable=False, null=True, verbose_name='Минимальное кол-во за раз')),
+                ('quantity_max', models.IntegerField(editable=False, null=True, verbose_name='Максимальное кол-во за раз')),
+                ('revenue_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Оборот')),
+                ('costed_items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во позиций с известной себестоимостью')),
+                ('profit_sum', models.DecimalField(decimal_places=2, editable=False, max_digits=16, null=True, verbose_name='Выручка')),
+                ('profit_min', models.DecimalField(decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Минимальная выручка с позиции')),
+                ('profit_max', models.DecimalField(decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Максимальная выручка с позиции')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка сотрудника',
+                'verbose_name_plural': 'Дневные сводки сотрудников',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductCategoryDailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(editable=False, verbose_name='Дата')),
+                ('sales_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во продаж')),
+                ('items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во проданных позиций')),
+                ('price_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Сумма цен проданного товара')),
+                ('price_min', models.IntegerField(editable=False, null=True, verbose_name='Минимальная цена проданного товара')),
+                ('price_max', models.IntegerField(editable=False, null=True, verbose_name='Максимальная цена проданного товара')),
+                ('quantity_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Кол-во единиц проданного товара')),
+                ('quantity_min', models.IntegerField(editable=False, null=True, verbose_name='Минимальное кол-во за раз')),
+                ('quantity_max', models.IntegerField(editable=False, null=True, verbose_name='Максимальное кол-во за раз')),
+                ('revenue_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Оборот')),
+                ('costed_items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во позиций с известной себестоимостью')),
+                ('profit_sum', models.DecimalField(decimal_places=2, editable=False, max_digits=16, null=True, verbose_name='Выручка')),
+                ('profit_min', models.DecimalField(decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Минимальная выручка с позиции')),
+                ('profit_max', models.DecimalField(decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Максимальная выручка с позиции')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка категории',
+                'verbose_name_plural': 'Дневные сводки категорий',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(editable=False, verbose_name='Дата')),
+                ('sales_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во продаж')),
+                ('items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во проданных позиций')),
+                ('price_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Сумма цен проданного товара')),
+                ('price_min', models.IntegerField(editable=False, null=True, verbose_name='Минимальная цена проданного товара')),
+                ('price_max', models.IntegerField(editable=False, null=True, verbose_name='Максимальная цена проданного товара')),
+                ('quantity_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Кол-во единиц проданного товара')),
+                ('quantity_min', models.IntegerField(editable=False, null=True, verbose_name='Минимальное кол-во за раз')),
+                ('quantity_max', models.IntegerField(editable=False, null=True, verbose_name='Максимальное кол-во за раз')),
+                ('revenue_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Оборот')),
+                ('costed_items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во позиций с известной себестоимостью')),
+                ('profit_sum', models.DecimalField(decimal_places=2, editable=False, max_digits=16, null=True, verbose_name='Выручка')),
+                ('profit_min', models.DecimalField(decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Минимальная выручка с позиции')),
+                ('profit_max', models.DecimalField(decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Максимальная выручка с позиции')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка товара',
+                'verbose_name_plural': 'Дневные сводки товаров',
+            },
+        ),
+        migrations.CreateModel(
+            name='ShowroomDailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(editable=False, verbose_name='Дата')),
+                ('sales_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во продаж')),
+                ('items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во проданных позиций')),
+                ('price_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Сумма цен проданного товара')),
+                ('price_min', models.IntegerField(editable=False, null=True, verbose_name='Минимальная цена проданного товара')),
+                ('price_max', models.IntegerField(editable=False, null=True, verbose_name='Максимальная цена проданного товара')),
+                ('quantity_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Кол-во единиц проданного товара')),
+                ('quantity_min', models.IntegerField(editable=False, null=True, verbose_name='Минимальное кол-во за раз')),
+                ('quantity_max', models.IntegerField(editable=False, null=True, verbose_name='Максимальное кол-во за раз')),
+                ('revenue_sum', models.BigIntegerField(default=0, editable=False, verbose_name='Оборот')),
+                ('costed_items_count', models.IntegerField(default=0, editable=False, verbose_name='Кол-во позиций с известной себестоимостью')),
+                ('profit_sum', models.DecimalField(decimal_places=2, editable=False, max_digits=16, null=True, verbose_name='Выручка')),
+                ('profit_min', models.DecimalField(decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Минимальная выручка с позиции')),
+                ('profit_max', models.DecimalField(decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Максимальная выручка с позиции')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка автосалона',
+                'verbose_name_plural': 'Дневные сводки автосалонов',
+            },
+        ),
+        migrations.AddField(
+            model_name='dealer',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при каждом изменении записи. Используется для обнаружения одновременных изменений.', verbose_name='Версия записи'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при каждом изменении записи. Используется для обнаружения одновременных изменений.', verbose_name='Версия записи'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при каждом изменении записи. Используется для обнаружения одновременных изменений.', verbose_name='Версия записи'),
+        ),
+        migrations.AddField(
+            model_name='productcategory',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при каждом изменении записи. Используется для обнаружения одновременных изменений.', verbose_name='Версия записи'),
+        ),
+        migrations.AddField(
+            model_name='productsaleitem',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, help_text='Определяется автоматически при продаже по партиям поставок товара.', max_digits=12, null=True, verbose_name='Себестоимость единицы товара'),
+        ),
+        migrations.AddField(
+            model_name='productsupplyitem',
+            name='quantity_left',
+            field=models.IntegerField(blank=True, editable=False, help_text='Кол-во товара поставки, еще не списанное продажами.', null=True, verbose_name='Остаток товара поставки'),
+        ),
+        migrations.AddField(
+            model_name='showroom',
+            name='api_token_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 от API-токена кассовых терминалов автосалона. Сам токен не хранится.', max_length=64, null=True, unique=True, verbose_name='Хэш API-токена'),
+        ),
+        migrations.AddField(
+            model_name='showroom',
+            name='statistics_generation',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Увеличивается при каждом изменении данных, влияющих на статистику автосалона.', verbose_name='Поколение статистики'),
+        ),
+        migrations.AddField(
+            model_name='showroom',
+            name='statistics_modified',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Время последнего увеличения поколения статистики.', null=True, verbose_name='Дата изменения статистики'),
+        ),
+        migrations.AddField(
+            model_name='showroom',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при каждом изменении записи. Используется для обнаружения одновременных изменений.', verbose_name='Версия записи'),
+        ),
+        migrations.AddField(
+            model_name='showroomdailystatistics',
+            name='showroom',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_statistics', to='showroom.showroom', verbose_name='Автосалон'),
+        ),
+        migrations.AddField(
+            model_name='productdailystatistics',
+            name='product',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_statistics', to='showroom.product', verbose_name='Товар'),
+        ),
+        migrations.AddField(
+            model_name='productdailystatistics',
+            name='showroom',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='showroom.showroom', verbose_name='Автосалон'),
+        ),
+        migrations.AddField(
+            model_name='productcategorydailystatistics',
+            name='category',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_statistics', to='showroom.productcategory', verbose_name='Категория'),
+        ),
+        migrations.AddField(
+            model_name='productcategorydailystatistics',
+            name='showroom',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='showroom.showroom', verbose_name='Автосалон'),
+        ),
+        migrations.AddField(
+            model_name='employeedailystatistics',
+            name='employee',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_statistics', to='showroom.employee', verbose_name='Сотрудник'),
+        ),
+        migrations.AddField(
+            model_name='employeedailystatistics',
+            name='showroom',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='showroom.showroom', verbose_name='Автосалон'),
+        ),
+        migrations.AddField(
+            model_name='dealerdailystatistics',
+            name='dealer',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_statistics', to='showroom.dealer', verbose_name='Дилер'),
+        ),
+        migrations.AddField(
+            model_name='dealerdailystatistics',
+            name='showroom',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='showroom.showroom', verbose_name='Автосалон'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='showroomdailystatistics',
+            unique_together={('showroom', 'date')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='productdailystatistics',
+            unique_together={('product', 'date')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='productcategorydailystatistics',
+            unique_together={('category', 'date')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='employeedailystatistics',
+            unique_together={('employee', 'date')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='dealerdailystatistics',
+            unique_together={('dealer', 'date')},
+        ),
+    ]
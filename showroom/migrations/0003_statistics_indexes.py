@@ -0,0 +1,57 @@
+# Generated by Django 4.2.5 on 2026-10-17 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('showroom', '0002_statistics_rollups_and_costing'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productsale',
+            index=models.Index(fields=['showroom', 'date_created'], name='sale_showroom_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsale',
+            index=models.Index(fields=['employee', 'date_created'], name='sale_employee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsaleitem',
+            index=models.Index(fields=['product', 'date_created'], name='sale_item_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsaleitem',
+            index=models.Index(fields=['date_created'], name='sale_item_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsupply',
+            index=models.Index(fields=['showroom', 'date_created'], name='supply_showroom_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsupply',
+            index=models.Index(fields=['dealer', 'date_created'], name='supply_dealer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsupplyitem',
+            index=models.Index(fields=['product', 'date_created'], name='supply_item_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productdailystatistics',
+            index=models.Index(fields=['showroom', 'date'], name='product_daily_showroom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcategorydailystatistics',
+            index=models.Index(fields=['showroom', 'date'], name='category_daily_showroom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employeedailystatistics',
+            index=models.Index(fields=['showroom', 'date'], name='employee_daily_showroom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dealerdailystatistics',
+            index=models.Index(fields=['showroom', 'date'], name='dealer_daily_showroom_idx'),
+        ),
+    ]
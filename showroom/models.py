@@ -1,6 +1,10 @@
+import hashlib
 import random
+import secrets
+from functools import partial
 from uuid import uuid4
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Now
 from datetime import datetime, timedelta
 from django.apps import apps
 from django.utils.timezone import (
@@ -8,6 +12,22 @@ from django.utils.timezone import (
 )
 from django.core.validators import MinValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
+from . import costing, events
+from .caching import statistics_cache
+from .profiling import statistics_scope
+from .statistics import (
+    StatisticsGroup,
+    compute_statistics,
+    row_annotations,
+    daily_sales_fields,
+    sale_profit,
+)
+
+
+class ConcurrentUpdateError(Exception):
+    """
+    Объект был изменен в базе данных после того, как был прочитан
+    """
 
 
 def random_slug_number():
@@ -16,22 +36,47 @@ def random_slug_number():
 
 class StatisticsQuerySet(models.QuerySet):
     """
-    Описание
+    Выборка объектов модели статистики
     """
 
-    def statistics(self, verbose_names=False):
-        statistics_fields = self.model.statistics_fields
-        statistics_fields_verbose_names = self.model.statistics_fields_verbose_names
+    def statistics(
+            self,
+            verbose_names=False,
+            showroom=None,
+            date_from=None,
+            date_to=None,
+            granularity=None,
+            compare=False
+    ):
+        """
+        Статистика по объектам выборки.
+        Если указан автосалон, к которому относится выборка, результат кэшируется
+        до следующего изменения данных автосалона.
+
+        date_from и date_to ограничивают период, по которому считаются метрики.
+        Если указана разбивка granularity (day, week, month или quarter),
+        вместо итоговых значений возвращается временной ряд по каждой метрике.
+        Если указан compare, каждая метрика сравнивается со своим значением
+        за предыдущий период той же длины (date_from и date_to обязательны).
+        """
 
-        queryset = self.filter()
-
-        if statistics_fields and isinstance(statistics_fields, dict):
-            statistics = queryset.aggregate(
-                **statistics_fields
-            )
+        statistics_fields_verbose_names = self.model.statistics_fields_verbose_names
+        compute = partial(
+            compute_statistics,
+            date_from=date_from,
+            date_to=date_to,
+            granularity=granularity,
+            compare=compare
+        )
 
+        if showroom is not None:
+            metric_set = 'all'
+            if date_from or date_to or granularity or compare:
+                metric_set = f'period:{date_from}:{date_to}:{granularity}:{compare}'
+            statistics = statistics_cache.get_or_compute(self, showroom, compute, metric_set)
         else:
-            statistics = {}
+            with statistics_scope(self):
+                statistics = compute(self)
 
         if verbose_names and statistics_fields_verbose_names:
             new_dict = {}
@@ -42,6 +87,18 @@ class StatisticsQuerySet(models.QuerySet):
 
         return statistics
 
+    def with_statistics(self, names=None):
+        """
+        Добавляет к каждому объекту выборки значения метрик names
+        (по умолчанию - statistics_row_fields модели).
+        Метрики вычисляются коррелированными подзапросами внутри того же запроса,
+        поэтому по ним можно сортировать на стороне базы данных.
+        """
+
+        if names is None:
+            names = self.model.statistics_row_fields or []
+        return self.annotate(**row_annotations(self.model, names))
+
 
 class StatisticsManager(models.Manager):
     """
@@ -51,8 +108,11 @@ class StatisticsManager(models.Manager):
     def get_queryset(self):
         return StatisticsQuerySet(self.model, using=self._db)
 
-    def statistics(self, verbose_names=False):
-        return self.get_queryset().statistics(verbose_names)
+    def statistics(self, verbose_names=False, showroom=None, **period):
+        return self.get_queryset().statistics(verbose_names, showroom, **period)
+
+    def with_statistics(self, names=None):
+        return self.get_queryset().with_statistics(names)
 
 
 class AbstractStatisticsModel(models.Model):
@@ -61,7 +121,10 @@ class AbstractStatisticsModel(models.Model):
     """
 
     statistics_filter_fields = ['date_created']
-    statistics_fields = None
+    statistics_groups = None
+    statistics_row_fields = None
+    statistics_headline_fields = None
+    statistics_leaderboard_field = None
     statistics_parent = False
     statistics_fields_verbose_names = None
 
@@ -87,11 +150,66 @@ class AbstractStatisticsModel(models.Model):
         }
     )
 
+    version = models.PositiveIntegerField(
+        default=0,
+        null=False,
+        blank=False,
+        editable=False,
+        verbose_name='Версия записи',
+        help_text='Увеличивается при каждом изменении записи. Используется для обнаружения одновременных изменений.'
+    )
+
     objects = StatisticsManager()
 
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        # ConcurrentUpdateError выбрасывается внутри сохранения и помечает транзакцию
+        # для отката, поэтому обновление выполняется в отдельной точке сохранения:
+        # после конфликта внешняя транзакция остается рабочей
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        """
+        Оптимистичная блокировка: запись обновляется, только если ее версия
+        в базе данных совпадает с прочитанной (UPDATE ... WHERE version = n).
+        Иначе выбрасывается ConcurrentUpdateError.
+        """
+
+        version_field = self._meta.get_field('version')
+
+        # save(update_fields=...) без версии (например, служебных полей) не проверяет версию
+        if not any(field is version_field for field, _, _ in values):
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+        current_version = self.version
+        values = [
+            (field, model, current_version + 1 if field is version_field else value)
+            for field, model, value in values
+        ]
+
+        updated = super()._do_update(
+            base_qs.filter(version=current_version),
+            using,
+            pk_val,
+            values,
+            update_fields,
+            forced_update
+        )
+
+        if updated:
+            self.version = current_version + 1
+            return True
+
+        if base_qs.filter(pk=pk_val).exists():
+            raise ConcurrentUpdateError(f'Запись "{self}" была изменена после того, как была прочитана.')
+        return False
+
     @classmethod
     def statistic_models(cls):
         return [subclass for subclass in cls.__subclasses__() if not subclass.statistics_parent]
@@ -106,27 +224,13 @@ class AbstractStatisticsModel(models.Model):
         date_value = self.date_created.value_from_object(self)
         return datetime.now(tz=get_current_timezone()) - date_value
 
-    def statistics(self, verbose_names=False):
-        queryset = self.objects.filter(pk=self.pk)
-
-        if self.statistics_fields and isinstance(self.statistics_fields, dict):
-            statistics = queryset.aggregate(
-                **self.statistics_fields
-            )
-
-        else:
-            statistics = {
-
-            }
-
-        if verbose_names and self.statistics_fields_verbose_names:
-            new_dict = {}
-            for key, val in statistics.items():
-                verbose_key = self.statistics_fields_verbose_names.get(key) or key
-                new_dict[verbose_key] = val
-            return new_dict
+    @property
+    def statistics_showroom(self):
+        return self.showroom
 
-        return statistics
+    def statistics(self, verbose_names=False, **period):
+        queryset = type(self).objects.filter(pk=self.pk)
+        return queryset.statistics(verbose_names, showroom=self.statistics_showroom, **period)
 
 
 class Showroom(AbstractStatisticsModel):
@@ -157,6 +261,8 @@ class Showroom(AbstractStatisticsModel):
         'sales_products_quantity_min': 'Минимальное кол-во единиц проданного товара за раз',
         'sales_products_quantity_max': 'Максимальное кол-во единиц проданного товара за раз',
 
+        'sales_revenue': 'Оборот (сумма продаж)',
+
         'sales_profit_avg': 'Средняя выручка',
         'sales_profit_sum': 'Максимальная выручка',
         'sales_profit_min': 'Минимальная выручка',
@@ -165,91 +271,21 @@ class Showroom(AbstractStatisticsModel):
 
     }
 
-    statistics_fields = {
-        # Подсчет кол-ва аттрибутов
-        'sales_count': models.ExpressionWrapper(
-            models.Count('sales'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_count': models.ExpressionWrapper(
-            models.Count('sales__sold_products'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по цене проданного товара
-        'sales_products_price_avg': models.ExpressionWrapper(
-            models.Avg('sales__sold_products__sale_price'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_products_price_sum': models.ExpressionWrapper(
-            models.Sum('sales__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_price_min': models.ExpressionWrapper(
-            models.Min('sales__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_price_max': models.ExpressionWrapper(
-            models.Max('sales__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по кол-ву проданного товара
-        'sales_products_quantity_avg': models.ExpressionWrapper(
-            models.Avg('sales__sold_products__quantity'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_products_quantity_sum': models.ExpressionWrapper(
-            models.Sum('sales__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_quantity_min': models.ExpressionWrapper(
-            models.Min('sales__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_quantity_max': models.ExpressionWrapper(
-            models.Max('sales__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по выручке
-        'sales_profit_avg': models.ExpressionWrapper(
-            models.Avg(
-                (
-                    models.F('sales__sold_products__product__supplied_products__supply_price')
-                    - models.F('sales__sold_products__sale_price')
-                ) * models.F('sales__sold_products__quantity')
-            ),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_profit_sum': models.ExpressionWrapper(
-            models.Sum(
-                (
-                        models.F('sales__sold_products__product__supplied_products__supply_price')
-                        - models.F('sales__sold_products__sale_price')
-                ) * models.F('sales__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
-        ),
-        'sales_profit_max': models.ExpressionWrapper(
-            models.Max(
-                (
-                        models.F('sales__sold_products__product__supplied_products__supply_price')
-                        - models.F('sales__sold_products__sale_price')
-                ) * models.F('sales__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
+    statistics_groups = [
+        StatisticsGroup(
+            'showroom.ShowroomDailyStatistics',
+            lookup='showroom',
+            showroom_lookup='showroom',
+            fields=daily_sales_fields(
+                sales_count='sales_count',
+                items_count='sales_products_count',
+                price='sales_products_price',
+                quantity='sales_products_quantity',
+                revenue='sales_revenue',
+                profit='sales_profit'
+            )
         ),
-        'sales_profit_min': models.ExpressionWrapper(
-            models.Min(
-                (
-                        models.F('sales__sold_products__product__supplied_products__supply_price')
-                        - models.F('sales__sold_products__sale_price')
-                ) * models.F('sales__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
-        )
-    }
+    ]
 
     title = models.CharField(
         verbose_name='Название',
@@ -310,9 +346,104 @@ class Showroom(AbstractStatisticsModel):
         }
     )
 
+    statistics_generation = models.PositiveBigIntegerField(
+        default=0,
+        null=False,
+        blank=False,
+        editable=False,
+        verbose_name='Поколение статистики',
+        help_text='Увеличивается при каждом изменении данных, влияющих на статистику автосалона.'
+    )
+
+    statistics_modified = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Дата изменения статистики',
+        help_text='Время последнего увеличения поколения статистики.'
+    )
+
+    api_token_hash = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        verbose_name='Хэш API-токена',
+        help_text='SHA-256 от API-токена кассовых терминалов автосалона. Сам токен не хранится.'
+    )
+
     def __str__(self):
         return self.title
 
+    # Служебные поля обновляются отдельными UPDATE (bump_generation),
+    # сохранение формы с прочитанными ранее значениями не должно их откатывать
+    statistics_state_fields = ['statistics_generation', 'statistics_modified']
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.statistics_state_fields
+            ]
+        return super().save(*args, **kwargs)
+
+    @property
+    def statistics_last_modified(self):
+        return self.statistics_modified or self.date_modified
+
+    def statistics_etag(self, *parts):
+        """
+        Отпечаток состояния автосалона для условных HTTP-запросов.
+        Меняется при любом изменении данных статистики (поколение) и самого автосалона (версия).
+        parts - то, от чего еще зависит ответ (адрес, параметры, пользователь).
+        """
+
+        key = ':'.join(map(str, (self.pk, self.statistics_generation, self.version, *parts)))
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    @staticmethod
+    def hash_api_token(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def issue_api_token(self):
+        """
+        Выпускает новый API-токен автосалона (предыдущий перестает действовать)
+        и возвращает его. Токен показывается один раз - в базе данных хранится только его хэш.
+        """
+
+        token = secrets.token_urlsafe(32)
+        self.api_token_hash = self.hash_api_token(token)
+        self.save(update_fields=['api_token_hash'])
+        return token
+
+    @property
+    def statistics_showroom(self):
+        return self
+
+    def bump_statistics_generation(self):
+        type(self).bump_generation(self.pk)
+        self.refresh_statistics_generation()
+
+    def refresh_statistics_generation(self):
+        """
+        Перечитывает поколение статистики из базы данных. Увеличить его на месте нельзя:
+        другие записи могли изменить поколение, и ключ совпал бы со старым значением кэша.
+        """
+
+        self.refresh_from_db(fields=self.statistics_state_fields)
+
+    @classmethod
+    def bump_generation(cls, showroom_id):
+        """
+        Делает устаревшими все закэшированные значения статистики автосалона
+        """
+
+        cls.objects.filter(pk=showroom_id).update(
+            statistics_generation=models.F('statistics_generation') + 1,
+            statistics_modified=Now()
+        )
+
     class Meta:
         verbose_name = 'Автосалон'
         verbose_name_plural = 'Автосалоны'
@@ -333,6 +464,20 @@ class Employee(AbstractStatisticsModel):
 
     related_name = 'employees'
 
+    statistics_headline_fields = [
+        'sales_count',
+        'sales_revenue',
+    ]
+
+    statistics_leaderboard_field = 'sales_revenue'
+
+    statistics_row_fields = [
+        'sales_count',
+        'sales_revenue',
+        'sales_products_quantity_sum',
+        'sales_profit_sum',
+    ]
+
     statistics_fields_verbose_names = {
         'sales_count': 'Кол-во продаж',
         'sales_products_count': 'Кол-во разных проданных товаров',
@@ -347,6 +492,8 @@ class Employee(AbstractStatisticsModel):
         'sales_products_quantity_min': 'Минимальное кол-во единиц проданного товара за раз',
         'sales_products_quantity_max': 'Максимальное кол-во единиц проданного товара за раз',
 
+        'sales_revenue': 'Оборот (сумма продаж)',
+
         'sales_profit_avg': 'Средняя выручка с продаваемого товара',
         'sales_profit_sum': 'Суммарная выручка с продаваемого товара',
         'sales_profit_min': 'Средняя выручка с продаваемого товара',
@@ -354,91 +501,21 @@ class Employee(AbstractStatisticsModel):
 
     }
 
-    statistics_fields = {
-        # Подсчет кол-ва аттрибутов
-        'sales_count': models.ExpressionWrapper(
-            models.Count('sales'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_count': models.ExpressionWrapper(
-            models.Count('sales__sold_products'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по цене проданного товара
-        'sales_products_price_avg': models.ExpressionWrapper(
-            models.Avg('sales__sold_products__sale_price'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_products_price_sum': models.ExpressionWrapper(
-            models.Sum('sales__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_price_min': models.ExpressionWrapper(
-            models.Min('sales__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_price_max': models.ExpressionWrapper(
-            models.Max('sales__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по кол-ву проданного товара
-        'sales_products_quantity_avg': models.ExpressionWrapper(
-            models.Avg('sales__sold_products__quantity'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_products_quantity_sum': models.ExpressionWrapper(
-            models.Sum('sales__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_quantity_min': models.ExpressionWrapper(
-            models.Min('sales__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'sales_products_quantity_max': models.ExpressionWrapper(
-            models.Max('sales__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по выручке
-        'sales_profit_avg': models.ExpressionWrapper(
-            models.Avg(
-                (
-                    models.F('sales__sold_products__product__supplied_products__supply_price')
-                    - models.F('sales__sold_products__sale_price')
-                ) * models.F('sales__sold_products__quantity')
-            ),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_profit_sum': models.ExpressionWrapper(
-            models.Sum(
-                (
-                        models.F('sales__sold_products__product__supplied_products__supply_price')
-                        - models.F('sales__sold_products__sale_price')
-                ) * models.F('sales__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
-        ),
-        'sales_profit_max': models.ExpressionWrapper(
-            models.Max(
-                (
-                        models.F('sales__sold_products__product__supplied_products__supply_price')
-                        - models.F('sales__sold_products__sale_price')
-                ) * models.F('sales__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
+    statistics_groups = [
+        StatisticsGroup(
+            'showroom.EmployeeDailyStatistics',
+            lookup='employee',
+            showroom_lookup='showroom',
+            fields=daily_sales_fields(
+                sales_count='sales_count',
+                items_count='sales_products_count',
+                price='sales_products_price',
+                quantity='sales_products_quantity',
+                revenue='sales_revenue',
+                profit='sales_profit'
+            )
         ),
-        'sales_profit_min': models.ExpressionWrapper(
-            models.Min(
-                (
-                        models.F('sales__sold_products__product__supplied_products__supply_price')
-                        - models.F('sales__sold_products__sale_price')
-                ) * models.F('sales__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
-        )
-    }
+    ]
 
     first_name = models.CharField(
         verbose_name='Имя',
@@ -548,6 +625,20 @@ class ProductCategory(AbstractStatisticsModel):
 
     related_name = 'product_categories'
 
+    statistics_headline_fields = [
+        'products_count',
+        'sales_revenue',
+    ]
+
+    statistics_leaderboard_field = 'sales_profit_sum'
+
+    statistics_row_fields = [
+        'sales_count',
+        'sales_revenue',
+        'sales_quantity_sum',
+        'sales_profit_sum',
+    ]
+
     statistics_fields_verbose_names = {
         'products_count': 'Кол-во товаров всего',
         'sales_count': 'Кол-во проданных товаров',
@@ -562,96 +653,39 @@ class ProductCategory(AbstractStatisticsModel):
         'sales_quantity_min': 'Минимальное кол-во единиц заказываемого товара за раз',
         'sales_quantity_max': 'Максимальное кол-во единиц заказываемого товара за раз',
 
+        'sales_revenue': 'Оборот (сумма продаж)',
+
         'sales_profit_avg': 'Средняя выручка с продаваемого товара',
         'sales_profit_sum': 'Суммарная выручка с продаваемого товара',
         'sales_profit_min': 'Средняя выручка с продаваемого товара',
         'sales_profit_max': 'Средняя выручка с продаваемого товара',
     }
 
-    statistics_fields = {
-        'products_count': models.ExpressionWrapper(
-            models.Count('products'),
-            output_field=models.IntegerField()
-        ),
-        'sales_count': models.ExpressionWrapper(
-            models.Count('products__sold_products'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по цене продаваемого товара
-        'sales_price_sum': models.ExpressionWrapper(
-            models.Sum('products__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'sales_price_avg': models.ExpressionWrapper(
-            models.Avg('products__sold_products__sale_price'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_price_min': models.ExpressionWrapper(
-            models.Min('products__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'sales_price_max': models.ExpressionWrapper(
-            models.Max('products__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по кол-ву продаваемого товара
-        'sales_quantity_avg': models.ExpressionWrapper(
-            models.Avg('products__sold_products__quantity'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_quantity_sum': models.ExpressionWrapper(
-            models.Sum('products__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'sales_quantity_min': models.ExpressionWrapper(
-            models.Min('products__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'sales_quantity_max': models.ExpressionWrapper(
-            models.Max('products__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по выручке
-        'sales_profit_avg': models.ExpressionWrapper(
-            models.Avg(
-                (
-                    models.F('products__supplied_products__supply_price')
-                    - models.F('products__sold_products__sale_price')
-                ) * models.F('products__sold_products__quantity')
-            ),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_profit_sum': models.ExpressionWrapper(
-            models.Sum(
-                (
-                        models.F('products__supplied_products__supply_price')
-                        - models.F('products__sold_products__sale_price')
-                ) * models.F('products__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
+    statistics_groups = [
+        StatisticsGroup(
+            'showroom.Product',
+            lookup='category',
+            showroom_lookup='showroom',
+            fields={
+                'products_count': models.ExpressionWrapper(
+                    models.Count('pk'),
+                    output_field=models.IntegerField()
+                ),
+            }
         ),
-        'sales_profit_max': models.ExpressionWrapper(
-            models.Max(
-                (
-                        models.F('products__supplied_products__supply_price')
-                        - models.F('products__sold_products__sale_price')
-                ) * models.F('products__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
+        StatisticsGroup(
+            'showroom.ProductCategoryDailyStatistics',
+            lookup='category',
+            showroom_lookup='showroom',
+            fields=daily_sales_fields(
+                items_count='sales_count',
+                price='sales_price',
+                quantity='sales_quantity',
+                revenue='sales_revenue',
+                profit='sales_profit'
+            )
         ),
-        'sales_profit_min': models.ExpressionWrapper(
-            models.Min(
-                (
-                        models.F('products__supplied_products__supply_price')
-                        - models.F('products__sold_products__sale_price')
-                ) * models.F('products__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
-        )
-    }
+    ]
 
     name = models.CharField(
         max_length=70,
@@ -727,6 +761,20 @@ class Product(AbstractStatisticsModel):
 
     related_name = 'products'
 
+    statistics_headline_fields = [
+        'sales_quantity_sum',
+        'sales_revenue',
+    ]
+
+    statistics_leaderboard_field = 'sales_quantity_sum'
+
+    statistics_row_fields = [
+        'sales_count',
+        'sales_revenue',
+        'sales_quantity_sum',
+        'sales_profit_sum',
+    ]
+
     statistics_fields_verbose_names = {
         'product_count': 'Кол-во товаров всего',
         'sales_count': 'Кол-во проданных товаров',
@@ -741,97 +789,39 @@ class Product(AbstractStatisticsModel):
         'sales_quantity_min': 'Минимальное кол-во заказанного товара за раз',
         'sales_quantity_max': 'Максимальное кол-во заказанного товара за раз',
 
+        'sales_revenue': 'Оборот (сумма продаж)',
+
         'sales_profit_avg': 'Средняя выручка с продаваемого товара',
         'sales_profit_sum': 'Суммарная выручка с продаваемого товара',
         'sales_profit_min': 'Средняя выручка с продаваемого товара',
         'sales_profit_max': 'Средняя выручка с продаваемого товара',
     }
 
-    statistics_fields = {
-        'product_count': models.ExpressionWrapper(
-            models.Count('pk'),
-            output_field=models.IntegerField()
-        ),
-        'sales_count': models.ExpressionWrapper(
-            models.Count('sold_products'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по цене продаваемого товара
-        'sales_price_avg': models.ExpressionWrapper(
-            models.Avg('sold_products__sale_price'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_price_sum': models.ExpressionWrapper(
-            models.Sum('sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'sales_price_min': models.ExpressionWrapper(
-            models.Min('sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'sales_price_max': models.ExpressionWrapper(
-            models.Max('sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по кол-ву проданного товара
-        'sales_quantity_avg': models.ExpressionWrapper(
-            models.Avg('sold_products__quantity'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_quantity_sum': models.ExpressionWrapper(
-            models.Sum('sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'sales_quantity_min': models.ExpressionWrapper(
-            models.Min('sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'sales_quantity_max': models.ExpressionWrapper(
-            models.Max('sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по выручке
-        'sales_profit_avg': models.ExpressionWrapper(
-            models.Avg(
-                (
-                    models.F('supplied_products__supply_price')
-                    - models.F('sold_products__sale_price')
-                ) * models.F('sold_products__quantity')
-            ),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'sales_profit_sum': models.ExpressionWrapper(
-            models.Sum(
-                (
-                        models.F('supplied_products__supply_price')
-                        - models.F('sold_products__sale_price')
-                ) * models.F('sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
+    statistics_groups = [
+        StatisticsGroup(
+            'showroom.Product',
+            lookup='pk',
+            showroom_lookup='showroom',
+            fields={
+                'product_count': models.ExpressionWrapper(
+                    models.Count('pk'),
+                    output_field=models.IntegerField()
+                ),
+            }
         ),
-        'sales_profit_max': models.ExpressionWrapper(
-            models.Max(
-                (
-                        models.F('supplied_products__supply_price')
-                        - models.F('sold_products__sale_price')
-                ) * models.F('sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
+        StatisticsGroup(
+            'showroom.ProductDailyStatistics',
+            lookup='product',
+            showroom_lookup='showroom',
+            fields=daily_sales_fields(
+                items_count='sales_count',
+                price='sales_price',
+                quantity='sales_quantity',
+                revenue='sales_revenue',
+                profit='sales_profit'
+            )
         ),
-        'sales_profit_min': models.ExpressionWrapper(
-            models.Min(
-                (
-                        models.F('supplied_products__supply_price')
-                        - models.F('sold_products__sale_price')
-                ) * models.F('sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
-        )
-
-    }
+    ]
 
     price_min_validator = MinValueValidator(0)
 
@@ -929,26 +919,16 @@ class Product(AbstractStatisticsModel):
         return self.title
 
     def sell(self, quantity, employee=None, sale_object=None):
-        self.quantity -= quantity
-        self.save()
-
-        if not sale_object:
-            sale_model = apps.get_model('showroom', 'ProductSale')
-            sale_object = sale_model(
-                showroom=self.showroom,
-                employee=employee
-            )
-            sale_object.save()
+        """
+        Продажа одного товара. Несколько товаров продаются одной операцией
+        через services.checkout().
+        """
 
-        sale_item_model = apps.get_model('showroom', 'ProductSaleItem')
+        from .services import checkout
 
-        sale_item_object = sale_item_model(
-            product=self,
-            sale=sale_object,
-            quantity=quantity,
-            sale_price=self.price
-        )
-        sale_item_object.save()
+        sale_object = checkout(self.showroom, [(self, quantity)], employee=employee, sale=sale_object)
+        self.refresh_from_db(fields=['quantity', 'version'])
+        events.product_sold.send(sender=type(self), product=self, quantity=quantity)
         return sale_object
 
     class Meta:
@@ -1032,6 +1012,16 @@ class ProductSaleItem(models.Model):
         }
     )
 
+    unit_cost = models.DecimalField(
+        verbose_name='Себестоимость единицы товара',
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Определяется автоматически при продаже по партиям поставок товара.'
+    )
+
     date_created = models.DateTimeField(
         auto_now_add=True,
         null=False,
@@ -1044,12 +1034,24 @@ class ProductSaleItem(models.Model):
         }
     )
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self._state.adding and self.unit_cost is None:
+                costing.assign_cost(self)
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return str(self.product)
 
     class Meta:
         verbose_name = 'Товар продажи'
         verbose_name_plural = 'Товары продажи'
+        indexes = [
+            # История продаж товара и себестоимость в хронологическом порядке
+            models.Index(fields=['product', 'date_created'], name='sale_item_product_date_idx'),
+            # Пересчет дневных сводок за отдельные дни
+            models.Index(fields=['date_created'], name='sale_item_date_idx'),
+        ]
 
 
 class ProductSale(models.Model):
@@ -1117,6 +1119,10 @@ class ProductSale(models.Model):
     class Meta:
         verbose_name = 'Продажа'
         verbose_name_plural = 'Продажи'
+        indexes = [
+            models.Index(fields=['showroom', 'date_created'], name='sale_showroom_date_idx'),
+            models.Index(fields=['employee', 'date_created'], name='sale_employee_date_idx'),
+        ]
 
 
 class ProductSupplyItem(models.Model):
@@ -1193,6 +1199,14 @@ class ProductSupplyItem(models.Model):
         }
     )
 
+    quantity_left = models.IntegerField(
+        verbose_name='Остаток товара поставки',
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Кол-во товара поставки, еще не списанное продажами.'
+    )
+
     date_created = models.DateTimeField(
         auto_now_add=True,
         null=False,
@@ -1205,12 +1219,31 @@ class ProductSupplyItem(models.Model):
         }
     )
 
+    def save(self, *args, **kwargs):
+        if self.quantity_left is None:
+            self.quantity_left = self.quantity
+
+        elif not self._state.adding:
+            # Изменение кол-ва поставки меняет и ее остаток
+            previous_quantity = type(self).objects.filter(
+                pk=self.pk
+            ).values_list('quantity', flat=True).first()
+
+            if previous_quantity is not None:
+                self.quantity_left = max(self.quantity_left + self.quantity - previous_quantity, 0)
+
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return str(self.product)
 
     class Meta:
         verbose_name = 'Товар поставки'
         verbose_name_plural = 'Товары поставки'
+        indexes = [
+            # Партии товара в порядке поставки (списание по FIFO, цена последней поставки)
+            models.Index(fields=['product', 'date_created'], name='supply_item_product_date_idx'),
+        ]
 
 
 class ProductSupply(models.Model):
@@ -1276,6 +1309,10 @@ class ProductSupply(models.Model):
     class Meta:
         verbose_name = 'Поставка товаров'
         verbose_name_plural = 'Поставки товаров'
+        indexes = [
+            models.Index(fields=['showroom', 'date_created'], name='supply_showroom_date_idx'),
+            models.Index(fields=['dealer', 'date_created'], name='supply_dealer_date_idx'),
+        ]
 
 
 class Dealer(AbstractStatisticsModel):
@@ -1285,10 +1322,25 @@ class Dealer(AbstractStatisticsModel):
 
     related_name = 'dealers'
 
+    statistics_headline_fields = [
+        'supply_count',
+        'supply_product_count',
+    ]
+
+    statistics_leaderboard_field = 'supply_product_quantity_sum'
+
+    statistics_row_fields = [
+        'supply_sales_count',
+        'supply_sales_revenue',
+        'supply_sales_quantity_sum',
+        'supply_sales_profit_sum',
+    ]
+
     statistics_fields_verbose_names = {
         'dealers_count': 'Кол-во дилеров всего',
         'supply_count': 'Кол-во поставок',
         'supply_product_count': 'Кол-во поставленных товаров всего',
+        'supply_product_quantity_sum': 'Суммарное кол-во поставленного товара',
         'supply_sales_count': 'Кол-во проданных товаров с поставок',
 
         'supply_sales_price_avg': 'Средняя цена продаваемого товара',
@@ -1301,106 +1353,60 @@ class Dealer(AbstractStatisticsModel):
         'supply_sales_quantity_min': 'Минимальное кол-во заказанного товара за раз',
         'supply_sales_quantity_max': 'Максимальное кол-во заказанного товара за раз',
 
+        'supply_sales_revenue': 'Оборот по поставленным товарам',
+
         'supply_sales_profit_avg': 'Средняя выручка с продаваемого товара',
         'supply_sales_profit_sum': 'Суммарная выручка с продаваемого товара',
         'supply_sales_profit_min': 'Средняя выручка с продаваемого товара',
         'supply_sales_profit_max': 'Средняя выручка с продаваемого товара',
     }
 
-    statistics_fields = {
-        'dealers_count': models.ExpressionWrapper(
-            models.Count('pk'),
-            output_field=models.IntegerField()
-        ),
-
-        'supply_count': models.ExpressionWrapper(
-            models.Count('supplies'),
-            output_field=models.IntegerField()
-        ),
-        'supply_product_count': models.ExpressionWrapper(
-            models.Count('supplies__supplied_products'),
-            output_field=models.IntegerField()
-        ),
-        'supply_sales_count': models.ExpressionWrapper(
-            models.Count('supplies__supplied_products__product__sold_products'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по цене продаваемого товара
-        'supply_sales_price_avg': models.ExpressionWrapper(
-            models.Avg('supplies__supplied_products__product__sold_products__sale_price'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'supply_sales_price_sum': models.ExpressionWrapper(
-            models.Sum('supplies__supplied_products__product__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'supply_sales_price_min': models.ExpressionWrapper(
-            models.Min('supplies__supplied_products__product__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-        'supply_sales_price_max': models.ExpressionWrapper(
-            models.Max('supplies__supplied_products__product__sold_products__sale_price'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по кол-ву проданного товара
-        'supply_sales_quantity_avg': models.ExpressionWrapper(
-            models.Avg('supplies__supplied_products__product__sold_products__quantity'),
-            output_field=models.DecimalField(decimal_places=2)
-        ),
-        'supply_sales_quantity_sum': models.ExpressionWrapper(
-            models.Sum('supplies__supplied_products__product__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'supply_sales_quantity_min': models.ExpressionWrapper(
-            models.Min('supplies__supplied_products__product__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-        'supply_sales_quantity_max': models.ExpressionWrapper(
-            models.Max('supplies__supplied_products__product__sold_products__quantity'),
-            output_field=models.IntegerField()
-        ),
-
-        # Статистика по выручке
-        'supply_sales_profit_avg': models.ExpressionWrapper(
-            models.Avg(
-                (
-                    models.F('supplies__supplied_products__supply_price')
-                    - models.F('supplies__supplied_products__product__sold_products__sale_price')
-                ) * models.F('supplies__supplied_products__product__sold_products__quantity')
-            ),
-            output_field=models.DecimalField(decimal_places=2)
+    statistics_groups = [
+        StatisticsGroup(
+            'showroom.Dealer',
+            lookup='pk',
+            showroom_lookup='showroom',
+            fields={
+                'dealers_count': models.ExpressionWrapper(
+                    models.Count('pk'),
+                    output_field=models.IntegerField()
+                ),
+            }
         ),
-        'supply_sales_profit_sum': models.ExpressionWrapper(
-            models.Sum(
-                (
-                        models.F('supplies__supplied_products__supply_price')
-                        - models.F('supplies__supplied_products__product__sold_products__sale_price')
-                ) * models.F('supplies__supplied_products__product__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
+        StatisticsGroup(
+            'showroom.DealerDailyStatistics',
+            lookup='dealer',
+            showroom_lookup='showroom',
+            fields={
+                'supply_count': models.ExpressionWrapper(
+                    models.Sum('supplies_count'),
+                    output_field=models.IntegerField()
+                ),
+                'supply_product_count': models.ExpressionWrapper(
+                    models.Sum('items_count'),
+                    output_field=models.IntegerField()
+                ),
+                'supply_product_quantity_sum': models.ExpressionWrapper(
+                    models.Sum('quantity_sum'),
+                    output_field=models.IntegerField()
+                ),
+            }
         ),
-        'supply_sales_profit_max': models.ExpressionWrapper(
-            models.Max(
-                (
-                        models.F('supplies__supplied_products__supply_price')
-                        - models.F('supplies__supplied_products__product__sold_products__sale_price')
-                ) * models.F('supplies__supplied_products__product__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
+        # Продажи товаров, которые когда-либо поставлял дилер.
+        # Путь разбит на два подзапроса, чтобы повторные поставки
+        # одного товара не дублировали строки продаж.
+        StatisticsGroup(
+            'showroom.ProductDailyStatistics',
+            lookup=('product', 'supplied_products__supply__dealer'),
+            fields=daily_sales_fields(
+                items_count='supply_sales_count',
+                price='supply_sales_price',
+                quantity='supply_sales_quantity',
+                revenue='supply_sales_revenue',
+                profit='supply_sales_profit'
+            )
         ),
-        'supply_sales_profit_min': models.ExpressionWrapper(
-            models.Min(
-                (
-                        models.F('supplies__supplied_products__supply_price')
-                        - models.F('supplies__supplied_products__product__sold_products__sale_price')
-                ) * models.F('supplies__supplied_products__product__sold_products__quantity')
-            ),
-            output_field=models.IntegerField()
-        )
-
-    }
+    ]
 
     name = models.CharField(
         verbose_name='Имя дилера',
@@ -1469,3 +1475,269 @@ class Dealer(AbstractStatisticsModel):
     class Meta:
         verbose_name = 'Дилер'
         verbose_name_plural = 'Дилеры'
+
+
+class AbstractDailyStatistics(models.Model):
+    """
+    Абстрактная модель дневной сводки по продажам или поставкам автосалона.
+    Сводки пересчитываются при изменении исходных строк (см. rollups.py),
+    поэтому статистика считается по кол-ву дней, а не по кол-ву строк продаж.
+
+    Атрибут rollup_source - исходная модель строк.
+    Атрибут rollup_showroom_lookup - путь от исходной модели к автосалону.
+    Атрибут rollup_lookup - путь от исходной модели к объекту, по которому ведется сводка.
+    Атрибут rollup_field - поле сводки, хранящее этот объект.
+    Атрибут rollup_fields - агрегаты исходных строк, сохраняемые в сводку.
+    """
+
+    statistics_filter_fields = ['date']
+    rollup_source = None
+    rollup_showroom_lookup = None
+    rollup_lookup = None
+    rollup_field = None
+    rollup_fields = None
+
+    date = models.DateField(
+        verbose_name='Дата',
+        null=False,
+        blank=False,
+        editable=False
+    )
+
+    showroom = models.ForeignKey(
+        'showroom.Showroom',
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name='+',
+        editable=False,
+        verbose_name='Автосалон'
+    )
+
+    class Meta:
+        abstract = True
+
+
+class AbstractDailySalesStatistics(AbstractDailyStatistics):
+    """
+    Абстрактная модель дневной сводки по строкам продаж
+    """
+
+    rollup_source = 'showroom.ProductSaleItem'
+    rollup_showroom_lookup = 'sale__showroom'
+
+    sales_count = models.IntegerField(verbose_name='Кол-во продаж', default=0, editable=False)
+    items_count = models.IntegerField(verbose_name='Кол-во проданных позиций', default=0, editable=False)
+
+    price_sum = models.BigIntegerField(verbose_name='Сумма цен проданного товара', default=0, editable=False)
+    price_min = models.IntegerField(verbose_name='Минимальная цена проданного товара', null=True, editable=False)
+    price_max = models.IntegerField(verbose_name='Максимальная цена проданного товара', null=True, editable=False)
+
+    quantity_sum = models.BigIntegerField(verbose_name='Кол-во единиц проданного товара', default=0, editable=False)
+    quantity_min = models.IntegerField(verbose_name='Минимальное кол-во за раз', null=True, editable=False)
+    quantity_max = models.IntegerField(verbose_name='Максимальное кол-во за раз', null=True, editable=False)
+
+    revenue_sum = models.BigIntegerField(verbose_name='Оборот', default=0, editable=False)
+
+    costed_items_count = models.IntegerField(
+        verbose_name='Кол-во позиций с известной себестоимостью',
+        default=0,
+        editable=False
+    )
+    profit_sum = models.DecimalField(
+        verbose_name='Выручка',
+        max_digits=16,
+        decimal_places=2,
+        null=True,
+        editable=False
+    )
+    profit_min = models.DecimalField(
+        verbose_name='Минимальная выручка с позиции',
+        max_digits=14,
+        decimal_places=2,
+        null=True,
+        editable=False
+    )
+    profit_max = models.DecimalField(
+        verbose_name='Максимальная выручка с позиции',
+        max_digits=14,
+        decimal_places=2,
+        null=True,
+        editable=False
+    )
+
+    rollup_fields = {
+        'sales_count': models.Count('sale', distinct=True),
+        'items_count': models.Count('pk'),
+        'price_sum': models.Sum('sale_price'),
+        'price_min': models.Min('sale_price'),
+        'price_max': models.Max('sale_price'),
+        'quantity_sum': models.Sum('quantity'),
+        'quantity_min': models.Min('quantity'),
+        'quantity_max': models.Max('quantity'),
+        'revenue_sum': models.Sum(models.F('sale_price') * models.F('quantity')),
+        'costed_items_count': models.Count('unit_cost'),
+        'profit_sum': models.Sum(sale_profit()),
+        'profit_min': models.Min(sale_profit()),
+        'profit_max': models.Max(sale_profit()),
+    }
+
+    class Meta:
+        abstract = True
+
+
+class ShowroomDailyStatistics(AbstractDailySalesStatistics):
+    """
+    Дневная сводка продаж автосалона
+    """
+
+    rollup_lookup = 'sale__showroom'
+    rollup_field = 'showroom'
+
+    showroom = models.ForeignKey(
+        'showroom.Showroom',
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name='daily_statistics',
+        editable=False,
+        verbose_name='Автосалон'
+    )
+
+    def __str__(self):
+        return f'{self.showroom_id} {self.date}'
+
+    class Meta:
+        verbose_name = 'Дневная сводка автосалона'
+        verbose_name_plural = 'Дневные сводки автосалонов'
+        unique_together = [('showroom', 'date')]
+
+
+class EmployeeDailyStatistics(AbstractDailySalesStatistics):
+    """
+    Дневная сводка продаж сотрудника
+    """
+
+    rollup_lookup = 'sale__employee'
+    rollup_field = 'employee'
+
+    employee = models.ForeignKey(
+        'showroom.Employee',
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name='daily_statistics',
+        editable=False,
+        verbose_name='Сотрудник'
+    )
+
+    def __str__(self):
+        return f'{self.employee_id} {self.date}'
+
+    class Meta:
+        verbose_name = 'Дневная сводка сотрудника'
+        verbose_name_plural = 'Дневные сводки сотрудников'
+        unique_together = [('employee', 'date')]
+        # Показатели всех объектов автосалона (страница автосалона) и пересчет сводок за дни
+        indexes = [models.Index(fields=['showroom', 'date'], name='employee_daily_showroom_idx')]
+
+
+class ProductDailyStatistics(AbstractDailySalesStatistics):
+    """
+    Дневная сводка продаж товара
+    """
+
+    rollup_lookup = 'product'
+    rollup_field = 'product'
+
+    product = models.ForeignKey(
+        'showroom.Product',
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name='daily_statistics',
+        editable=False,
+        verbose_name='Товар'
+    )
+
+    def __str__(self):
+        return f'{self.product_id} {self.date}'
+
+    class Meta:
+        verbose_name = 'Дневная сводка товара'
+        verbose_name_plural = 'Дневные сводки товаров'
+        unique_together = [('product', 'date')]
+        # Показатели всех объектов автосалона (страница автосалона) и пересчет сводок за дни
+        indexes = [models.Index(fields=['showroom', 'date'], name='product_daily_showroom_idx')]
+
+
+class ProductCategoryDailyStatistics(AbstractDailySalesStatistics):
+    """
+    Дневная сводка продаж категории товаров
+    """
+
+    rollup_lookup = 'product__category'
+    rollup_field = 'category'
+
+    category = models.ForeignKey(
+        'showroom.ProductCategory',
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name='daily_statistics',
+        editable=False,
+        verbose_name='Категория'
+    )
+
+    def __str__(self):
+        return f'{self.category_id} {self.date}'
+
+    class Meta:
+        verbose_name = 'Дневная сводка категории'
+        verbose_name_plural = 'Дневные сводки категорий'
+        unique_together = [('category', 'date')]
+        # Показатели всех объектов автосалона (страница автосалона) и пересчет сводок за дни
+        indexes = [models.Index(fields=['showroom', 'date'], name='category_daily_showroom_idx')]
+
+
+class DealerDailyStatistics(AbstractDailyStatistics):
+    """
+    Дневная сводка поставок дилера
+    """
+
+    rollup_source = 'showroom.ProductSupplyItem'
+    rollup_showroom_lookup = 'supply__showroom'
+    rollup_lookup = 'supply__dealer'
+    rollup_field = 'dealer'
+
+    dealer = models.ForeignKey(
+        'showroom.Dealer',
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name='daily_statistics',
+        editable=False,
+        verbose_name='Дилер'
+    )
+
+    supplies_count = models.IntegerField(verbose_name='Кол-во поставок', default=0, editable=False)
+    items_count = models.IntegerField(verbose_name='Кол-во поставленных позиций', default=0, editable=False)
+    quantity_sum = models.BigIntegerField(verbose_name='Кол-во единиц поставленного товара', default=0, editable=False)
+    price_sum = models.BigIntegerField(verbose_name='Стоимость поставленного товара', default=0, editable=False)
+
+    rollup_fields = {
+        'supplies_count': models.Count('supply', distinct=True),
+        'items_count': models.Count('pk'),
+        'quantity_sum': models.Sum('quantity'),
+        'price_sum': models.Sum(models.F('supply_price') * models.F('quantity')),
+    }
+
+    def __str__(self):
+        return f'{self.dealer_id} {self.date}'
+
+    class Meta:
+        verbose_name = 'Дневная сводка дилера'
+        verbose_name_plural = 'Дневные сводки дилеров'
+        unique_together = [('dealer', 'date')]
+        # Показатели всех объектов автосалона (страница автосалона) и пересчет сводок за дни
+        indexes = [models.Index(fields=['showroom', 'date'], name='dealer_daily_showroom_idx')]
@@ -0,0 +1,333 @@
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import partial
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('showroom.slow_queries')
+
+current_timings = ContextVar('showroom_request_timings', default=None)
+current_request = ContextVar('showroom_request_origin', default=None)
+current_statistics = ContextVar('showroom_statistics_origin', default=None)
+explaining = ContextVar('showroom_explaining', default=False)
+
+
+def wrap_connections(stack, wrapper):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+def streams(response):
+    """
+    Потоковый ответ (StreamingHttpResponse), содержимое которого читается синхронно.
+    Асинхронное содержимое (async-итератор) не оборачивается и не профилируется.
+    """
+
+    return response.streaming and not getattr(response, 'is_async', False)
+
+
+def stream_within(content, scope, finished=None):
+    """
+    Содержимое потокового ответа читается уже после выхода из промежуточного слоя,
+    поэтому запросы к базе данных при его чтении не попали бы в замер.
+    Каждая часть content читается внутри нового блока scope(),
+    после последней части вызывается finished().
+    """
+
+    iterator = iter(content)
+    end = object()
+    while True:
+        with scope():
+            chunk = next(iterator, end)
+        if chunk is end:
+            break
+        yield chunk
+
+    if finished is not None:
+        finished()
+
+
+class RequestTimings:
+    """
+    Время этапов обработки одного запроса в секундах.
+    Запросы к базе данных во время отрисовки шаблона или вычисления статистики
+    входят и в db, и во время этапа, поэтому этапы могут пересекаться.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.durations = {'db': 0.0, 'view': 0.0, 'template': 0.0, 'statistics': 0.0}
+        self.view_started = None
+        self.template_started = None
+
+    def add(self, name, duration):
+        self.durations[name] += duration
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_count += 1
+            self.add('db', time.perf_counter() - start)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def header(self, total):
+        metrics = [f'total;dur={total * 1000:.1f}']
+        for name, duration in self.durations.items():
+            description = f';desc="{self.db_count} queries"' if name == 'db' else ''
+            metrics.append(f'{name};dur={duration * 1000:.1f}{description}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timer(name):
+    """
+    Добавляет время выполнения блока к этапу name текущего запроса.
+    Вне запроса (или при выключенном профилировании) ничего не замеряет.
+    """
+
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def statistics_scope(queryset, showroom=None, metric_set='all'):
+    """
+    Вычисление статистики выборки queryset: время добавляется к этапу statistics,
+    а медленные запросы внутри блока помечаются моделью, автосалоном и набором метрик.
+    """
+
+    token = current_statistics.set({
+        'model': queryset.model._meta.label,
+        'showroom_id': getattr(showroom, 'pk', None),
+        'metric_set': metric_set,
+    })
+    try:
+        with timer('statistics'):
+            yield
+    finally:
+        current_statistics.reset(token)
+
+
+class ServerTimingMiddleware:
+    """
+    Профилирование запросов: кол-во и время запросов к базе данных, время представления,
+    отрисовки шаблона и вычисления статистики.
+    Результат добавляется к ответу заголовком Server-Timing
+    (виден в панели разработчика браузера) и пишется в журнал showroom.profiling
+    с уровнем DEBUG.
+
+    Включается настройкой SHOWROOM_SERVER_TIMING, иначе Django исключает
+    промежуточный слой при запуске и он ничего не стоит.
+    Должен стоять первым в MIDDLEWARE, чтобы total включал остальные слои.
+
+    Отрисовка шаблона замеряется только для TemplateResponse (представления-классы);
+    шаблоны, отрисованные функцией render(), входят во время представления.
+
+    Заголовки потокового ответа отправляются до его содержимого, поэтому Server-Timing
+    такого ответа включает только время до начала передачи. Запросы при чтении
+    содержимого входят в db, а запись в журнал делается после передачи всего ответа.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SHOWROOM_SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        with self.measure(timings):
+            response = self.get_response(request)
+
+        self.finish_view(timings)
+        response['Server-Timing'] = timings.header(timings.total)
+
+        if streams(response):
+            response.streaming_content = stream_within(
+                response.streaming_content,
+                partial(self.measure, timings),
+                partial(self.log, request, response, timings)
+            )
+        else:
+            self.log(request, response, timings)
+        return response
+
+    @staticmethod
+    @contextmanager
+    def measure(timings):
+        token = current_timings.set(timings)
+        try:
+            with ExitStack() as stack:
+                wrap_connections(stack, timings.execute_wrapper)
+                yield
+        finally:
+            current_timings.reset(token)
+
+    @staticmethod
+    def log(request, response, timings):
+        logger.debug(
+            '%s %s %s total=%.1fms db=%.1fms (%d queries) view=%.1fms template=%.1fms statistics=%.1fms',
+            request.method,
+            request.get_full_path(),
+            response.status_code,
+            timings.total * 1000,
+            timings.durations['db'] * 1000,
+            timings.db_count,
+            timings.durations['view'] * 1000,
+            timings.durations['template'] * 1000,
+            timings.durations['statistics'] * 1000
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = current_timings.get()
+        if timings is None:
+            return response
+
+        self.finish_view(timings)
+        timings.template_started = time.perf_counter()
+
+        def rendered(response):
+            timings.add('template', time.perf_counter() - timings.template_started)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def process_exception(self, request, exception):
+        timings = current_timings.get()
+        if timings is not None:
+            self.finish_view(timings)
+
+    @staticmethod
+    def finish_view(timings):
+        if timings.view_started is not None:
+            timings.add('view', time.perf_counter() - timings.view_started)
+            timings.view_started = None
+
+
+def explain(connection, sql, params):
+    """
+    План выполнения запроса в виде строк. Запросы к базе данных внутри
+    не проверяются на медленность, иначе медленный EXPLAIN вызвал бы сам себя.
+    """
+
+    token = explaining.set(True)
+    try:
+        # Точка сохранения не дает ошибке EXPLAIN прервать транзакцию запроса
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return [' '.join(str(value) for value in row) for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN failed: {error}']
+    finally:
+        explaining.reset(token)
+
+
+def json_params(params):
+    if params is None:
+        return None
+    return [value if isinstance(value, (int, float, str, bool, type(None))) else str(value) for value in params]
+
+
+class SlowQueryLog:
+    """
+    Обертка выполнения запросов (connection.execute_wrapper), которая пишет
+    в журнал showroom.slow_queries запросы дольше threshold миллисекунд:
+    SQL, параметры, длительность, представление и автосалон запроса,
+    модель и набор метрик вычисляемой статистики и план выполнения (EXPLAIN).
+
+    EXPLAIN выполняется только для SELECT: план остальных запросов
+    в некоторых базах данных требует их выполнения.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        if explaining.get():
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - start) * 1000
+
+        if duration >= self.threshold:
+            self.log(context['connection'], sql, params, many, duration)
+        return result
+
+    def log(self, connection, sql, params, many, duration):
+        plan = None
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            plan = explain(connection, sql, params)
+
+        slow_query_logger.warning(json.dumps({
+            'duration_ms': round(duration, 3),
+            'database': connection.alias,
+            'sql': sql,
+            'params': None if many else json_params(params),
+            'request': current_request.get(),
+            'statistics': current_statistics.get(),
+            'plan': plan,
+        }, ensure_ascii=False))
+
+
+class SlowQueryMiddleware:
+    """
+    Журнал медленных запросов к базе данных (см. SlowQueryLog).
+    Включается настройкой SHOWROOM_SLOW_QUERY_MS - порогом длительности запроса
+    в миллисекундах, иначе Django исключает промежуточный слой при запуске.
+    Запросы при чтении потокового ответа (выгрузки) тоже проверяются.
+    """
+
+    def __init__(self, get_response):
+        self.threshold = getattr(settings, 'SHOWROOM_SLOW_QUERY_MS', 0)
+        if not self.threshold:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        origin = {'method': request.method, 'path': request.get_full_path(), 'view': None, 'showroom': None}
+        with self.watch(origin):
+            response = self.get_response(request)
+
+        if streams(response):
+            response.streaming_content = stream_within(response.streaming_content, partial(self.watch, origin))
+        return response
+
+    @contextmanager
+    def watch(self, origin):
+        token = current_request.set(origin)
+        try:
+            with ExitStack() as stack:
+                wrap_connections(stack, SlowQueryLog(self.threshold))
+                yield
+        finally:
+            current_request.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        origin = current_request.get()
+        if origin is not None:
+            origin['view'] = request.resolver_match.view_name
+            origin['showroom'] = view_kwargs.get('showroom_slug')
@@ -0,0 +1,243 @@
+from datetime import datetime, time, timedelta
+from itertools import islice
+from django.apps import apps
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+sales_rollup_models = [
+    'showroom.ShowroomDailyStatistics',
+    'showroom.EmployeeDailyStatistics',
+    'showroom.ProductDailyStatistics',
+    'showroom.ProductCategoryDailyStatistics',
+]
+
+supplies_rollup_models = [
+    'showroom.DealerDailyStatistics',
+]
+
+
+def day_range(date):
+    start = timezone.make_aware(datetime.combine(date, time.min))
+    return start, start + timedelta(days=1)
+
+
+def local_date(value):
+    return timezone.localdate(value)
+
+
+def rollup_rows(model, source_queryset):
+    """
+    Агрегаты строк source_queryset по объектам и дням сводки model
+    """
+
+    return source_queryset.exclude(
+        **{f'{model.rollup_lookup}__isnull': True}
+    ).annotate(
+        rollup_date=TruncDate('date_created')
+    ).order_by().values(
+        model.rollup_lookup,
+        'rollup_date'
+    ).annotate(
+        **model.rollup_fields
+    )
+
+
+def refresh_rollup(model, showroom_id, dates=None, batch_size=2000):
+    """
+    Пересчитывает сводку model автосалона за дни dates.
+    Если дни не указаны - сводка пересчитывается за все время.
+    """
+
+    source_model = apps.get_model(model.rollup_source)
+    source_queryset = source_model.objects.filter(**{model.rollup_showroom_lookup: showroom_id})
+    rollups = model.objects.filter(showroom_id=showroom_id)
+
+    if dates is not None:
+        dates = set(dates)
+        if not dates:
+            return
+
+        days_filter = models.Q()
+        for date in dates:
+            start, end = day_range(date)
+            days_filter |= models.Q(date_created__gte=start, date_created__lt=end)
+
+        source_queryset = source_queryset.filter(days_filter)
+        rollups = rollups.filter(date__in=dates)
+
+    # Строки сводки читаются и создаются порциями, поэтому полный пересчет
+    # большого автосалона не держит в памяти сводку за все время
+    rows = rollup_rows(model, source_queryset).iterator(chunk_size=batch_size)
+
+    with transaction.atomic():
+        rollups.delete()
+
+        while chunk := list(islice(rows, batch_size)):
+            objects = []
+            for row in chunk:
+                values = {
+                    'showroom_id': showroom_id,
+                    'date': row.pop('rollup_date'),
+                    f'{model.rollup_field}_id': row.pop(model.rollup_lookup),
+                }
+                values.update(row)
+                objects.append(model(**values))
+
+            model.objects.bulk_create(objects)
+
+
+def merge_value(aggregate, current, new):
+    if current is None:
+        return new
+    if new is None:
+        return current
+    if isinstance(aggregate, models.Min):
+        return min(current, new)
+    if isinstance(aggregate, models.Max):
+        return max(current, new)
+    return current + new
+
+
+def locked_rollups(model, showroom_id, keys):
+    """
+    Существующие строки сводки model по ключам keys - парам (id объекта, день) -
+    заблокированные до конца транзакции: {ключ: строка сводки}.
+    Строки блокируются в порядке ключей, поэтому одновременные продажи
+    разных товаров не блокируют друг друга взаимно.
+    """
+
+    key_field = f'{model.rollup_field}_id'
+    queryset = model.objects.select_for_update().filter(
+        showroom_id=showroom_id,
+        date__in={date for _, date in keys},
+        **{f'{key_field}__in': {object_id for object_id, _ in keys}}
+    ).order_by(key_field, 'date')
+
+    return {(getattr(rollup, key_field), rollup.date): rollup for rollup in queryset}
+
+
+def merge_rows(model, showroom_id, rows):
+    """
+    Прибавляет агрегаты rows ({ключ: значения}) к существующим строкам сводки
+    и возвращает агрегаты, для которых строк сводки еще нет
+    """
+
+    existing = locked_rollups(model, showroom_id, rows)
+
+    missing = {}
+    updated = []
+    for key, values in rows.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            missing[key] = values
+            continue
+
+        for name, value in values.items():
+            setattr(rollup, name, merge_value(model.rollup_fields[name], getattr(rollup, name), value))
+        updated.append(rollup)
+
+    if len(updated) == 1:
+        # Обычный UPDATE одной строки собирается намного быстрее, чем
+        # bulk_update с CASE WHEN на каждое поле, а продажа в основном
+        # обновляет одну строку сводки каждого вида
+        rollup = updated[0]
+        model.objects.filter(pk=rollup.pk).update(
+            **{name: getattr(rollup, name) for name in model.rollup_fields}
+        )
+    else:
+        model.objects.bulk_update(updated, list(model.rollup_fields))
+
+    return missing
+
+
+def create_rows(model, showroom_id, rows):
+    key_field = f'{model.rollup_field}_id'
+    objects = []
+    for (object_id, date), values in rows.items():
+        values = {'showroom_id': showroom_id, 'date': date, key_field: object_id, **values}
+        objects.append(model(**values))
+    model.objects.bulk_create(objects)
+
+
+def add_rows(model, showroom_id, source_queryset):
+    """
+    Добавляет в сводку model еще не учтенные в ней строки source_queryset.
+    В отличие от refresh_rollup, стоимость зависит только от кол-ва новых строк,
+    а не от кол-ва уже учтенных строк за день.
+
+    Строки должны относиться к новым продажам (поставкам),
+    иначе различные продажи одного дня будут посчитаны дважды.
+
+    Строку сводки за новый день может одновременно создать другая продажа.
+    Тогда вставка нарушает уникальность (объект, день) и откатывается
+    до своей точки сохранения, а агрегаты прибавляются к уже созданной строке.
+    """
+
+    rows = {
+        (row.pop(model.rollup_lookup), row.pop('rollup_date')): row
+        for row in rollup_rows(model, source_queryset)
+    }
+    if not rows:
+        return
+
+    # Сводки обновляются внутри транзакции продажи (поставки),
+    # точка сохранения нужна только для вставки новых строк
+    with transaction.atomic(savepoint=False):
+        missing = merge_rows(model, showroom_id, rows)
+        if not missing:
+            return
+
+        try:
+            with transaction.atomic():
+                create_rows(model, showroom_id, missing)
+        except IntegrityError:
+            create_rows(model, showroom_id, merge_rows(model, showroom_id, missing))
+
+
+def add_sales(showroom_id, sales):
+    """
+    Добавляет строки новых продаж sales автосалона во все сводки продаж
+    """
+
+    source_model = apps.get_model('showroom', 'ProductSaleItem')
+    for label in sales_rollup_models:
+        add_rows(apps.get_model(label), showroom_id, source_model.objects.filter(sale__in=sales))
+
+
+def add_supply(supply):
+    """
+    Добавляет строки новой поставки supply во все сводки поставок
+    """
+
+    source_model = apps.get_model('showroom', 'ProductSupplyItem')
+    for label in supplies_rollup_models:
+        add_rows(apps.get_model(label), supply.showroom_id, source_model.objects.filter(supply=supply))
+
+
+def refresh_sales(showroom_id, dates=None):
+    for label in sales_rollup_models:
+        refresh_rollup(apps.get_model(label), showroom_id, dates)
+
+
+def refresh_supplies(showroom_id, dates=None):
+    for label in supplies_rollup_models:
+        refresh_rollup(apps.get_model(label), showroom_id, dates)
+
+
+def rebuild(showroom_id):
+    refresh_sales(showroom_id)
+    refresh_supplies(showroom_id)
+
+
+def item_dates(queryset):
+    """
+    Дни, за которые существуют строки выборки queryset
+    """
+
+    return set(
+        queryset.annotate(
+            rollup_date=TruncDate('date_created')
+        ).order_by().values_list('rollup_date', flat=True).distinct()
+    )
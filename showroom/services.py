@@ -0,0 +1,353 @@
+from collections import defaultdict
+from functools import reduce
+from itertools import islice
+from operator import or_
+from uuid import UUID
+from django.core.exceptions import ValidationError
+from django.db import models as db_models, transaction
+
+from . import costing, models, rollups
+
+
+def cart_quantities(lines):
+    """
+    Складывает кол-во одинаковых товаров корзины: {id товара: кол-во}.
+    Строка корзины - пара (товар или его id, кол-во).
+    """
+
+    quantities = defaultdict(int)
+    for product, quantity in lines:
+        if quantity <= 0:
+            raise ValidationError('Кол-во товара в продаже должно быть больше нуля.')
+
+        product_id = getattr(product, 'pk', product)
+        quantities[product_id] += quantity
+    return dict(quantities)
+
+
+def change_stock(changes, versions=None):
+    """
+    Изменяет остатки товаров одним UPDATE: {id товара: изменение кол-ва}.
+    Версии измененных товаров увеличиваются, поэтому формы редактирования,
+    открытые до изменения остатков, не перезапишут их.
+
+    Если переданы прочитанные версии товаров versions ({id товара: версия}),
+    товар изменяется, только если его версия не изменилась (UPDATE ... WHERE version = n).
+    Возвращает кол-во измененных товаров.
+    """
+
+    if not changes:
+        return 0
+
+    queryset = models.Product.objects.filter(pk__in=changes)
+    if versions is not None:
+        queryset = models.Product.objects.filter(
+            reduce(or_, (
+                db_models.Q(pk=product_id, version=versions[product_id])
+                for product_id in changes
+            ))
+        )
+
+    return queryset.update(
+        quantity=db_models.F('quantity') + db_models.Case(
+            *(
+                db_models.When(pk=product_id, then=db_models.Value(change))
+                for product_id, change in changes.items()
+            ),
+            output_field=db_models.IntegerField()
+        ),
+        version=db_models.F('version') + 1
+    )
+
+
+def checkout(showroom, lines, employee=None, sale=None, attempts=3):
+    """
+    Оформляет продажу всей корзины lines одной транзакцией.
+
+    Остатки товаров не блокируются: они читаются вместе с версиями товаров
+    и уменьшаются одним UPDATE с F()-выражением при условии, что версии не изменились.
+    Если товар изменили между чтением и списанием, транзакция откатывается
+    и продажа повторяется заново (до attempts раз), после чего выбрасывается
+    ConcurrentUpdateError.
+
+    Продажи одного автосалона все же выполняются по очереди, но только в конце транзакции:
+    rollups.add_sales() блокирует строку сводки автосалона за день (ShowroomDailyStatistics),
+    а bump_statistics_generation() - строку автосалона (UPDATE поколения статистики).
+    Обе блокировки держатся до фиксации, поэтому после них в транзакции ничего не выполняется.
+    Одновременное создание сводки за новый день разрешает rollups.add_rows().
+
+    Строки продажи создаются одним bulk_create,
+    поэтому кол-во запросов не зависит от кол-ва строк.
+
+    Если передана продажа sale, строки добавляются к ней.
+    Возвращает продажу.
+    """
+
+    quantities = cart_quantities(lines)
+    if not quantities:
+        raise ValidationError('Корзина пуста.')
+
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                new_sale = sale is None
+                placed, sale_items = place_sale(showroom, quantities, employee, sale)
+                save_sale_items(sale_items)
+
+                # bulk_create не отправляет сигналы, поэтому сводки и поколение статистики
+                # обновляются явно - один раз на всю продажу.
+                # Строки новой продажи добавляются к сводкам без пересчета всего дня.
+                if new_sale:
+                    rollups.add_sales(showroom.pk, [placed])
+                else:
+                    rollups.refresh_sales(showroom.pk, [rollups.local_date(sale_items[0].date_created)])
+                showroom.bump_statistics_generation()
+
+            return placed
+        except models.ConcurrentUpdateError:
+            if attempt == attempts:
+                raise
+
+
+def checkout_many(showroom, carts, attempts=3):
+    """
+    Оформляет несколько продаж одной транзакцией: carts - список пар (корзина, сотрудник).
+    Сводки и поколение статистики обновляются один раз на все продажи,
+    поэтому пакет продаж оформляется намного быстрее, чем такие же продажи по одной.
+
+    Продажа с ошибкой (ValidationError) откатывается до своей точки сохранения
+    и не мешает остальным. При одновременном изменении товаров
+    весь пакет повторяется заново (до attempts раз).
+    Возвращает список: продажа или ValidationError для каждой корзины.
+    """
+
+    prepared = []
+    for lines, employee in carts:
+        try:
+            quantities = cart_quantities(lines)
+            if not quantities:
+                raise ValidationError('Корзина пуста.')
+            prepared.append((quantities, employee))
+        except ValidationError as error:
+            prepared.append((error, employee))
+
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                results = []
+                sale_items = []
+                for quantities, employee in prepared:
+                    if isinstance(quantities, ValidationError):
+                        results.append(quantities)
+                        continue
+
+                    try:
+                        with transaction.atomic():
+                            sale, items = place_sale(showroom, quantities, employee)
+                        results.append(sale)
+                        sale_items += items
+                    except ValidationError as error:
+                        results.append(error)
+
+                # Себестоимость всех строк пакета определяется вместе,
+                # продажи списываются с партий в порядке оформления
+                save_sale_items(sale_items)
+
+                sales = [result for result in results if isinstance(result, models.ProductSale)]
+                if sales:
+                    rollups.add_sales(showroom.pk, sales)
+                    showroom.bump_statistics_generation()
+
+            return results
+        except models.ConcurrentUpdateError:
+            if attempt == attempts:
+                raise
+
+
+def place_sale(showroom, quantities, employee=None, sale=None):
+    """
+    Списывает остатки и создает продажу. Строки продажи возвращаются несохраненными,
+    их сохраняет save_sale_items(), сводки не обновляются.
+    Выполняется внутри транзакции checkout() или checkout_many().
+    Возвращает (продажу, строки продажи).
+    """
+
+    products = models.Product.objects.filter(showroom=showroom, pk__in=quantities).in_bulk()
+
+    missing = set(quantities) - set(products)
+    if missing:
+        missing = ', '.join(map(str, sorted(missing)))
+        raise ValidationError(f'Товары не найдены в автосалоне: {missing}.')
+
+    for product_id, quantity in quantities.items():
+        product = products[product_id]
+        if product.quantity < quantity:
+            raise ValidationError(
+                f'Недостаточно товара "{product}": в наличии {product.quantity}, требуется {quantity}.'
+            )
+
+    changed = change_stock(
+        {product_id: -quantity for product_id, quantity in quantities.items()},
+        versions={product_id: product.version for product_id, product in products.items()}
+    )
+    if changed != len(quantities):
+        raise models.ConcurrentUpdateError('Товары продажи были изменены во время ее оформления.')
+
+    if sale is None:
+        sale = models.ProductSale(showroom=showroom, employee=employee)
+        sale.save()
+
+    sale_items = [
+        models.ProductSaleItem(
+            product=products[product_id],
+            sale=sale,
+            quantity=quantity,
+            sale_price=products[product_id].price
+        )
+        for product_id, quantity in quantities.items()
+    ]
+    return sale, sale_items
+
+
+def save_sale_items(sale_items):
+    """
+    Определяет себестоимость строк продаж и сохраняет их одним bulk_create
+    """
+
+    costing.assign_costs(sale_items)
+    models.ProductSaleItem.objects.bulk_create(sale_items)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def find_products(showroom, references):
+    """
+    Ищет товары автосалона по ссылкам (slug) или названиям одним запросом.
+    Возвращает {ссылка или название: [товары]}.
+    """
+
+    slugs = set()
+    titles = set()
+    for reference in references:
+        try:
+            slugs.add(UUID(reference))
+        except ValueError:
+            titles.add(reference)
+
+    found = defaultdict(list)
+    products = models.Product.objects.filter(showroom=showroom).filter(
+        db_models.Q(slug__in=slugs) | db_models.Q(title__in=titles)
+    ).only('pk', 'slug', 'title')
+
+    for product in products:
+        if product.slug in slugs:
+            found[str(product.slug)].append(product)
+        if product.title in titles:
+            found[product.title].append(product)
+    return found
+
+
+def parse_count(value, name):
+    try:
+        value = int(str(value).strip())
+    except ValueError:
+        raise ValidationError(f'{name} должно быть целым числом.')
+
+    if value < 0:
+        raise ValidationError(f'{name} не может быть отрицательным.')
+    return value
+
+
+def supply_batch_items(showroom, supply, lines):
+    """
+    Проверяет порцию строк накладной и возвращает (строки поставки, ошибки).
+    Строка накладной - (номер строки, товар, кол-во, цена за штуку),
+    товар указывается ссылкой (slug) или названием.
+    """
+
+    lines = [
+        (number, str(reference).strip(), quantity, supply_price)
+        for number, reference, quantity, supply_price in lines
+    ]
+    products = find_products(showroom, {reference for _, reference, _, _ in lines})
+
+    items = []
+    errors = []
+    for number, reference, quantity, supply_price in lines:
+        try:
+            found = products.get(reference, [])
+            if not found:
+                raise ValidationError(f'Товар "{reference}" не найден в автосалоне.')
+            if len(found) > 1:
+                raise ValidationError(f'Название "{reference}" носят несколько товаров, укажите ссылку на товар.')
+
+            quantity = parse_count(quantity, 'Кол-во товара')
+            if not quantity:
+                raise ValidationError('Кол-во товара должно быть больше нуля.')
+
+            items.append(
+                models.ProductSupplyItem(
+                    product=found[0],
+                    supply=supply,
+                    quantity=quantity,
+                    quantity_left=quantity,
+                    supply_price=parse_count(supply_price, 'Цена товара')
+                )
+            )
+        except ValidationError as error:
+            errors.extend(f'Строка {number}: {message}' for message in error.messages)
+
+    return items, errors
+
+
+def receive_supply(showroom, dealer, lines, batch_size=500):
+    """
+    Принимает накладную поставки дилера dealer одной транзакцией.
+
+    Строки lines читаются и проверяются порциями по batch_size:
+    товары порции ищутся одним запросом, строки поставки создаются одним bulk_create,
+    остатки увеличиваются одним UPDATE, поэтому кол-во запросов зависит
+    только от кол-ва порций, а в памяти находится не больше одной порции строк.
+
+    После первой ошибки строки продолжают проверяться, но уже не записываются;
+    в конце выбрасывается ValidationError со всеми ошибками и вся поставка откатывается.
+    Возвращает (поставку, кол-во принятых строк).
+    """
+
+    if dealer.showroom_id != showroom.pk:
+        raise ValidationError('Дилер не относится к автосалону.')
+
+    with transaction.atomic():
+        supply = models.ProductSupply(showroom=showroom, dealer=dealer)
+        supply.save()
+
+        received = 0
+        errors = []
+        for batch in batches(lines, batch_size):
+            items, batch_errors = supply_batch_items(showroom, supply, batch)
+            errors.extend(batch_errors)
+            if errors:
+                continue
+
+            models.ProductSupplyItem.objects.bulk_create(items)
+
+            changes = defaultdict(int)
+            for item in items:
+                changes[item.product_id] += item.quantity
+            change_stock(changes)
+            received += len(items)
+
+        if errors:
+            raise ValidationError(errors)
+
+        if not received:
+            raise ValidationError('Накладная не содержит товаров.')
+
+        rollups.add_supply(supply)
+        showroom.bump_statistics_generation()
+
+    return supply, received
@@ -0,0 +1,266 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import costing, models, rollups
+
+
+def is_cascade_from_showroom(origin):
+    return isinstance(origin, models.Showroom)
+
+
+def first_time_for_origin(origin, key):
+    """
+    При удалении продажи или выборки строк сигнал приходит для каждой строки,
+    а обработать одинаковые последствия достаточно один раз на операцию удаления.
+    """
+
+    handled = origin.__dict__.setdefault('_handled_signals', set())
+    if key in handled:
+        return False
+
+    handled.add(key)
+    return True
+
+
+def refresh_once(origin, refresh, showroom_id, date):
+    if first_time_for_origin(origin, (refresh, showroom_id, date)):
+        refresh(showroom_id, [date])
+
+
+# Строки продаж #
+
+@receiver(pre_save, sender=models.ProductSaleItem)
+def remember_sale_item_day(sender, instance, **kwargs):
+    instance._previous_rollup_day = None
+    instance._previous_stock = None
+    if instance.pk:
+        previous = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('sale__showroom', 'date_created', 'product', 'quantity').first()
+
+        if previous:
+            showroom_id, date_created, product_id, quantity = previous
+            instance._previous_rollup_day = (showroom_id, date_created)
+            instance._previous_stock = (showroom_id, product_id, quantity)
+
+
+def recalculate_product_costs(showroom_id, product_ids):
+    """
+    Возвращает на партии кол-во, списанное строками продаж товаров product_ids,
+    и заново списывает их продажи. Сводки обновляются за дни,
+    в которые себестоимость продаж изменилась.
+    """
+
+    dates = costing.recalculate_costs(showroom_id, product_ids=product_ids)
+    if dates:
+        rollups.refresh_sales(showroom_id, {rollups.local_date(date) for date in dates})
+
+
+# Обработчики себестоимости подключаются раньше обработчиков сводок,
+# чтобы сводки считались по уже пересчитанной себестоимости
+
+@receiver(post_save, sender=models.ProductSaleItem)
+def recalculate_edited_sale_item_costs(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_stock', None)
+    if created or previous is None:
+        return
+
+    current = (instance.sale.showroom_id, instance.product_id, instance.quantity)
+    if current == previous:
+        return
+
+    for showroom_id, product_id in {previous[:2], current[:2]}:
+        recalculate_product_costs(showroom_id, [product_id])
+
+    instance.unit_cost = sender.objects.filter(pk=instance.pk).values_list('unit_cost', flat=True).get()
+
+
+@receiver(post_delete, sender=models.ProductSaleItem)
+def recalculate_deleted_sale_item_costs(sender, instance, origin=None, **kwargs):
+    # При удалении самого товара его партии удаляются вместе с продажами
+    if is_cascade_from_showroom(origin) or isinstance(origin, models.Product):
+        return
+
+    try:
+        showroom_id = instance.sale.showroom_id
+    except ObjectDoesNotExist:
+        return
+
+    if first_time_for_origin(origin or instance, ('costing', showroom_id, instance.product_id)):
+        recalculate_product_costs(showroom_id, [instance.product_id])
+
+
+@receiver(post_save, sender=models.ProductSaleItem)
+def refresh_sale_item_day(sender, instance, **kwargs):
+    days = {(instance.sale.showroom_id, rollups.local_date(instance.date_created))}
+
+    previous_day = getattr(instance, '_previous_rollup_day', None)
+    if previous_day:
+        showroom_id, date_created = previous_day
+        days.add((showroom_id, rollups.local_date(date_created)))
+
+    for showroom_id, date in days:
+        rollups.refresh_sales(showroom_id, [date])
+
+
+@receiver(post_delete, sender=models.ProductSaleItem)
+def refresh_deleted_sale_item_day(sender, instance, origin=None, **kwargs):
+    if is_cascade_from_showroom(origin):
+        return
+
+    try:
+        showroom_id = instance.sale.showroom_id
+    except ObjectDoesNotExist:
+        return
+
+    refresh_once(origin or instance, rollups.refresh_sales, showroom_id, rollups.local_date(instance.date_created))
+
+
+@receiver(pre_save, sender=models.ProductSale)
+def remember_sale_showroom(sender, instance, **kwargs):
+    instance._previous_showroom_id = None
+    if instance.pk:
+        instance._previous_showroom_id = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('showroom', flat=True).first()
+
+
+@receiver(post_save, sender=models.ProductSale)
+def refresh_sale_days(sender, instance, created, **kwargs):
+    """
+    Смена сотрудника или автосалона продажи меняет сводки за все дни ее строк
+    """
+
+    if created:
+        return
+
+    dates = rollups.item_dates(instance.sold_products.all())
+    showroom_ids = {instance.showroom_id, getattr(instance, '_previous_showroom_id', None)}
+
+    for showroom_id in showroom_ids - {None}:
+        rollups.refresh_sales(showroom_id, dates)
+
+
+@receiver(pre_save, sender=models.Product)
+def remember_product_category(sender, instance, **kwargs):
+    instance._previous_category_id = None
+    if instance.pk:
+        instance._previous_category_id = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('category', flat=True).first()
+
+
+@receiver(post_save, sender=models.Product)
+def refresh_product_category_days(sender, instance, created, **kwargs):
+    """
+    Смена категории товара меняет сводки категорий за все дни продаж товара
+    """
+
+    previous_category_id = getattr(instance, '_previous_category_id', None)
+    if created or previous_category_id in (None, instance.category_id):
+        return
+
+    dates = instance.daily_statistics.values_list('date', flat=True)
+    rollups.refresh_sales(instance.showroom_id, dates)
+
+
+# Строки поставок #
+
+@receiver(pre_save, sender=models.ProductSupplyItem)
+def remember_supply_item_day(sender, instance, **kwargs):
+    instance._previous_rollup_day = None
+    if instance.pk:
+        instance._previous_rollup_day = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('supply__showroom', 'date_created').first()
+
+
+@receiver(post_save, sender=models.ProductSupplyItem)
+def refresh_supply_item_day(sender, instance, **kwargs):
+    days = {(instance.supply.showroom_id, rollups.local_date(instance.date_created))}
+
+    previous_day = getattr(instance, '_previous_rollup_day', None)
+    if previous_day:
+        showroom_id, date_created = previous_day
+        days.add((showroom_id, rollups.local_date(date_created)))
+
+    for showroom_id, date in days:
+        rollups.refresh_supplies(showroom_id, [date])
+
+
+@receiver(post_delete, sender=models.ProductSupplyItem)
+def refresh_deleted_supply_item_day(sender, instance, origin=None, **kwargs):
+    if is_cascade_from_showroom(origin):
+        return
+
+    try:
+        showroom_id = instance.supply.showroom_id
+    except ObjectDoesNotExist:
+        return
+
+    refresh_once(origin or instance, rollups.refresh_supplies, showroom_id, rollups.local_date(instance.date_created))
+
+
+@receiver(pre_save, sender=models.ProductSupply)
+def remember_supply_showroom(sender, instance, **kwargs):
+    instance._previous_showroom_id = None
+    if instance.pk:
+        instance._previous_showroom_id = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('showroom', flat=True).first()
+
+
+@receiver(post_save, sender=models.ProductSupply)
+def refresh_supply_days(sender, instance, created, **kwargs):
+    """
+    Смена дилера или автосалона поставки меняет сводки за все дни ее строк
+    """
+
+    if created:
+        return
+
+    dates = rollups.item_dates(instance.supplied_products.all())
+    showroom_ids = {instance.showroom_id, getattr(instance, '_previous_showroom_id', None)}
+
+    for showroom_id in showroom_ids - {None}:
+        rollups.refresh_supplies(showroom_id, dates)
+
+
+# Поколение статистики автосалона #
+
+statistics_sources = {
+    models.Product: 'showroom_id',
+    models.ProductCategory: 'showroom_id',
+    models.Employee: 'showroom_id',
+    models.Dealer: 'showroom_id',
+    models.ProductSale: 'showroom_id',
+    models.ProductSupply: 'showroom_id',
+    models.ProductSaleItem: 'sale.showroom_id',
+    models.ProductSupplyItem: 'supply.showroom_id',
+}
+
+
+def statistics_showroom_id(instance):
+    value = instance
+    for attribute in statistics_sources[type(instance)].split('.'):
+        value = getattr(value, attribute)
+    return value
+
+
+def bump_statistics_generation(sender, instance, origin=None, **kwargs):
+    if is_cascade_from_showroom(origin):
+        return
+
+    try:
+        showroom_id = statistics_showroom_id(instance)
+    except ObjectDoesNotExist:
+        return
+
+    if origin is None or first_time_for_origin(origin, ('generation', showroom_id)):
+        models.Showroom.bump_generation(showroom_id)
+
+
+for statistics_source in statistics_sources:
+    post_save.connect(bump_statistics_generation, sender=statistics_source)
+    post_delete.connect(bump_statistics_generation, sender=statistics_source)
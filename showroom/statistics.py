@@ -0,0 +1,502 @@
+from datetime import date, datetime, time, timedelta
+from django.apps import apps
+from django.db import models
+from django.db.models.functions import NullIf, Trunc
+from django.utils import timezone
+
+
+GRANULARITIES = {
+    'day': 'По дням',
+    'week': 'По неделям',
+    'month': 'По месяцам',
+    'quarter': 'По кварталам',
+}
+
+
+class StatisticsGroup:
+    """
+    Группа метрик, вычисляемых по одной исходной таблице
+
+    Каждая группа агрегирует свою исходную модель отдельным запросом,
+    отбирая строки полусоединением (IN (SELECT ...)) с выборкой модели статистики.
+    Благодаря этому строки разных таблиц не перемножаются между собой,
+    а стоимость запроса растет линейно от кол-ва строк исходной таблицы.
+
+    Поле source - исходная модель в формате 'app_label.ModelName'.
+    Поле lookup - путь от исходной модели к модели статистики.
+        Если путь проходит через связь "один ко многим", его нужно разбить
+        на несколько частей (кортеж), каждая из которых станет отдельным подзапросом.
+    Поле fields - агрегаты, вычисляемые по строкам исходной модели.
+    Поле annotations - функция, возвращающая вычисляемые поля исходной модели,
+        используемые в агрегатах. Вызывается лениво, так как подзапросы
+        можно строить только после загрузки всех моделей.
+    Поле showroom_lookup - путь от исходной модели к автосалону.
+        Если указан, метрики группы можно посчитать сразу по всем объектам автосалона.
+
+    Период (date_from, date_to) отбирается по первому из statistics_filter_fields
+    исходной модели: у дневных сводок это поле date, у остальных моделей - date_created.
+    """
+
+    def __init__(self, source, lookup, fields, annotations=None, showroom_lookup=None):
+        self.source = source
+        self.lookup = (lookup, ) if isinstance(lookup, str) else tuple(lookup)
+        self.fields = fields
+        self.annotations = annotations
+        self.showroom_lookup = showroom_lookup
+
+    @property
+    def source_model(self):
+        return apps.get_model(self.source)
+
+    @property
+    def date_field(self):
+        filter_fields = getattr(self.source_model, 'statistics_filter_fields', None)
+        return filter_fields[0] if filter_fields else 'date_created'
+
+    def get_queryset(self, queryset, date_from=None, date_to=None):
+        """
+        Строки исходной модели, относящиеся к объектам выборки queryset
+        и попадающие в период с date_from по date_to включительно
+        """
+
+        source_queryset = semi_join(self.source_model, self.lookup, queryset.values('pk'))
+        source_queryset = source_queryset.filter(
+            period_filter(self.source_model, self.date_field, date_from, date_to)
+        )
+        return source_queryset.order_by().annotate(**self.get_annotations())
+
+    def get_annotations(self):
+        return self.annotations() if self.annotations else {}
+
+    def aggregate(self, queryset, date_from=None, date_to=None):
+        return self.get_queryset(queryset, date_from, date_to).aggregate(**self.fields)
+
+    def time_series(self, queryset, granularity, date_from=None, date_to=None):
+        """
+        Метрики группы с разбивкой по периодам granularity.
+        Один сгруппированный запрос: строка результата - начало периода и значения метрик.
+        """
+
+        return self.get_queryset(queryset, date_from, date_to).annotate(
+            statistics_period=Trunc(self.date_field, granularity, output_field=models.DateField())
+        ).values('statistics_period').annotate(**self.fields).order_by('statistics_period')
+
+    def ranking(self, queryset, name, limit):
+        """
+        Ключи объектов выборки с наибольшими значениями метрики name: [(pk, значение), ...].
+        Один запрос: строки исходной модели группируются по объекту,
+        сортируются по значению метрики и ограничиваются LIMIT.
+        Доступно только для групп с путем из одной части.
+        """
+
+        lookup, = self.lookup
+        return list(
+            self.get_queryset(queryset).exclude(
+                **{f'{lookup}__isnull': True}
+            ).values(lookup).annotate(
+                statistics_value=self.fields[name]
+            ).order_by(
+                models.F('statistics_value').desc(nulls_last=True),
+                lookup
+            ).values_list(lookup, 'statistics_value')[:limit]
+        )
+
+    def compare(self, queryset, date_from, date_to, previous_from, previous_to):
+        """
+        Метрики группы за текущий и предыдущий периоды одним запросом.
+        Отбираются строки обоих периодов, а каждый агрегат вычисляется дважды
+        с условием (FILTER (WHERE ...)) на свой период.
+        """
+
+        model, date_field = self.source_model, self.date_field
+        current = period_filter(model, date_field, date_from, date_to)
+        previous = period_filter(model, date_field, previous_from, previous_to)
+
+        aggregates = {}
+        for name, expression in self.fields.items():
+            aggregates[f'{name}__current'] = filter_aggregates(expression, current)
+            aggregates[f'{name}__previous'] = filter_aggregates(expression, previous)
+
+        values = self.get_queryset(
+            queryset,
+            min(date_from, previous_from),
+            max(date_to, previous_to)
+        ).aggregate(**aggregates)
+
+        return {
+            name: (values[f'{name}__current'], values[f'{name}__previous'])
+            for name in self.fields
+        }
+
+    def subquery(self, name):
+        """
+        Коррелированный подзапрос, вычисляющий метрику name
+        для каждой строки внешней выборки модели статистики
+        """
+
+        source_queryset = correlate(self.source_model, self.lookup, models.OuterRef('pk'))
+        return self._subquery(source_queryset, name)
+
+    def showroom_subquery(self, name):
+        """
+        Коррелированный подзапрос, вычисляющий метрику name
+        сразу по всем объектам автосалона внешней выборки
+        """
+
+        source_queryset = self.source_model._default_manager.filter(
+            **{self.showroom_lookup: models.OuterRef('pk')}
+        )
+        return self._subquery(source_queryset, name)
+
+    def _subquery(self, source_queryset, name):
+        # Группировка по константе - агрегат по всем отобранным строкам
+        values = source_queryset.order_by().annotate(
+            statistics_group=models.Value(1),
+            **self.get_annotations()
+        ).values('statistics_group').annotate(value=self.fields[name]).values('value')
+
+        return models.Subquery(values, output_field=self.fields[name].output_field)
+
+
+def related_model(model, lookup):
+    for field_name in lookup.split('__'):
+        if field_name == 'pk':
+            continue
+        model = model._meta.get_field(field_name).related_model
+    return model
+
+
+def semi_join(model, lookups, values):
+    """
+    Отбирает строки модели model, связанные с values по цепочке lookups.
+    Каждое звено цепочки превращается в отдельный подзапрос IN (...),
+    поэтому дубликаты, возникающие при соединении по обратным связям, не появляются.
+    """
+
+    lookup, *nested_lookups = lookups
+
+    if nested_lookups:
+        nested_model = related_model(model, lookup)
+        values = semi_join(nested_model, nested_lookups, values).values('pk')
+
+    return model._default_manager.filter(**{f'{lookup}__in': values})
+
+
+def correlate(model, lookups, value):
+    """
+    То же, что semi_join, но для одной строки внешнего запроса (value - OuterRef)
+    """
+
+    lookup, *nested_lookups = lookups
+
+    if nested_lookups:
+        nested_model = related_model(model, lookup)
+        values = correlate(nested_model, nested_lookups, models.OuterRef(value)).values('pk')
+        return model._default_manager.filter(**{f'{lookup}__in': values})
+
+    return model._default_manager.filter(**{lookup: value})
+
+
+def find_group(model, name):
+    for group in model.statistics_groups or []:
+        if name in group.fields:
+            return group
+    raise KeyError(f'{model.__name__} has no statistics field {name!r}')
+
+
+def row_annotations(model, names):
+    return {name: find_group(model, name).subquery(name) for name in names}
+
+
+def leaderboard(queryset, name, limit=10):
+    """
+    Объекты выборки с наибольшими значениями метрики name: [(объект, значение), ...].
+    Если путь группы метрики составной, объекты сортируются
+    по коррелированному подзапросу (см. StatisticsQuerySet.with_statistics).
+    """
+
+    group = find_group(queryset.model, name)
+
+    if len(group.lookup) > 1:
+        objects = queryset.annotate(
+            statistics_value=group.subquery(name)
+        ).exclude(
+            statistics_value=None
+        ).order_by(
+            models.F('statistics_value').desc(),
+            'pk'
+        )[:limit]
+        return [(model_object, model_object.statistics_value) for model_object in objects]
+
+    ranking = group.ranking(queryset, name, limit)
+    objects = queryset.in_bulk([pk for pk, _ in ranking])
+    return [(objects[pk], value) for pk, value in ranking if pk in objects]
+
+
+def compute_statistics(queryset, date_from=None, date_to=None, granularity=None, compare=False):
+    """
+    Вычисляет все группы метрик модели выборки queryset за период с date_from по date_to.
+    Если указана разбивка granularity, возвращает временной ряд по каждой метрике
+    (см. compute_time_series), а если указан compare - сравнение
+    с предыдущим периодом (см. compute_comparison).
+    """
+
+    if compare:
+        return compute_comparison(queryset, date_from, date_to)
+
+    if granularity:
+        return compute_time_series(queryset, granularity, date_from, date_to)
+
+    statistics = {}
+    for group in queryset.model.statistics_groups or []:
+        statistics.update(group.aggregate(queryset, date_from, date_to))
+    return statistics
+
+
+def compute_time_series(queryset, granularity, date_from=None, date_to=None):
+    """
+    Временной ряд каждой метрики: {метрика: [(начало периода, значение), ...]}.
+    Ряды всех метрик выровнены по одним и тем же периодам,
+    для периодов без данных значение - None.
+    """
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unknown granularity {granularity!r}')
+
+    values = {}
+    periods = set()
+    for group in queryset.model.statistics_groups or []:
+        group_values = {name: {} for name in group.fields}
+        for row in group.time_series(queryset, granularity, date_from, date_to):
+            period = row.pop('statistics_period')
+            periods.add(period)
+            for name, value in row.items():
+                group_values[name][period] = value
+        values.update(group_values)
+
+    if date_from and date_to:
+        periods.update(period_starts(date_from, date_to, granularity))
+
+    periods = sorted(periods)
+    return {
+        name: [(period, metric_values.get(period)) for period in periods]
+        for name, metric_values in values.items()
+    }
+
+
+def compute_comparison(queryset, date_from, date_to):
+    """
+    Сравнение каждой метрики с предыдущим периодом той же длины:
+    {метрика: {'current': ..., 'previous': ..., 'delta': ..., 'delta_percent': ...}}
+    """
+
+    previous_from, previous_to = previous_period(date_from, date_to)
+
+    comparison = {}
+    for group in queryset.model.statistics_groups or []:
+        values = group.compare(queryset, date_from, date_to, previous_from, previous_to)
+        for name, (current, previous) in values.items():
+            comparison[name] = compare_values(current, previous)
+    return comparison
+
+
+def compare_values(current, previous):
+    delta = None
+    delta_percent = None
+
+    if current is not None and previous is not None:
+        delta = current - previous
+        if previous:
+            delta_percent = round(float(delta) / float(previous) * 100, 2)
+
+    return {
+        'current': current,
+        'previous': previous,
+        'delta': delta,
+        'delta_percent': delta_percent,
+    }
+
+
+def previous_period(date_from, date_to):
+    """
+    Период той же длины, непосредственно предшествующий периоду с date_from по date_to
+    """
+
+    previous_to = date_from - timedelta(days=1)
+    return previous_to - (date_to - date_from), previous_to
+
+
+def filter_aggregates(expression, condition):
+    """
+    Копия выражения, в которой каждый агрегат учитывает только строки,
+    удовлетворяющие условию condition
+    """
+
+    if not hasattr(expression, 'get_source_expressions'):
+        return expression
+
+    expression = expression.copy()
+    if isinstance(expression, models.Aggregate):
+        expression.filter = condition
+        return expression
+
+    expression.set_source_expressions([
+        filter_aggregates(source, condition)
+        for source in expression.get_source_expressions()
+    ])
+    return expression
+
+
+def period_filter(model, field_name, date_from=None, date_to=None):
+    """
+    Условие попадания поля field_name в период с date_from по date_to включительно.
+    Поле сравнивается с границами периода без приведения к дате,
+    чтобы база данных могла использовать индекс по нему.
+    """
+
+    is_datetime = isinstance(model._meta.get_field(field_name), models.DateTimeField)
+    condition = models.Q()
+
+    if date_from:
+        start = start_of_day(date_from) if is_datetime else date_from
+        condition &= models.Q(**{f'{field_name}__gte': start})
+
+    if date_to:
+        end = date_to + timedelta(days=1)
+        condition &= models.Q(**{f'{field_name}__lt': start_of_day(end) if is_datetime else end})
+
+    return condition
+
+
+def start_of_day(value):
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def truncate_date(value, granularity):
+    """
+    Начало периода granularity, содержащего дату value (так же, как Trunc в базе данных)
+    """
+
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return value.replace(day=1)
+    if granularity == 'quarter':
+        return date(value.year, (value.month - 1) // 3 * 3 + 1, 1)
+    return value
+
+
+def period_starts(date_from, date_to, granularity):
+    """
+    Начала всех периодов granularity с date_from по date_to
+    """
+
+    period = truncate_date(date_from, granularity)
+    while period <= date_to:
+        yield period
+
+        if granularity == 'day':
+            period += timedelta(days=1)
+        elif granularity == 'week':
+            period += timedelta(weeks=1)
+        else:
+            months = 3 if granularity == 'quarter' else 1
+            month = period.month - 1 + months
+            period = date(period.year + month // 12, month % 12 + 1, 1)
+
+
+def average(total, count):
+    return models.ExpressionWrapper(
+        models.Sum(total) * 1.0 / NullIf(models.Sum(count), 0),
+        output_field=models.DecimalField(decimal_places=2)
+    )
+
+
+def daily_sales_fields(items_count, price, quantity, revenue, sales_count=None, profit=None):
+    """
+    Метрики по дневным сводкам продаж (AbstractDailySalesStatistics).
+    Аргументы задают названия метрик, принятые в конкретной модели.
+    """
+
+    fields = {}
+
+    if sales_count:
+        fields[sales_count] = models.ExpressionWrapper(
+            models.Sum('sales_count'),
+            output_field=models.IntegerField()
+        )
+
+    fields.update({
+        items_count: models.ExpressionWrapper(
+            models.Sum('items_count'),
+            output_field=models.IntegerField()
+        ),
+
+        # Статистика по цене проданного товара
+        f'{price}_avg': average('price_sum', 'items_count'),
+        f'{price}_sum': models.ExpressionWrapper(
+            models.Sum('price_sum'),
+            output_field=models.IntegerField()
+        ),
+        f'{price}_min': models.ExpressionWrapper(
+            models.Min('price_min'),
+            output_field=models.IntegerField()
+        ),
+        f'{price}_max': models.ExpressionWrapper(
+            models.Max('price_max'),
+            output_field=models.IntegerField()
+        ),
+
+        # Статистика по кол-ву проданного товара
+        f'{quantity}_avg': average('quantity_sum', 'items_count'),
+        f'{quantity}_sum': models.ExpressionWrapper(
+            models.Sum('quantity_sum'),
+            output_field=models.IntegerField()
+        ),
+        f'{quantity}_min': models.ExpressionWrapper(
+            models.Min('quantity_min'),
+            output_field=models.IntegerField()
+        ),
+        f'{quantity}_max': models.ExpressionWrapper(
+            models.Max('quantity_max'),
+            output_field=models.IntegerField()
+        ),
+
+        # Оборот - сумма цен проданного товара с учетом кол-ва
+        revenue: models.ExpressionWrapper(
+            models.Sum('revenue_sum'),
+            output_field=models.IntegerField()
+        ),
+    })
+
+    if profit:
+        # Выручка - оборот за вычетом себестоимости проданного товара.
+        # Среднее считается только по позициям с известной себестоимостью.
+        fields.update({
+            f'{profit}_avg': average('profit_sum', 'costed_items_count'),
+            f'{profit}_sum': models.ExpressionWrapper(
+                models.Sum('profit_sum'),
+                output_field=models.DecimalField(decimal_places=2)
+            ),
+            f'{profit}_min': models.ExpressionWrapper(
+                models.Min('profit_min'),
+                output_field=models.DecimalField(decimal_places=2)
+            ),
+            f'{profit}_max': models.ExpressionWrapper(
+                models.Max('profit_max'),
+                output_field=models.DecimalField(decimal_places=2)
+            ),
+        })
+
+    return fields
+
+
+def sale_profit():
+    """
+    Выручка строки продажи по себестоимости, сохраненной при продаже (см. costing.py)
+    """
+
+    return models.ExpressionWrapper(
+        (models.F('sale_price') - models.F('unit_cost')) * models.F('quantity'),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2)
+    )
@@ -8,6 +8,12 @@ register = template.Library()
 
 @register.inclusion_tag('showroom/inclusions/showroom_list_sidebar.html', name='showroom_sidebar', takes_context=True)
 def showroom_sidebar(context):
+    # Страницы автосалона берут список автосалонов владельца из области страницы
+    view = context.get('view')
+    if hasattr(view, 'owner_showrooms'):
+        context['owner_showrooms'] = view.owner_showrooms
+    else:
+        context['owner_showrooms'] = list(context['request'].user.showrooms.all())
     return context
 
 
@@ -15,8 +21,10 @@ def showroom_sidebar(context):
     'showroom/inclusions/statistics_model_card.html',
     name='statistics_model_card'
 )
-def statistics_model_card(model_short, model, showroom):
+def statistics_model_card(model_short, model, showroom, section=None):
     return {
+        'count': section and section['count'],
+        'headlines': section and section['headlines'],
         'description': statistics_descriptions.get(model_short),
         'model_short': model_short,
         'model': model,
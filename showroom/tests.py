@@ -1,3 +1,1810 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, models as db_models
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import Client, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.contrib.auth import get_user_model
 
-# Create your tests here.
+from account import tokens, urls as account_urls
+from AutoServiceAdmin import metrics
+
+from . import costing, explain, forms, imports, models, profiling, rollups, services, urls as showroom_urls
+from .benchmarks import compare_results, dataset_showroom, load_dataset_showroom, percentile, run_suite
+from .caching import statistics_cache
+from .dataset import delete_dataset, generate_dataset, owner_username
+from .export import export_lines
+from .dashboard import load_dashboard, load_leaderboards
+from .statistics import leaderboard
+from .views import statistics_models
+
+
+class StatisticsTestMixin:
+    """
+    Небольшой набор данных для проверки статистики
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='password',
+            first_name='Иван',
+            last_name='Иванов',
+            is_email_verified=True
+        )
+        cls.showroom = models.Showroom.objects.create(
+            title='Автосалон',
+            phone_number='+79990000000',
+            owner=cls.user
+        )
+        cls.category = models.ProductCategory.objects.create(name='Шины', showroom=cls.showroom)
+        cls.dealer = models.Dealer.objects.create(name='Дилер', showroom=cls.showroom)
+        cls.employee = models.Employee.objects.create(
+            first_name='Петр',
+            last_name='Петров',
+            surname='Петрович',
+            phone_number='+79990000001',
+            showroom=cls.showroom
+        )
+        cls.product = models.Product.objects.create(
+            title='Шина',
+            price=100,
+            quantity=10,
+            category=cls.category,
+            showroom=cls.showroom
+        )
+
+        # Две поставки одного товара по разной цене
+        for supply_price in (40, 60):
+            supply = models.ProductSupply.objects.create(dealer=cls.dealer, showroom=cls.showroom)
+            models.ProductSupplyItem.objects.create(
+                product=cls.product,
+                supply=supply,
+                quantity=5,
+                supply_price=supply_price
+            )
+
+        # Одна продажа из двух строк
+        sale = models.ProductSale.objects.create(showroom=cls.showroom, employee=cls.employee)
+        for quantity in (1, 3):
+            models.ProductSaleItem.objects.create(
+                product=cls.product,
+                sale=sale,
+                quantity=quantity,
+                sale_price=100
+            )
+
+
+class StatisticsEngineTests(StatisticsTestMixin, TestCase):
+    def test_showroom_statistics_are_not_multiplied_by_supplies(self):
+        statistics = self.showroom.statistics()
+
+        self.assertEqual(statistics['sales_count'], 1)
+        self.assertEqual(statistics['sales_products_count'], 2)
+        self.assertEqual(statistics['sales_products_quantity_sum'], 4)
+        self.assertEqual(statistics['sales_profit_sum'], 240)
+
+    def test_dealer_statistics_are_not_multiplied_by_supplies(self):
+        statistics = self.dealer.statistics()
+
+        self.assertEqual(statistics['supply_count'], 2)
+        self.assertEqual(statistics['supply_product_count'], 2)
+        self.assertEqual(statistics['supply_sales_count'], 2)
+        self.assertEqual(statistics['supply_sales_quantity_sum'], 4)
+
+    def test_queryset_statistics_use_one_query_per_group(self):
+        queryset = models.Employee.objects.filter(showroom=self.showroom)
+
+        with self.assertNumQueries(len(models.Employee.statistics_groups)):
+            statistics = queryset.statistics()
+
+        self.assertEqual(statistics['sales_count'], 1)
+        self.assertEqual(statistics['sales_products_price_sum'], 200)
+
+
+class CostingTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fifo_consumes_oldest_batches(self):
+        costs = models.ProductSaleItem.objects.order_by('pk').values_list('unit_cost', flat=True)
+        self.assertEqual(list(costs), [40, 40])
+
+        # В первой партии осталась одна единица, следующие берутся из второй
+        self.product.sell(3, employee=self.employee)
+        item = models.ProductSaleItem.objects.latest('pk')
+        self.assertEqual(item.unit_cost, Decimal('53.33'))
+
+        left = models.ProductSupplyItem.objects.order_by('pk').values_list('quantity_left', flat=True)
+        self.assertEqual(list(left), [0, 3])
+
+    def test_units_beyond_stock_use_last_supply_price(self):
+        # Остатков 6 шт., две недостающие единицы оцениваются по 60
+        self.product.sell(8, employee=self.employee)
+        item = models.ProductSaleItem.objects.latest('pk')
+        self.assertEqual(item.unit_cost, Decimal('57.50'))
+
+    @override_settings(SHOWROOM_COSTING_METHOD='average')
+    def test_weighted_average_of_remaining_stock(self):
+        self.product.sell(1, employee=self.employee)
+        item = models.ProductSaleItem.objects.latest('pk')
+
+        # Остатки: 1 шт. по 40 и 5 шт. по 60
+        self.assertEqual(item.unit_cost, Decimal('56.67'))
+
+    def test_profit_comes_from_stored_costs(self):
+        self.assertEqual(self.product.statistics()['sales_profit_sum'], 240)
+        self.assertEqual(self.product.statistics()['sales_profit_max'], 180)
+
+    def costing_state(self):
+        costs = models.ProductSaleItem.objects.order_by('pk').values_list('unit_cost', flat=True)
+        left = models.ProductSupplyItem.objects.order_by('pk').values_list('quantity_left', flat=True)
+        return list(costs), list(left)
+
+    def assertMatchesRecalculation(self):
+        state = self.costing_state()
+        profit = self.product.statistics()['sales_profit_sum']
+
+        costing.recalculate_costs(self.showroom.pk)
+        rollups.rebuild(self.showroom.pk)
+        cache.clear()
+
+        self.assertEqual(self.costing_state(), state)
+        self.assertEqual(self.product.statistics()['sales_profit_sum'], profit)
+
+    def test_deleted_sale_item_returns_stock(self):
+        self.product.sell(3, employee=self.employee)
+        models.ProductSaleItem.objects.get(quantity=3, unit_cost=40).delete()
+
+        # Списанные удаленной строкой единицы вернулись в первую партию,
+        # и последняя продажа теперь списана с нее же
+        self.assertEqual(self.costing_state(), ([40, 40], [1, 5]))
+        self.assertMatchesRecalculation()
+
+    def test_deleted_sale_returns_stock_of_all_items(self):
+        self.product.sell(3, employee=self.employee)
+        models.ProductSale.objects.get(sold_products__quantity=1).delete()
+
+        self.assertEqual(self.costing_state(), ([40], [2, 5]))
+        self.assertMatchesRecalculation()
+
+    def test_edited_sale_item_is_recosted(self):
+        self.product.sell(3, employee=self.employee)
+        item = models.ProductSaleItem.objects.order_by('pk').first()
+        item.quantity = 4
+        item.save()
+
+        self.assertEqual(item.unit_cost, 40)
+        self.assertEqual(self.costing_state(), ([40, Decimal('53.33'), 60], [0, 0]))
+        self.assertMatchesRecalculation()
+
+    def test_recalculation_matches_costs_assigned_on_sale(self):
+        self.product.sell(3, employee=self.employee)
+        expected = list(models.ProductSaleItem.objects.order_by('pk').values_list('unit_cost', flat=True))
+
+        models.ProductSaleItem.objects.update(unit_cost=None)
+        costing.recalculate_costs(self.showroom.pk)
+
+        costs = models.ProductSaleItem.objects.order_by('pk').values_list('unit_cost', flat=True)
+        self.assertEqual(list(costs), expected)
+
+
+class CheckoutTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [self.product] + [
+            models.Product.objects.create(
+                title=f'Диск {index}',
+                price=50,
+                quantity=10,
+                category=self.category,
+                showroom=self.showroom
+            )
+            for index in range(4)
+        ]
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        cart = [(product, 1) for product in self.products[1:]]
+
+        # Первая продажа создает дневные сводки товаров, следующие - обновляют их
+        services.checkout(self.showroom, cart, employee=self.employee)
+
+        with CaptureQueriesContext(connection) as small:
+            services.checkout(self.showroom, cart[:1], employee=self.employee)
+
+        with CaptureQueriesContext(connection) as large:
+            services.checkout(self.showroom, cart, employee=self.employee)
+
+        self.assertEqual(len(large), len(small))
+
+    def test_checkout_updates_stock_and_statistics(self):
+        sale = services.checkout(
+            self.showroom,
+            [(self.product, 2), (self.products[1].pk, 3), (self.product, 1)],
+            employee=self.employee
+        )
+
+        self.assertEqual(sale.sold_products.count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 7)
+
+        # Инкрементально обновленные сводки совпадают с полным пересчетом
+        showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        statistics = showroom.statistics()
+        self.assertEqual(statistics['sales_count'], 2)
+        self.assertEqual(statistics['sales_revenue'], 400 + 300 + 150)
+
+        rollups.rebuild(self.showroom.pk)
+        cache.clear()
+        self.assertEqual(showroom.statistics(), statistics)
+
+    def test_insufficient_stock_rolls_back(self):
+        with self.assertRaises(ValidationError):
+            services.checkout(self.showroom, [(self.products[1], 1), (self.product, 11)])
+
+        self.assertEqual(models.ProductSale.objects.count(), 1)
+        self.assertEqual(models.Product.objects.get(pk=self.products[1].pk).quantity, 10)
+
+    def test_foreign_products_are_rejected(self):
+        other = models.Showroom.objects.create(title='Другой', phone_number='+79990000003', owner=self.user)
+
+        with self.assertRaises(ValidationError):
+            services.checkout(other, [(self.product, 1)])
+
+
+class SaleAPITests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        self.token = self.showroom.issue_api_token()
+
+    def post_sale(self, body, token=None):
+        return self.client.post(
+            reverse('api_sales'),
+            json.dumps(body),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token or self.token}'
+        )
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get(reverse('api_products')).status_code, 401)
+        self.assertEqual(self.post_sale({'lines': []}, token='wrong').status_code, 401)
+
+    def test_product_stock_lookup(self):
+        response = self.client.get(
+            reverse('api_products'),
+            {'slug': str(self.product.slug)},
+            HTTP_AUTHORIZATION=f'Token {self.token}'
+        )
+
+        products = response.json()['products']
+        self.assertEqual(len(products), 1)
+        self.assertEqual((products[0]['price'], products[0]['quantity']), (100, 10))
+
+    def test_sale_is_recorded(self):
+        response = self.post_sale({
+            'employee': str(self.employee.slug),
+            'lines': [{'product': str(self.product.slug), 'quantity': 3}]
+        })
+
+        self.assertEqual(response.status_code, 201)
+        sale = models.ProductSale.objects.get(slug=response.json()['sale'])
+        self.assertEqual(sale.employee, self.employee)
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).quantity, 7)
+
+    def test_batch_of_sales(self):
+        line = {'product': str(self.product.slug), 'quantity': 4}
+        response = self.post_sale({'sales': [{'lines': [line]}, {'lines': []}, {'lines': [line]}, {'lines': [line]}]})
+
+        results = response.json()['sales']
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(['sale' in result for result in results], [True, False, True, False])
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).quantity, 2)
+
+        # Сводки, обновленные один раз на пакет, совпадают с полным пересчетом
+        showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        statistics = showroom.statistics()
+        self.assertEqual(statistics['sales_count'], 3)
+
+        rollups.rebuild(self.showroom.pk)
+        cache.clear()
+        self.assertEqual(showroom.statistics(), statistics)
+
+    def test_batch_resolves_employees_in_one_query(self):
+        employees = [self.employee] + [
+            models.Employee.objects.create(
+                first_name='Продавец',
+                last_name=f'Номер {index}',
+                phone_number=f'+7999000001{index}',
+                showroom=self.showroom
+            )
+            for index in range(4)
+        ]
+        sales = [
+            {'employee': str(employee.slug), 'lines': [{'product': str(self.product.slug), 'quantity': 1}]}
+            for employee in employees
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_sale({'sales': sales})
+
+        self.assertTrue(all('sale' in result for result in response.json()['sales']))
+        employee_queries = [query for query in queries if 'FROM "showroom_employee"' in query['sql']]
+        self.assertEqual(len(employee_queries), 1)
+        self.assertEqual(
+            list(models.ProductSale.objects.order_by('pk').values_list('employee', flat=True))[1:],
+            [employee.pk for employee in employees]
+        )
+
+    def test_fractional_or_non_positive_quantity_is_rejected(self):
+        for quantity in (1.9, 2.0, 0, -1, '1.5', True, None):
+            response = self.post_sale({'lines': [{'product': str(self.product.slug), 'quantity': quantity}]})
+            self.assertEqual(response.status_code, 400, quantity)
+
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).quantity, 10)
+
+    def test_invalid_sale_is_rejected(self):
+        other = models.Product.objects.create(
+            title='Чужой',
+            price=1,
+            quantity=1,
+            category=self.category,
+            showroom=models.Showroom.objects.create(title='Другой', phone_number='+79990000003', owner=self.user)
+        )
+
+        for lines in ([{'product': str(other.slug), 'quantity': 1}],
+                      [{'product': 'bad', 'quantity': 1}],
+                      [{'product': str(self.product.slug), 'quantity': 11}]):
+            response = self.post_sale({'lines': lines})
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.json()['errors'])
+
+        self.assertEqual(models.ProductSale.objects.count(), 1)
+
+
+class StatisticsAPITests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.token = models.Showroom.objects.get(pk=self.showroom.pk).issue_api_token()
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token}'}
+
+    def test_raw_statistics(self):
+        urls = [
+            reverse('api_showroom_statistics', kwargs={'showroom_slug': self.showroom.slug}),
+            reverse('api_section_statistics', kwargs={'showroom_slug': self.showroom.slug, 'model_name': 'products'}),
+            reverse('api_object_statistics', kwargs={
+                'showroom_slug': self.showroom.slug,
+                'model_name': 'employees',
+                'object_slug': self.employee.slug
+            }),
+        ]
+
+        for url in urls:
+            response = self.client.get(url, **self.auth)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('sales_revenue', response.json()['statistics'])
+
+    def test_unchanged_statistics_return_304_with_one_query(self):
+        url = reverse('api_section_statistics', kwargs={'showroom_slug': self.showroom.slug, 'model_name': 'products'})
+        response = self.client.get(url, {'date_from': '2020-01-01'}, **self.auth)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'date_from': '2020-01-01'}, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+
+        # Другой период - другой ответ
+        response = self.client.get(url, {'date_from': '2021-01-01'}, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+        # Изменение данных автосалона меняет отпечаток
+        self.product.sell(1, employee=self.employee)
+        response = self.client.get(url, {'date_from': '2020-01-01'}, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_showroom_edit_keeps_generation(self):
+        showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        generation = showroom.statistics_generation
+
+        # Данные изменились, пока форма автосалона была открыта
+        models.Showroom.bump_generation(showroom.pk)
+        showroom.title = 'Новое название'
+        showroom.save()
+
+        showroom.refresh_from_db()
+        self.assertEqual(showroom.statistics_generation, generation + 1)
+
+
+class ConditionalPageTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.urls = [
+            reverse('showroom_detail', kwargs={'showroom_slug': self.showroom.slug}),
+            reverse('statistics_list', kwargs={'showroom_slug': self.showroom.slug, 'model_name': 'products'}),
+            reverse('statistics_detail', kwargs={
+                'showroom_slug': self.showroom.slug,
+                'model_name': 'products',
+                'object_slug': self.product.slug
+            }),
+        ]
+
+    def test_unchanged_pages_return_304(self):
+        # Первая страница выдает CSRF-cookie, от которой тоже зависит отпечаток
+        self.client.get(self.urls[0])
+
+        for url in self.urls:
+            etag = self.client.get(url)['ETag']
+
+            # Сессия, пользователь и автосалон
+            with self.assertNumQueries(3):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_pages(self):
+        url = self.urls[0]
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.product.sell(1, employee=self.employee)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Новый автосалон появляется в боковой панели
+        etag = response['ETag']
+        models.Showroom.objects.create(title='Второй', phone_number='+79990000003', owner=self.user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ShowroomScopeTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def scope_queries(self, queries, table):
+        return [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and f'FROM "{table}" WHERE' in query['sql']
+            and f'"{table}"."slug" =' in query['sql']
+        ]
+
+    def test_scope_is_resolved_once_per_request(self):
+        showroom_kwargs = {'showroom_slug': self.showroom.slug}
+        section_kwargs = dict(showroom_kwargs, model_name='products')
+        object_kwargs = dict(section_kwargs, object_slug=self.product.slug)
+
+        urls = [
+            (reverse(name, kwargs=showroom_kwargs), False) for name in (
+                'showroom_detail', 'showroom_edit', 'showroom_delete', 'showroom_leaderboards', 'supply_receive'
+            )
+        ] + [
+            (reverse(name, kwargs=section_kwargs), False) for name in (
+                'statistics_list', 'statistics_stat', 'statistics_import', 'statistics_create'
+            )
+        ] + [
+            (reverse('statistics_export', kwargs=dict(section_kwargs, export_format='csv')), False)
+        ] + [
+            (reverse(name, kwargs=object_kwargs), True) for name in (
+                'statistics_detail', 'statistics_edit', 'statistics_delete'
+            )
+        ]
+
+        for url, with_object in urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                if hasattr(response, 'streaming_content'):
+                    b''.join(response.streaming_content)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(self.scope_queries(queries, 'showroom_showroom')), 1)
+                self.assertEqual(len(self.scope_queries(queries, 'showroom_product')), int(with_object))
+
+    def test_form_submission_resolves_scope_once(self):
+        url = reverse('statistics_edit', kwargs={
+            'showroom_slug': self.showroom.slug,
+            'model_name': 'categories',
+            'object_slug': self.category.slug
+        })
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'name': 'Диски', 'version': self.category.version})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(self.scope_queries(queries, 'showroom_showroom')), 1)
+        self.assertEqual(len(self.scope_queries(queries, 'showroom_productcategory')), 1)
+
+    def test_unknown_scope_is_not_found(self):
+        for kwargs in (
+            {'showroom_slug': self.showroom.slug, 'model_name': 'unknown'},
+            {'showroom_slug': self.showroom.slug, 'model_name': 'products', 'object_slug': self.category.slug},
+        ):
+            name = 'statistics_detail' if 'object_slug' in kwargs else 'statistics_list'
+            self.assertEqual(self.client.get(reverse(name, kwargs=kwargs)).status_code, 404)
+
+    def test_foreign_showroom_cannot_be_edited(self):
+        stranger = get_user_model().objects.create_user(
+            username='stranger',
+            email='stranger@example.com',
+            password='password',
+            first_name='Сидор',
+            last_name='Сидоров',
+            is_email_verified=True
+        )
+        self.client.force_login(stranger)
+
+        for name in ('showroom_edit', 'showroom_delete'):
+            url = reverse(name, kwargs={'showroom_slug': self.showroom.slug})
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class OptimisticLockingTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_save_is_rejected(self):
+        first = models.Product.objects.get(pk=self.product.pk)
+        second = models.Product.objects.get(pk=self.product.pk)
+
+        first.price = 120
+        first.save()
+        self.assertEqual(first.version, 1)
+
+        second.price = 90
+        with self.assertRaises(models.ConcurrentUpdateError):
+            second.save()
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).price, 120)
+
+    def test_edit_form_reports_conflict(self):
+        self.client.force_login(self.user)
+        url = reverse('statistics_edit', kwargs={
+            'showroom_slug': self.showroom.slug,
+            'model_name': 'products',
+            'object_slug': self.product.slug
+        })
+        data = {'title': 'Шина', 'price': 150, 'quantity': 10, 'category': self.category.pk, 'version': 0}
+
+        # Остатки изменились после открытия формы
+        self.product.sell(1, employee=self.employee)
+
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).quantity, 9)
+
+        # Повторное сохранение с актуальной версией проходит
+        data['version'] = response.context['form'].data['version']
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).price, 150)
+
+    def test_checkout_retries_after_conflict(self):
+        change_stock = services.change_stock
+        calls = []
+
+        def edit_before_change(changes, versions=None):
+            if not calls:
+                # Одновременное редактирование товара между чтением и списанием
+                models.Product.objects.filter(pk=self.product.pk).update(version=db_models.F('version') + 1)
+            calls.append(changes)
+            return change_stock(changes, versions)
+
+        with patch.object(services, 'change_stock', edit_before_change):
+            services.checkout(self.showroom, [(self.product, 2)], employee=self.employee)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).quantity, 8)
+        self.assertEqual(models.ProductSale.objects.count(), 2)
+
+
+    def test_rollup_created_by_concurrent_sale_is_merged(self):
+        locked_rollups = rollups.locked_rollups
+        missed = []
+
+        def miss_showroom_rollup(model, showroom_id, keys):
+            # Строку сводки дня уже создала другая продажа, но эта ее еще не видела
+            if model is models.ShowroomDailyStatistics and not missed:
+                missed.append(model)
+                return {}
+            return locked_rollups(model, showroom_id, keys)
+
+        with patch.object(rollups, 'locked_rollups', miss_showroom_rollup):
+            services.checkout(self.showroom, [(self.product, 2)], employee=self.employee)
+
+        self.assertEqual(missed, [models.ShowroomDailyStatistics])
+        daily = models.ShowroomDailyStatistics.objects.get(showroom=self.showroom)
+        self.assertEqual((daily.sales_count, daily.items_count, daily.quantity_sum), (2, 3, 6))
+
+@skipUnlessDBFeature('has_select_for_update')
+class CheckoutConcurrencyTests(TransactionTestCase):
+    def test_parallel_sales_do_not_lose_updates(self):
+        user = get_user_model().objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='password',
+            first_name='Иван',
+            last_name='Иванов'
+        )
+        showroom = models.Showroom.objects.create(title='Автосалон', phone_number='+79990000000', owner=user)
+        category = models.ProductCategory.objects.create(name='Шины', showroom=showroom)
+        products = [
+            models.Product.objects.create(
+                title=f'Шина {index}',
+                price=100,
+                quantity=100,
+                category=category,
+                showroom=showroom
+            )
+            for index in range(2)
+        ]
+
+        def sell():
+            try:
+                for _ in range(5):
+                    # Разный порядок товаров в корзине не должен приводить к взаимной блокировке
+                    services.checkout(showroom, [(products[1], 1), (products[0], 2)])
+                    services.checkout(showroom, [(products[0], 1), (products[1], 2)])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sell) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.quantity, 100 - 4 * 5 * 3)
+
+        self.assertEqual(models.ProductSale.objects.filter(showroom=showroom).count(), 40)
+        self.assertEqual(models.ShowroomDailyStatistics.objects.get(showroom=showroom).sales_count, 40)
+
+
+class SupplyReceiveTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.disk = models.Product.objects.create(
+            title='Диск',
+            price=50,
+            quantity=0,
+            category=self.category,
+            showroom=self.showroom
+        )
+
+    def test_supply_updates_stock_and_statistics(self):
+        supply, received = services.receive_supply(self.showroom, self.dealer, [
+            (1, 'Шина', '5', '70'),
+            (2, str(self.disk.slug), 4, 20),
+            (3, 'Диск', '1', '30'),
+        ])
+
+        self.assertEqual(received, 3)
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).quantity, 15)
+        self.assertEqual(models.Product.objects.get(pk=self.disk.pk).quantity, 5)
+        self.assertEqual(list(supply.supplied_products.values_list('quantity_left', flat=True)), [5, 4, 1])
+
+        # Инкрементально обновленные сводки совпадают с полным пересчетом
+        dealer = models.Dealer.objects.get(pk=self.dealer.pk)
+        statistics = dealer.statistics()
+        self.assertEqual(statistics['supply_count'], 3)
+        self.assertEqual(statistics['supply_product_quantity_sum'], 20)
+
+        rollups.rebuild(self.showroom.pk)
+        cache.clear()
+        self.assertEqual(dealer.statistics(), statistics)
+
+    def test_errors_of_all_batches_roll_back_supply(self):
+        lines = [(1, 'Диск', 1, 10), (2, 'Нет такого', 1, 10), (3, 'Диск', 1, 10), (4, 'Диск', 'много', 10)]
+
+        with self.assertRaises(ValidationError) as error:
+            services.receive_supply(self.showroom, self.dealer, lines, batch_size=2)
+
+        self.assertEqual(len(error.exception.messages), 2)
+        self.assertTrue(error.exception.messages[1].startswith('Строка 4'))
+        self.assertEqual(models.ProductSupply.objects.count(), 2)
+        self.assertEqual(models.Product.objects.get(pk=self.disk.pk).quantity, 0)
+
+    def test_query_count_depends_on_batches_only(self):
+        lines = [(number, 'Диск', 1, 10) for number in range(1, 1001)]
+
+        with CaptureQueriesContext(connection) as queries:
+            services.receive_supply(self.showroom, self.dealer, lines, batch_size=500)
+
+        self.assertLess(len(queries), 25)
+        self.assertEqual(models.Product.objects.get(pk=self.disk.pk).quantity, 1000)
+
+    def test_csv_manifest_upload(self):
+        self.client.force_login(self.user)
+        manifest = SimpleUploadedFile(
+            'manifest.csv',
+            'product;quantity;supply_price\nДиск;3;25\nШина;2;45\n'.encode()
+        )
+
+        response = self.client.post(
+            reverse('supply_receive', kwargs={'showroom_slug': self.showroom.slug}),
+            {'dealer': self.dealer.pk, 'manifest_file': manifest}
+        )
+
+        self.assertRedirects(response, reverse('showroom_detail', kwargs={'showroom_slug': self.showroom.slug}))
+        self.assertEqual(models.Product.objects.get(pk=self.disk.pk).quantity, 3)
+        self.assertEqual(models.Product.objects.get(pk=self.product.pk).quantity, 12)
+
+
+    def test_manifest_columns_must_match_exactly(self):
+        def manifest_form(header):
+            manifest = SimpleUploadedFile('manifest.csv', f'{header}\nДиск;3;25\n'.encode())
+            return forms.SupplyManifestForm(
+                {'dealer': self.dealer.pk},
+                {'manifest_file': manifest},
+                showroom=self.showroom
+            )
+
+        form = manifest_form('product_code;quantity_total;supply_price_x')
+        self.assertFalse(form.is_valid())
+        self.assertIn('product, quantity, supply_price', str(form.errors))
+
+        form = manifest_form(' Product ; QUANTITY ;supply_price')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(list(form.manifest_lines()), [(2, 'Диск', '3', '25')])
+
+class DailyStatisticsTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_rollups_follow_sale_item_changes(self):
+        daily = models.ShowroomDailyStatistics.objects.get(showroom=self.showroom)
+        self.assertEqual(daily.sales_count, 1)
+        self.assertEqual(daily.items_count, 2)
+        self.assertEqual(daily.quantity_sum, 4)
+
+        item = models.ProductSaleItem.objects.filter(sale__showroom=self.showroom).first()
+        item.quantity = 10
+        item.save()
+        self.assertEqual(self.employee.statistics()['sales_products_quantity_sum'], 13)
+
+        item.delete()
+        self.assertEqual(self.product.statistics()['sales_quantity_sum'], 3)
+        self.assertEqual(self.category.statistics()['sales_count'], 1)
+
+    def test_rollups_follow_sale_deletion(self):
+        models.ProductSale.objects.filter(showroom=self.showroom).delete()
+
+        self.assertFalse(models.ShowroomDailyStatistics.objects.filter(showroom=self.showroom).exists())
+        self.assertFalse(models.EmployeeDailyStatistics.objects.filter(employee=self.employee).exists())
+
+    def test_rebuild_matches_incremental_rollups(self):
+        before = self.showroom.statistics()
+        models.ShowroomDailyStatistics.objects.all().delete()
+
+        rollups.rebuild(self.showroom.pk)
+        self.assertEqual(self.showroom.statistics(), before)
+
+
+class PeriodStatisticsTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+        # Переносим продажу на 40 дней назад
+        self.today = timezone.localdate()
+        self.sale_date = self.today - timedelta(days=40)
+        moved = timezone.now() - timedelta(days=40)
+        models.ProductSale.objects.filter(showroom=self.showroom).update(date_created=moved)
+        models.ProductSaleItem.objects.filter(sale__showroom=self.showroom).update(date_created=moved)
+        rollups.rebuild(self.showroom.pk)
+
+    def test_date_range_limits_statistics(self):
+        recent = self.showroom.statistics(date_from=self.today - timedelta(days=7))
+        self.assertIsNone(recent['sales_count'])
+        self.assertIsNone(recent['sales_profit_sum'])
+
+        past = self.showroom.statistics(date_from=self.sale_date, date_to=self.sale_date)
+        self.assertEqual(past['sales_count'], 1)
+        self.assertEqual(past['sales_profit_sum'], 240)
+
+    def test_time_series_is_aligned_by_period(self):
+        series = self.showroom.statistics(
+            date_from=self.sale_date,
+            date_to=self.today,
+            granularity='month'
+        )
+
+        periods = [period for period, _ in series['sales_count']]
+        self.assertEqual(periods[0], self.sale_date.replace(day=1))
+        self.assertEqual(periods[-1], self.today.replace(day=1))
+        self.assertEqual([period for period, _ in series['sales_profit_sum']], periods)
+
+        values = dict(series['sales_count'])
+        self.assertEqual(values[self.sale_date.replace(day=1)], 1)
+        self.assertIsNone(values[self.today.replace(day=1)])
+
+    def test_time_series_query_per_group(self):
+        with self.assertNumQueries(len(models.Product.statistics_groups)):
+            models.Product.objects.filter(showroom=self.showroom).statistics(granularity='week')
+
+    def test_comparison_with_previous_period(self):
+        self.product.sell(2, employee=self.employee)
+        date_from = self.today - timedelta(days=29)
+
+        queryset = models.Showroom.objects.filter(pk=self.showroom.pk)
+        with self.assertNumQueries(len(models.Showroom.statistics_groups)):
+            comparison = queryset.statistics(date_from=date_from, date_to=self.today, compare=True)
+
+        self.assertEqual(comparison['sales_count'], {
+            'current': 1,
+            'previous': 1,
+            'delta': 0,
+            'delta_percent': 0.0,
+        })
+        self.assertEqual(comparison['sales_revenue']['current'], 200)
+        self.assertEqual(comparison['sales_revenue']['previous'], 400)
+        self.assertEqual(comparison['sales_revenue']['delta_percent'], -50.0)
+
+    def test_comparison_page(self):
+        self.client.force_login(self.user)
+        url = reverse('showroom_detail', kwargs={'showroom_slug': self.showroom.slug})
+
+        response = self.client.get(url, {'date_from': self.today.isoformat(), 'compare': 'on'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('current', next(iter(response.context['comparison'].values())))
+
+    def test_statistics_page_renders_time_series(self):
+        self.client.force_login(self.user)
+        url = reverse('statistics_stat', kwargs={'showroom_slug': self.showroom.slug, 'model_name': 'employees'})
+
+        response = self.client.get(url, {'date_from': self.sale_date.isoformat(), 'granularity': 'day'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['series_periods'], [self.sale_date])
+        self.assertContains(response, 'id="statistics-series"')
+
+
+class LeaderboardTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_leaders_are_ordered_by_metric(self):
+        second = models.Employee.objects.create(
+            first_name='Сидор',
+            last_name='Сидоров',
+            surname='Сидорович',
+            phone_number='+79990000002',
+            showroom=self.showroom
+        )
+        self.product.sell(1, employee=second)
+        employees = models.Employee.objects.filter(showroom=self.showroom)
+
+        with self.assertNumQueries(2):
+            leaders = leaderboard(employees, 'sales_revenue', limit=1)
+        self.assertEqual(leaders, [(self.employee, 400)])
+
+        leaders = leaderboard(employees, 'sales_revenue')
+        self.assertEqual([value for _, value in leaders], [400, 100])
+
+    def test_leaders_by_composite_lookup(self):
+        dealers = models.Dealer.objects.filter(showroom=self.showroom)
+        self.assertEqual(leaderboard(dealers, 'supply_sales_revenue'), [(self.dealer, 400)])
+
+    def test_leaderboards_page(self):
+        self.client.force_login(self.user)
+        url = reverse('showroom_leaderboards', kwargs={'showroom_slug': self.showroom.slug})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        leaders = {board['short']: board['leaders'] for board in response.context['leaderboards']}
+        self.assertEqual(leaders['dealers'], [(self.dealer, 10)])
+        self.assertEqual(leaders['categories'], [(self.category, 240)])
+        self.assertEqual(leaders['products'], [(self.product, 4)])
+
+        # Повторный запрос берет рейтинги из кэша
+        with self.assertNumQueries(0):
+            load_leaderboards(response.context['object'], statistics_models)
+
+
+class ExportTests(StatisticsTestMixin, TestCase):
+    def test_csv_export_with_statistics(self):
+        self.client.force_login(self.user)
+        url = reverse('statistics_export', kwargs={
+            'showroom_slug': self.showroom.slug,
+            'model_name': 'products',
+            'export_format': 'csv'
+        })
+
+        response = self.client.get(url, {'statistics': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        header, row = list(csv.reader(
+            line.decode() for line in response.streaming_content
+        ))
+        values = dict(zip(header, row))
+        self.assertEqual(values['Заголовок товара'], 'Шина')
+        self.assertEqual(values['Оборот (сумма продаж)'], '400')
+
+    def test_jsonl_export(self):
+        lines = export_lines(models.Employee.objects.filter(showroom=self.showroom), 'jsonl')
+        rows = [json.loads(line) for line in lines]
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['phone_number'], '+79990000001')
+        self.assertNotIn('showroom', rows[0])
+
+    def test_memory_does_not_grow_with_row_count(self):
+        def peak_memory(count):
+            models.Product.objects.bulk_create(
+                models.Product(
+                    title=f'Товар {index}',
+                    price=100,
+                    quantity=1,
+                    category=self.category,
+                    showroom=self.showroom
+                )
+                for index in range(count)
+            )
+            queryset = models.Product.objects.filter(showroom=self.showroom)
+
+            tracemalloc.start()
+            try:
+                for _ in export_lines(queryset, 'csv', chunk_size=100):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        small = peak_memory(500)
+        large = peak_memory(5000)
+        self.assertLess(large, small * 2)
+
+
+class ImportTests(StatisticsTestMixin, TestCase):
+    def import_csv(self, model_name, content):
+        self.client.force_login(self.user)
+        return self.client.post(
+            reverse('statistics_import', kwargs={'showroom_slug': self.showroom.slug, 'model_name': model_name}),
+            {'import_file': SimpleUploadedFile('import.csv', content.encode())}
+        )
+
+    def test_exported_products_can_be_imported(self):
+        exported = ''.join(export_lines(models.Product.objects.filter(showroom=self.showroom), 'csv'))
+        models.Product.objects.filter(showroom=self.showroom).update(title='Старая шина')
+
+        response = self.import_csv('products', exported)
+
+        self.assertRedirects(response, reverse('statistics_list', kwargs={
+            'showroom_slug': self.showroom.slug,
+            'model_name': 'products'
+        }))
+        product = models.Product.objects.get(title='Шина')
+        self.assertEqual(product.category, self.category)
+        self.assertEqual(product.showroom, self.showroom)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        response = self.import_csv('categories', 'name\nДиски\nШины\n\nДиски\nКолпаки\n')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([number for number, _ in response.context['import_errors']], [3, 5])
+        self.assertEqual(response.context['created'], 2)
+        self.assertEqual(
+            set(models.ProductCategory.objects.values_list('name', flat=True)),
+            {'Шины', 'Диски', 'Колпаки'}
+        )
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        def import_queries(count, offset):
+            rows = (
+                (number, {'first_name': 'Иван', 'last_name': 'Иванов', 'surname': 'Иванович',
+                          'phone_number': f'+7999{number + offset:07d}'})
+                for number in range(count)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                created, errors = imports.import_rows(self.showroom, forms.EmployeeForm, rows, chunk_size=100)
+
+            self.assertEqual((created, errors), (count, []))
+            return len(queries)
+
+        self.assertEqual(import_queries(10, 100), import_queries(90, 200))
+
+
+class StatisticsCacheTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        statistics_cache.reset_counters()
+
+    def test_repeated_statistics_are_served_from_cache(self):
+        showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        expected = showroom.statistics()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(showroom.statistics(), expected)
+
+        self.assertEqual(statistics_cache.hits, 1)
+        self.assertEqual(statistics_cache.misses, 1)
+
+    def test_write_invalidates_cached_statistics(self):
+        self.showroom.statistics()
+        self.product.sell(2, employee=self.employee)
+
+        showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        self.assertEqual(showroom.statistics()['sales_count'], 2)
+        self.assertEqual(statistics_cache.misses, 2)
+
+    def test_reused_instances_see_writes(self):
+        showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        product = models.Product.objects.select_related('showroom').get(pk=self.product.pk)
+        sold = product.statistics()['sales_quantity_sum']
+        showrooms = models.Showroom.objects.filter(pk=showroom.pk)
+        sales_count = showrooms.statistics(showroom=showroom)['sales_count']
+
+        # Продажа обновляет поколение автосалона, через который она оформлена
+        product.sell(3, employee=self.employee)
+        self.assertEqual(product.statistics()['sales_quantity_sum'], sold + 3)
+
+        services.checkout(showroom, [(self.product, 1)], employee=self.employee)
+        self.assertEqual(showrooms.statistics(showroom=showroom)['sales_count'], sales_count + 2)
+
+    def test_key_uses_generation_from_database(self):
+        showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        showroom.statistics()
+
+        # Запись через другой объект автосалона (как в другом процессе)
+        # видна, как только автосалон прочитан заново
+        self.product.sell(1, employee=self.employee)
+        fresh = models.Showroom.objects.get(pk=self.showroom.pk)
+        self.assertEqual(fresh.statistics()['sales_count'], 2)
+        self.assertEqual(statistics_cache.misses, 2)
+
+    def test_generation_changes_on_related_writes(self):
+        self.showroom.refresh_from_db()
+        generation = self.showroom.statistics_generation
+        models.ProductCategory.objects.create(name='Диски', showroom=self.showroom)
+
+        self.showroom.refresh_from_db()
+        self.assertEqual(self.showroom.statistics_generation, generation + 1)
+
+
+class RowStatisticsTests(StatisticsTestMixin, TestCase):
+    def test_rows_are_annotated_in_one_query(self):
+        queryset = models.Employee.objects.filter(showroom=self.showroom).with_statistics()
+
+        with self.assertNumQueries(1):
+            employee = queryset.order_by('-sales_revenue').first()
+
+        self.assertEqual(employee.sales_count, 1)
+        self.assertEqual(employee.sales_revenue, 400)
+        self.assertEqual(employee.sales_products_quantity_sum, 4)
+        self.assertEqual(employee.sales_profit_sum, 240)
+
+    def test_dealer_rows_do_not_multiply_sales(self):
+        dealer = models.Dealer.objects.with_statistics().get(pk=self.dealer.pk)
+        self.assertEqual(dealer.supply_sales_count, 2)
+
+    def test_list_view_renders_sortable_statistics_columns(self):
+        self.client.force_login(self.user)
+        url = reverse('statistics_list', kwargs={'showroom_slug': self.showroom.slug, 'model_name': 'products'})
+
+        response = self.client.get(url, {'statistics': 1, 'sort': '-sales_revenue'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Оборот (сумма продаж)')
+        self.assertEqual(response.context['table'].page.object_list.data[0].sales_revenue, 400)
+
+
+class DashboardTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('showroom_detail', kwargs={'showroom_slug': self.showroom.slug})
+
+    def test_dashboard_headlines(self):
+        dashboard = load_dashboard(self.showroom, statistics_models)
+        sections = {section['short']: section for section in dashboard['sections']}
+
+        self.assertEqual(sections['employees']['count'], 1)
+        self.assertEqual(sections['products']['headlines']['Оборот (сумма продаж)'], 400)
+        self.assertEqual(sections['dealers']['headlines']['Кол-во поставок'], 2)
+
+    def test_dashboard_query_count_does_not_depend_on_sections(self):
+        # Сессия, пользователь, автосалон, показатели разделов, статистика автосалона
+        # и список автосалонов в боковой панели
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        cache.clear()
+        sections = dict(statistics_models, more_products=models.Product)
+        with patch.dict(statistics_models, sections), self.assertNumQueries(6):
+            self.client.get(self.url)
+
+    def test_cached_dashboard_runs_no_aggregates(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+    def test_foreign_showroom_is_not_found(self):
+        stranger = get_user_model().objects.create_user(
+            username='stranger',
+            email='stranger@example.com',
+            password='password',
+            first_name='Сидор',
+            last_name='Сидоров',
+            is_email_verified=True
+        )
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+
+@override_settings(SHOWROOM_SERVER_TIMING=True)
+class ServerTimingTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('statistics_stat', kwargs={'showroom_slug': self.showroom.slug, 'model_name': 'products'})
+
+    def server_timing(self, response):
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *parameters = metric.split(';')
+            metrics[name] = dict(parameter.split('=', 1) for parameter in parameters)
+        return metrics
+
+    def test_header_reports_request_stages(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        metrics = self.server_timing(response)
+        self.assertEqual(set(metrics), {'total', 'db', 'view', 'template', 'statistics'})
+        self.assertEqual(metrics['db']['desc'], f'"{len(queries)} queries"')
+        for name in ('total', 'view', 'template', 'statistics'):
+            self.assertGreater(float(metrics[name]['dur']), 0, name)
+        self.assertGreaterEqual(float(metrics['total']['dur']), float(metrics['db']['dur']))
+
+    def test_cached_statistics_take_no_statistics_time(self):
+        self.client.get(self.url)
+        metrics = self.server_timing(self.client.get(self.url))
+        self.assertEqual(float(metrics['statistics']['dur']), 0)
+
+    def test_request_is_logged(self):
+        with self.assertLogs('showroom.profiling', 'DEBUG') as logs:
+            self.client.get(self.url)
+
+        self.assertIn(f'GET {self.url} 200', logs.output[0])
+        self.assertIn('queries', logs.output[0])
+
+    def test_streaming_response_is_logged_after_its_content(self):
+        url = reverse('statistics_export', kwargs={
+            'showroom_slug': self.showroom.slug,
+            'model_name': 'products',
+            'export_format': 'csv'
+        })
+
+        with self.assertLogs('showroom.profiling', 'DEBUG') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'statistics': 1})
+            self.assertIn('Server-Timing', response)
+            self.assertEqual(logs.output, [])
+            sent = len(queries)
+
+            b''.join(response.streaming_content)
+
+        self.assertGreater(len(queries), sent)
+        self.assertIn(f'GET {url}?statistics=1 200 ', logs.output[0])
+        self.assertIn(f'({len(queries)} queries)', logs.output[0])
+
+    @override_settings(SHOWROOM_SERVER_TIMING=False)
+    def test_disabled_by_default(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_timer_outside_request_does_nothing(self):
+        with profiling.timer('statistics'):
+            self.showroom.statistics()
+        self.assertIsNone(profiling.current_timings.get())
+
+
+
+class SlowQueryLogTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('statistics_stat', kwargs={'showroom_slug': self.showroom.slug, 'model_name': 'products'})
+
+    @override_settings(SHOWROOM_SLOW_QUERY_MS=1e-6)
+    def test_statistics_aggregates_are_logged_with_plan(self):
+        with self.assertLogs('showroom.slow_queries', 'WARNING') as logs:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        aggregates = [record for record in records if record['statistics']]
+        self.assertTrue(aggregates)
+
+        record = aggregates[0]
+        self.assertEqual(record['statistics']['model'], 'showroom.Product')
+        self.assertEqual(record['statistics']['showroom_id'], self.showroom.pk)
+        self.assertEqual(record['request']['view'], 'statistics_stat')
+        self.assertEqual(record['request']['showroom'], str(self.showroom.slug))
+        self.assertTrue(record['sql'].startswith('SELECT'))
+        self.assertIsInstance(record['params'], list)
+        self.assertTrue(record['plan'])
+        self.assertFalse(any(line.startswith('EXPLAIN failed') for line in record['plan']))
+
+    @override_settings(SHOWROOM_SLOW_QUERY_MS=1e-6)
+    def test_export_queries_are_logged_while_streaming(self):
+        url = reverse('statistics_export', kwargs={
+            'showroom_slug': self.showroom.slug,
+            'model_name': 'products',
+            'export_format': 'csv'
+        })
+
+        with self.assertLogs('showroom.slow_queries', 'WARNING') as logs:
+            response = self.client.get(url, {'statistics': 1})
+            logged = len(logs.records)
+            b''.join(response.streaming_content)
+
+        records = [json.loads(record.getMessage()) for record in logs.records[logged:]]
+        self.assertTrue(records)
+        for record in records:
+            self.assertEqual(record['request']['view'], 'statistics_export')
+        self.assertTrue(any(record['plan'] for record in records))
+        self.assertIsNone(profiling.current_request.get())
+
+    @override_settings(SHOWROOM_SLOW_QUERY_MS=60_000)
+    def test_fast_queries_are_not_logged(self):
+        with self.assertNoLogs('showroom.slow_queries', 'WARNING'):
+            self.client.get(self.url)
+
+
+
+class MetricsTests(StatisticsTestMixin, TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        metrics_settings = override_settings(
+            METRICS_ENABLED=True,
+            METRICS_PATH=Path(directory.name) / 'metrics.sqlite3'
+        )
+        metrics_settings.enable()
+        self.addCleanup(metrics_settings.disable)
+
+        cache.clear()
+        self.staff = get_user_model().objects.create_user(
+            username='staff',
+            email='staff@example.com',
+            password='password',
+            first_name='Сотрудник',
+            last_name='Сервиса',
+            is_staff=True,
+            is_email_verified=True
+        )
+        self.url = reverse('metrics')
+
+    def scrape(self):
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode().splitlines()
+
+    def test_requests_cache_and_sales_are_exported(self):
+        self.client.force_login(self.user)
+        list_url = reverse('statistics_list', kwargs={'showroom_slug': self.showroom.slug, 'model_name': 'products'})
+        self.client.get(list_url)
+        self.client.get(list_url)
+        self.product.sell(2)
+
+        lines = self.scrape()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', lines)
+        self.assertIn('http_request_duration_seconds_bucket{le="+Inf",url_name="statistics_list"} 2', lines)
+        self.assertIn('http_request_duration_seconds_count{url_name="statistics_list"} 2', lines)
+        self.assertIn('http_requests_total{method="GET",status="200",url_name="statistics_list"} 2', lines)
+        self.assertIn('product_sales_total 1', lines)
+        self.assertIn('product_sold_quantity_total 2', lines)
+
+        queries = next(line for line in lines if line.startswith('http_request_db_queries_total{url_name="statistics_list"}'))
+        self.assertGreater(int(queries.split()[-1]), 0)
+        ratio = next(line for line in lines if line.startswith('statistics_cache_hit_ratio'))
+        self.assertGreater(float(ratio.split()[-1]), 0)
+
+    def test_processes_share_totals(self):
+        # Два хранилища одного файла - как два процесса WSGI-сервера
+        first = metrics.MetricsStore(settings.METRICS_PATH)
+        second = metrics.MetricsStore(settings.METRICS_PATH)
+        first.add([('product_sales_total', {}, 1)])
+        second.add([('product_sales_total', {}, 2)])
+
+        self.assertIn('product_sales_total 3', self.scrape())
+
+    def test_mail_queue_and_latency(self):
+        send = metrics.track_mail('test', lambda: None)
+        self.assertIn('mail_queue_depth{kind="test"} 1', self.scrape())
+
+        send()
+        lines = self.scrape()
+        self.assertIn('mail_queue_depth{kind="test"} 0', lines)
+        self.assertIn('mail_send_duration_seconds_count{kind="test"} 1', lines)
+
+    def test_staff_only(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_scrape_token(self):
+        response = Client().get(self.url, HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+
+        for authorization in ('Bearer wrong', 'Basic ' + base64.b64encode(b'staff:password').decode()):
+            response = Client().get(self.url, HTTP_AUTHORIZATION=authorization)
+            self.assertEqual(response.status_code, 401, authorization)
+
+    def test_empty_token_is_not_accepted(self):
+        response = Client().get(self.url, HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 401)
+
+
+class QueryPlanTests(StatisticsTestMixin, TestCase):
+    def test_migrations_match_models(self):
+        call_command('makemigrations', '--check', '--dry-run', verbosity=0)
+
+    def test_initial_migration_is_the_schema_before_migrations(self):
+        # Базы данных, созданные до появления миграций, содержат только таблицы 0001_initial
+        state = MigrationLoader(None).project_state(('showroom', '0001_initial'), at_end=True)
+        self.assertNotIn(('showroom', 'showroomdailystatistics'), state.models)
+        self.assertNotIn('statistics_generation', state.models['showroom', 'showroom'].fields)
+
+    def test_initial_migrations_of_existing_tables_are_faked(self):
+        recorder = MigrationRecorder(connection)
+        recorder.migration_qs.filter(app__in=['account', 'showroom'], name='0001_initial').delete()
+
+        call_command('fake_initial_migrations', stdout=StringIO())
+        applied = recorder.applied_migrations()
+        self.assertIn(('account', '0001_initial'), applied)
+        self.assertIn(('showroom', '0001_initial'), applied)
+
+        output = StringIO()
+        call_command('fake_initial_migrations', stdout=output)
+        self.assertEqual(output.getvalue().count('уже применена'), 2)
+
+    def test_statistics_indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, models.ProductSaleItem._meta.db_table)
+
+        self.assertEqual(constraints['sale_item_product_date_idx']['columns'], ['product_id', 'date_created'])
+
+    def test_full_scans_are_found_in_plans(self):
+        sql = 'SELECT 1 FROM "showroom_dealer" WHERE "id" IN (SELECT U0."id" FROM "showroom_productsale" U0)'
+
+        self.assertEqual(
+            explain.full_scans([{'detail': 'SCAN U0'}, {'detail': 'SEARCH showroom_dealer USING INDEX x (id=?)'},
+                                {'detail': 'SCAN showroom_dealer USING COVERING INDEX y'},
+                                {'detail': 'SCAN CONSTANT ROW'}], sql, 'sqlite'),
+            [('showroom_productsale', 'SCAN U0')]
+        )
+        self.assertEqual(
+            explain.full_scans([{'QUERY PLAN': '  ->  Seq Scan on showroom_dealer  (cost=0.00..1.01)'},
+                                {'QUERY PLAN': 'Index Scan using x on showroom_productsale u0'}], sql, 'postgresql'),
+            [('showroom_dealer', '->  Seq Scan on showroom_dealer  (cost=0.00..1.01)')]
+        )
+        self.assertEqual(
+            explain.full_scans([{'table': 'U0', 'type': 'ALL'}, {'table': 'showroom_dealer', 'type': 'ref'}], sql, 'mysql'),
+            [('showroom_productsale', 'U0 type ALL')]
+        )
+
+    def test_statistics_queries_are_explained(self):
+        sales = models.ProductSaleItem.objects.count()
+        report = explain.explain_statistics(self.showroom, statistics_models)
+
+        for name in statistics_models:
+            for scenario in ('statistics', 'period', 'time_series', 'rows', 'object'):
+                self.assertTrue(report[f'{name}:{scenario}'], f'{name}:{scenario}')
+        for scenario in ('showroom:dashboard', 'rollups:refresh_day', 'costing:assign_costs'):
+            self.assertTrue(report[scenario], scenario)
+
+        for queries in report.values():
+            for sql, plan, scans in queries:
+                self.assertTrue(sql.startswith('SELECT'))
+                self.assertTrue(plan)
+
+        self.assertEqual(models.ProductSaleItem.objects.count(), sales)
+
+    def test_explain_keeps_the_cache(self):
+        cache.set('unrelated', 1)
+        showroom = models.Showroom.objects.get(pk=self.showroom.pk)
+        expected = showroom.statistics()
+
+        explain.explain_statistics(self.showroom, statistics_models)
+
+        self.assertEqual(cache.get('unrelated'), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(showroom.statistics(), expected)
+
+    def test_command_reports_scans(self):
+        stdout = StringIO()
+        call_command('explain_statistics', '--showroom', str(self.showroom.slug), '--min-rows', '0', stdout=stdout)
+        self.assertIn('products:statistics', stdout.getvalue())
+        self.assertIn('Полных просмотров таблиц', stdout.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('explain_statistics', '--dataset-seed', '404', stdout=StringIO())
+
+
+class PerformanceBudgetTests(TestCase):
+    """
+    Бюджеты запросов к базе данных и времени ответа для каждого адреса сайта.
+    Автосалон заполняется dataset_showroom(), поэтому на страницах несколько
+    десятков объектов и N+1 запросов или лишние агрегаты сразу превышают бюджет.
+    Время - лучшее из нескольких повторов с пустым кэшем статистики.
+    """
+
+    sale_items = 2000
+    repeat = 3
+
+    # Маршрут: (макс. кол-во запросов, макс. время ответа в мс)
+    budgets = {
+        'index': (0, 100),
+        'metrics': (0, 100),
+
+        'login': (0, 100),
+        'registration': (0, 100),
+        'logout': (4, 100),
+        'reset_password': (0, 100),
+        'password_reset_done': (0, 100),
+        'password_reset_confirm': (5, 100),
+        'password_change': (2, 100),
+        'profile': (2, 100),
+        'profile_edit': (2, 100),
+        'email_verification_send': (2, 100),
+        'email_verification_check': (2, 100),
+        'email_verification_info': (2, 100),
+        'email_verification_edit': (2, 100),
+
+        'api_products': (2, 100),
+        'api_sales': (28, 250),
+        'api_showroom_statistics': (2, 100),
+        'api_section_statistics': (3, 100),
+        'api_object_statistics': (5, 100),
+        'showroom_create': (3, 250),
+        'showroom_list': (4, 100),
+        'showroom_empty': (3, 100),
+        'showroom_detail': (6, 250),
+        'showroom_delete': (4, 100),
+        'showroom_edit': (4, 250),
+        'showroom_leaderboards': (12, 250),
+        'supply_receive': (5, 100),
+        'statistics_list': (7, 400),
+        'statistics_stat': (5, 250),
+        'statistics_export': (4, 100),
+        'statistics_import': (3, 100),
+        'statistics_create': (3, 100),
+        'statistics_detail': (7, 100),
+        'statistics_edit': (7, 100),
+        'statistics_delete': (7, 100),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.showroom = dataset_showroom(cls.sale_items)
+        cls.token = cls.showroom.issue_api_token()
+
+        cls.user = cls.showroom.owner
+        cls.user.set_password('password')
+        cls.user.is_email_verified = True
+        cls.user.save()
+
+        # Ссылки из писем зависят от состояния пользователя,
+        # поэтому у каждой ссылки свой пользователь
+        cls.unverified_user, cls.verifying_user, cls.resetting_user = (
+            get_user_model().objects.create_user(
+                username=username,
+                email=f'{username}@example.com',
+                password='password',
+                first_name='Петр',
+                last_name='Петров',
+                is_email_verified=username == 'resetting'
+            )
+            for username in ('unverified', 'verifying', 'resetting')
+        )
+
+        cls.product = models.Product.objects.filter(showroom=cls.showroom).order_by('-quantity').first()
+        cls.employee = models.Employee.objects.filter(showroom=cls.showroom).first()
+
+    def routes(self):
+        """
+        Запросы к маршрутам: {маршрут: (пользователь, метод, адрес, данные, ожидаемый статус)}
+        """
+
+        owner = self.user
+        unverified = self.unverified_user
+        verifying = self.verifying_user
+        resetting = self.resetting_user
+        showroom = {'showroom_slug': self.showroom.slug}
+        section = dict(showroom, model_name='products')
+        section_object = dict(section, object_slug=self.product.slug)
+        sale = {
+            'employee': str(self.employee.slug),
+            'lines': [{'product': str(self.product.slug), 'quantity': 1}]
+        }
+
+        return {
+            'index': (None, 'get', reverse('index'), None, 200),
+            'metrics': (None, 'get', reverse('metrics'), None, 401),
+
+            'login': (None, 'get', reverse('login'), None, 200),
+            'registration': (None, 'get', reverse('registration'), None, 200),
+            'logout': (owner, 'post', reverse('logout'), None, 302),
+            'reset_password': (None, 'get', reverse('reset_password'), None, 200),
+            'password_reset_done': (None, 'get', reverse('password_reset_done'), None, 200),
+            'password_reset_confirm': (None, 'get', reverse('password_reset_confirm', kwargs={
+                'uidb64': urlsafe_base64_encode(force_bytes(resetting.pk)),
+                'token': tokens.password_token.make_token(resetting)
+            }), None, 302),
+            'password_change': (owner, 'get', reverse('password_change'), None, 200),
+            'profile': (owner, 'get', reverse('profile'), None, 200),
+            'profile_edit': (owner, 'get', reverse('profile_edit'), None, 200),
+            'email_verification_send': (unverified, 'get', reverse('email_verification_send'), None, 302),
+            'email_verification_check': (None, 'get', reverse('email_verification_check', kwargs={
+                'uidb64': urlsafe_base64_encode(force_bytes(verifying.pk)),
+                'token': tokens.email_token.make_token(verifying)
+            }), None, 302),
+            'email_verification_info': (unverified, 'get', reverse('email_verification_info'), None, 200),
+            'email_verification_edit': (unverified, 'get', reverse('email_verification_edit'), None, 200),
+
+            'api_products': (self.token, 'get', reverse('api_products'), None, 200),
+            'api_sales': (self.token, 'post', reverse('api_sales'), sale, 201),
+            'api_showroom_statistics': (self.token, 'get', reverse('api_showroom_statistics', kwargs=showroom), None, 200),
+            'api_section_statistics': (self.token, 'get', reverse('api_section_statistics', kwargs=section), None, 200),
+            'api_object_statistics': (self.token, 'get', reverse('api_object_statistics', kwargs=section_object), None, 200),
+            'showroom_create': (owner, 'get', reverse('showroom_create'), None, 200),
+            'showroom_list': (owner, 'get', reverse('showroom_list'), None, 302),
+            'showroom_empty': (owner, 'get', reverse('showroom_empty'), None, 200),
+            'showroom_detail': (owner, 'get', reverse('showroom_detail', kwargs=showroom), None, 200),
+            'showroom_delete': (owner, 'get', reverse('showroom_delete', kwargs=showroom), None, 200),
+            'showroom_edit': (owner, 'get', reverse('showroom_edit', kwargs=showroom), None, 200),
+            'showroom_leaderboards': (owner, 'get', reverse('showroom_leaderboards', kwargs=showroom), None, 200),
+            'supply_receive': (owner, 'get', reverse('supply_receive', kwargs=showroom), None, 200),
+            'statistics_list': (owner, 'get', reverse('statistics_list', kwargs=section), None, 200),
+            'statistics_stat': (owner, 'get', reverse('statistics_stat', kwargs=section), None, 200),
+            'statistics_export': (owner, 'get', reverse('statistics_export', kwargs=dict(
+                section, export_format='csv'
+            )), None, 200),
+            'statistics_import': (owner, 'get', reverse('statistics_import', kwargs=section), None, 200),
+            'statistics_create': (owner, 'get', reverse('statistics_create', kwargs=section), None, 200),
+            'statistics_detail': (owner, 'get', reverse('statistics_detail', kwargs=section_object), None, 200),
+            'statistics_edit': (owner, 'get', reverse('statistics_edit', kwargs=section_object), None, 200),
+            'statistics_delete': (owner, 'get', reverse('statistics_delete', kwargs=section_object), None, 200),
+        }
+
+    def request(self, user, method, url, data):
+        client = Client()
+        extra = {}
+
+        if isinstance(user, str):
+            extra['HTTP_AUTHORIZATION'] = f'Token {user}'
+        elif user is not None:
+            client.force_login(user)
+
+        if data is not None:
+            extra['content_type'] = 'application/json'
+            data = json.dumps(data)
+
+        cache.clear()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data, **extra)
+            # Потоковый ответ готовится целиком до остановки замера
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, queries, (time.perf_counter() - start) * 1000
+
+    def test_every_route_has_budget(self):
+        names = {
+            pattern.name
+            for urlconf in (account_urls, showroom_urls)
+            for pattern in urlconf.urlpatterns
+        }
+        names.update(['index', 'metrics'])
+
+        self.assertEqual(set(self.budgets), names)
+        self.assertEqual(set(self.routes()), names)
+
+    # Письмо отправляется в отдельном потоке и в бюджет страницы не входит
+    @patch('account.views.mailing.email_verify_mail')
+    def test_routes_fit_budgets(self, email_verify_mail):
+        for name, (user, method, url, data, status) in self.routes().items():
+            max_queries, max_time = self.budgets[name]
+
+            with self.subTest(route=name):
+                timings = []
+                for attempt in range(self.repeat):
+                    response, queries, timing = self.request(user, method, url, data)
+                    timings.append(timing)
+
+                    if not attempt:
+                        self.assertEqual(response.status_code, status)
+                        self.assertLessEqual(
+                            len(queries),
+                            max_queries,
+                            '\n'.join(query['sql'] for query in queries)
+                        )
+
+                self.assertLessEqual(min(timings), max_time)
+
+
+class DatasetTests(TestCase):
+    end_date = timezone.localdate() - timedelta(days=1)
+
+    def generate(self, seed=3):
+        return generate_dataset(
+            sale_items=600,
+            showrooms=2,
+            seed=seed,
+            days=60,
+            end_date=self.end_date,
+            batch_size=100,
+            write=lambda message: None
+        )
+
+    def snapshot(self, showrooms):
+        return [
+            (
+                showroom.slug,
+                list(models.Product.objects.filter(showroom=showroom).order_by('pk').values_list(
+                    'slug', 'title', 'price', 'quantity'
+                )),
+                list(models.ProductSaleItem.objects.filter(sale__showroom=showroom).order_by('pk').values_list(
+                    'product__slug', 'quantity', 'sale_price', 'unit_cost', 'date_created'
+                )),
+            )
+            for showroom in showrooms
+        ]
+
+    def test_same_seed_generates_same_data(self):
+        first = self.snapshot(self.generate())
+        self.assertTrue(delete_dataset(3))
+        second = self.snapshot(self.generate())
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, self.snapshot(self.generate(seed=4)))
+
+    def test_generated_data_is_consistent(self):
+        showrooms = self.generate()
+
+        items = models.ProductSaleItem.objects.filter(sale__showroom__in=showrooms)
+        self.assertEqual(items.count(), 600)
+        self.assertFalse(models.Product.objects.filter(showroom__in=showrooms, quantity__lt=0).exists())
+        self.assertFalse(items.filter(date_created__date__gt=self.end_date).exists())
+
+        for showroom in showrooms:
+            # Остаток товара равен остатку его партий
+            left = dict(
+                models.ProductSupplyItem.objects.filter(supply__showroom=showroom)
+                .values_list('product').annotate(left=db_models.Sum('quantity_left'))
+            )
+            for product in models.Product.objects.filter(showroom=showroom):
+                self.assertEqual(product.quantity, left.get(product.pk, 0))
+
+            # Себестоимость совпадает с пересчетом по партиям
+            costs = list(items.filter(sale__showroom=showroom).order_by('pk').values_list('unit_cost', flat=True))
+            costing.recalculate_costs(showroom.pk)
+            self.assertEqual(
+                costs,
+                list(items.filter(sale__showroom=showroom).order_by('pk').values_list('unit_cost', flat=True))
+            )
+
+            # Сводки совпадают с исходными строками
+            totals = models.ShowroomDailyStatistics.objects.filter(showroom=showroom).aggregate(
+                items=db_models.Sum('items_count'), quantity=db_models.Sum('quantity_sum')
+            )
+            raw = items.filter(sale__showroom=showroom).aggregate(
+                items=db_models.Count('pk'), quantity=db_models.Sum('quantity')
+            )
+            self.assertEqual(totals, raw)
+
+    def test_command_refuses_existing_dataset(self):
+        call_command('generate_dataset', '1k', '--seed', '5', '--days', '30', stdout=StringIO())
+        self.assertEqual(models.ProductSaleItem.objects.filter(sale__showroom__owner__username='dataset-5').count(), 1000)
+
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', '1k', '--seed', '5', stdout=StringIO())
+
+        call_command('generate_dataset', '2k', '--seed', '5', '--days', '30', '--replace', stdout=StringIO())
+        self.assertEqual(models.ProductSaleItem.objects.filter(sale__showroom__owner__username='dataset-5').count(), 2000)
+
+
+class BenchmarkSuiteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.showroom = load_dataset_showroom(seed=9, sale_items=300, write=lambda message: None)
+
+    def test_suite_measures_pages_statistics_and_sales(self):
+        sales = models.ProductSale.objects.filter(showroom=self.showroom).count()
+        results = run_suite(self.showroom, repeat=3, write=lambda message: None)
+
+        cases = results['cases']
+        for model_name in statistics_models:
+            self.assertIn(f'view:statistics_list:{model_name}', cases)
+            self.assertIn(f'view:statistics_stat:{model_name}', cases)
+            self.assertIn(f'view:statistics_detail:{model_name}', cases)
+            self.assertIn(f'statistics:{model_name}', cases)
+        self.assertIn('view:showroom_detail', cases)
+        self.assertIn('model:product_sell', cases)
+
+        for result in cases.values():
+            self.assertEqual(result['runs'], 3)
+            self.assertGreater(result['queries'], 0)
+            self.assertLessEqual(result['min_ms'], result['p50_ms'])
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+
+        self.assertEqual(results['meta']['showroom'], str(self.showroom.slug))
+        self.assertEqual(json.loads(json.dumps(results)), results)
+
+        # Продажи замера откатываются
+        self.assertEqual(models.ProductSale.objects.filter(showroom=self.showroom).count(), sales)
+
+    def test_cold_runs_keep_the_cache(self):
+        cache.set('unrelated', 1)
+        cold = run_suite(self.showroom, repeat=2, write=lambda message: None)['cases']
+        warm = run_suite(self.showroom, repeat=2, cold=False, write=lambda message: None)['cases']
+
+        self.assertEqual(cache.get('unrelated'), 1)
+        self.assertEqual(warm['statistics:showroom']['queries'], 0)
+        self.assertGreater(cold['statistics:showroom']['queries'], 0)
+
+    def test_sizes_are_measured_on_rolled_back_datasets(self):
+        stdout = StringIO()
+        call_command('benchmark', '--sizes', '300', '--repeat', '1', '--seed', '11', stdout=stdout)
+
+        self.assertIn('products', stdout.getvalue())
+        self.assertFalse(get_user_model().objects.filter(username=owner_username(11)).exists())
+
+        # Созданный набор данных замеряется с --suite, а не пересоздается
+        with self.assertRaises(CommandError):
+            call_command('benchmark', '--sizes', '300', '--seed', '9', stdout=StringIO())
+
+    def test_percentile_interpolates(self):
+        self.assertEqual(percentile([4, 1, 3, 2], 0.5), 2.5)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 0.95), 4.8)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_compare_flags_more_queries_and_slower_timings(self):
+        def results(**cases):
+            return {'meta': {}, 'cases': {
+                name: {'p50_ms': p50, 'queries': queries} for name, (p50, queries) in cases.items()
+            }}
+
+        base = results(page=(10, 5), stat=(10, 2), sell=(10, 20), old=(1, 1))
+        current = results(page=(10, 6), stat=(12, 2), sell=(10.5, 20), new=(1, 1))
+
+        statuses = {row[0]: row[-1] for row in compare_results(base, current, threshold=0.1)}
+        self.assertEqual(
+            statuses,
+            {'page': 'slower', 'stat': 'slower', 'sell': 'same', 'old': 'removed', 'new': 'added'}
+        )
@@ -1,7 +1,34 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
+    # JSON API кассовых терминалов #
+    path(
+        'api/products/',
+        api.ProductStockAPIView.as_view(),
+        name='api_products'
+    ),
+    path(
+        'api/sales/',
+        api.SaleAPIView.as_view(),
+        name='api_sales'
+    ),
+    path(
+        'api/showroom/<slug:showroom_slug>/statistics/',
+        api.ShowroomStatisticsAPIView.as_view(),
+        name='api_showroom_statistics'
+    ),
+    path(
+        'api/showroom/<slug:showroom_slug>/<str:model_name>/statistics/',
+        api.SectionStatisticsAPIView.as_view(),
+        name='api_section_statistics'
+    ),
+    path(
+        'api/showroom/<slug:showroom_slug>/<str:model_name>/<slug:object_slug>/statistics/',
+        api.ObjectStatisticsAPIView.as_view(),
+        name='api_object_statistics'
+    ),
+
     # Ссылки по модели автосалона #
     path(
         'showroom/create/',
@@ -36,6 +63,18 @@ urlpatterns = [
         name='showroom_edit'
     ),
 
+    path(
+        'showroom/<slug:showroom_slug>/leaderboards/',
+        views.ShowroomLeaderboardView.as_view(),
+        name='showroom_leaderboards'
+    ),
+
+    path(
+        'showroom/<slug:showroom_slug>/supplies/receive/',
+        views.SupplyReceiveView.as_view(),
+        name='supply_receive'
+    ),
+
     path(
         'showroom/<slug:showroom_slug>/<str:model_name>/',
         views.StatisticsListView.as_view(),
@@ -46,6 +85,16 @@ urlpatterns = [
         views.StatisticsListStatView.as_view(),
         name='statistics_stat'
     ),
+    path(
+        'showroom/<slug:showroom_slug>/<str:model_name>/export/<str:export_format>/',
+        views.StatisticsExportView.as_view(),
+        name='statistics_export'
+    ),
+    path(
+        'showroom/<slug:showroom_slug>/<str:model_name>/import/',
+        views.StatisticsImportView.as_view(),
+        name='statistics_import'
+    ),
 
     path(
         'showroom/<slug:showroom_slug>/<str:model_name>/create/',
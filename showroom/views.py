@@ -1,10 +1,19 @@
+from functools import partial
+from django.contrib import messages
+from django.contrib.messages import get_messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404, get_list_or_404
-from django.http.response import Http404
+from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404, get_list_or_404, redirect
+from django.http.response import Http404, StreamingHttpResponse
 from django.urls import reverse_lazy
 from django.apps import apps
+from django.db.models import Count, Max, Subquery
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django_tables2 import RequestConfig
 from django.views.generic.base import ContextMixin
 from django.views.generic import (
+    View,
     UpdateView,
     TemplateView,
     CreateView,
@@ -12,9 +21,12 @@ from django.views.generic import (
     DetailView,
     ListView,
     DeleteView,
+    FormView,
 )
 
-from . import models, forms
+from . import models, forms, export, services, imports
+from .conditional import ShowroomConditionalMixin
+from .dashboard import load_dashboard, load_leaderboards
 from account.mixins import EmailVerifiedMixin
 
 
@@ -65,52 +77,191 @@ class TitleContextMixin(ContextMixin):
         return context
 
 
-class StatisticsDetailView(
-    LoginRequiredMixin,
-    EmailVerifiedMixin,
-    TitleContextMixin,
-    DetailView
-):
-    template_name = 'showroom/section_item_statistics.html'
-    _model_name = None
-    _showroom = None
-    _model = None
+class ConcurrentUpdateMixin:
+    """
+    Сообщает о конфликте, если запись формы изменили после ее открытия.
+    Форма выводится снова с версией записи из базы данных,
+    поэтому повторное сохранение перезапишет изменения осознанно.
+    """
+
+    conflict_message = (
+        'Запись была изменена другим пользователем после открытия формы. '
+        'Проверьте актуальные данные и сохраните изменения еще раз.'
+    )
+
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except models.ConcurrentUpdateError:
+            form.data = form.data.copy()
+            form.data['version'] = type(form.instance).objects.filter(
+                pk=form.instance.pk
+            ).values_list('version', flat=True).first()
+
+            form.add_error(None, self.conflict_message)
+            return self.form_invalid(form)
 
-    def get_object(self, queryset=None):
-        showroom_slug = self.kwargs.get('showroom_slug')
-        if not showroom_slug:
-            raise Http404
 
-        self._showroom = get_object_or_404(
-            models.Showroom,
-            slug=showroom_slug,
+class ShowroomScopeMixin(ContextMixin):
+    """
+    Область страницы автосалона: автосалон, раздел статистики (модель, форма и таблица)
+    и объект раздела. Каждое значение определяется один раз за запрос
+    и доступно представлению и шаблону (а через контекст - и тегам шаблонов).
+
+    Автосалон пользователя читается одним запросом вместе с отпечатком списка
+    автосалонов владельца, раздел определяется без запросов, объект раздела -
+    одним запросом по уже найденному автосалону.
+    """
+
+    @cached_property
+    def showroom(self):
+        owner_showrooms = models.Showroom.objects.filter(owner=self.request.user).order_by().values('owner')
+
+        return get_object_or_404(
+            models.Showroom.objects.annotate(
+                owner_showrooms_count=Subquery(owner_showrooms.annotate(count=Count('pk')).values('count')),
+                owner_showrooms_modified=Subquery(
+                    owner_showrooms.annotate(modified=Max('date_modified')).values('modified')
+                ),
+            ),
+            slug=self.kwargs.get('showroom_slug'),
             owner=self.request.user
         )
 
-        self._model_name = self.kwargs.get('model_name')
-        if not self._model_name:
+    @cached_property
+    def model_name(self):
+        model_name = self.kwargs.get('model_name')
+        if model_name not in statistics_models:
             raise Http404
+        return model_name
+
+    @cached_property
+    def section_model(self):
+        return statistics_models[self.model_name]
+
+    @cached_property
+    def section_form_class(self):
+        return statistics_models_forms[self.model_name]
+
+    @cached_property
+    def section_table_class(self):
+        return statistics_models_tables[self.model_name]
+
+    @cached_property
+    def section_object(self):
+        return get_object_or_404(
+            self.section_model,
+            slug=self.kwargs.get('object_slug'),
+            showroom=self.showroom
+        )
 
-        self._model = statistics_models.get(self._model_name)
-        if not self._model:
-            raise Http404
+    @cached_property
+    def owner_showrooms(self):
+        return list(models.Showroom.objects.filter(owner=self.request.user))
 
-        object_slug = self.kwargs.get('object_slug')
-        if not object_slug:
-            raise Http404
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['showroom'] = self.showroom
+
+        if 'model_name' in self.kwargs:
+            context['model'] = self.section_model
+            context['model_short'] = self.model_name
+        return context
+
+
+class ShowroomConditionalPageMixin(ShowroomScopeMixin, ShowroomConditionalMixin):
+    """
+    Условные GET-запросы к HTML-страницам автосалона.
+
+    Отпечаток списка автосалонов владельца (он выводится в боковой панели) читается
+    вместе с автосалоном области страницы. Кроме состояния автосалона, страница
+    зависит от пользователя, CSRF-токена формы и текущей даты (признаки новизны записей).
+    Если для пользователя есть сообщения, страница всегда отрисовывается заново.
+    """
+
+    def get_etag_parts(self):
+        user = self.request.user
+        showroom = self.showroom
+
+        return super().get_etag_parts() + [
+            user.pk,
+            user.get_full_name(),
+            self.request.META.get('CSRF_COOKIE'),
+            timezone.localdate(),
+            showroom.owner_showrooms_count,
+            showroom.owner_showrooms_modified,
+        ]
+
+    def get(self, request, *args, **kwargs):
+        if get_messages(request):
+            return super().get(request, *args, **kwargs)
 
-        model_object = self._model.objects.get(slug=object_slug, showroom=self._showroom)
-        return model_object
+        return self.conditional_response(self.showroom, partial(super().get, request, *args, **kwargs))
+
+
+class StatisticsPeriodMixin(ContextMixin):
+    """
+    Выбор периода статистики страницы (форма StatisticsPeriodForm в GET-параметрах)
+    """
+
+    @cached_property
+    def period_form(self):
+        return forms.StatisticsPeriodForm(self.request.GET or None)
+
+    @cached_property
+    def period(self):
+        if not self.period_form.is_valid():
+            return {}
+
+        cleaned_data = self.period_form.cleaned_data
+        return {
+            'date_from': cleaned_data.get('date_from'),
+            'date_to': cleaned_data.get('date_to'),
+            'granularity': cleaned_data.get('granularity') or None,
+            'compare': cleaned_data.get('compare', False),
+        }
+
+    def get_period_context(self, statistics):
+        """
+        Контекст шаблона showroom/inclusions/statistics_period.html
+        для статистики statistics, вычисленной за период self.period
+        """
+
+        context = {'period_form': self.period_form}
+
+        if self.period.get('compare'):
+            context['comparison'] = statistics
+
+        elif self.period.get('granularity'):
+            periods = [period for period, _ in next(iter(statistics.values()), [])]
+
+            context['series_periods'] = periods
+            context['series'] = {
+                name: [value for _, value in values] for name, values in statistics.items()
+            }
+            context['series_chart'] = {
+                'granularity': self.period['granularity'],
+                'periods': periods,
+                'series': context['series'],
+            }
+        return context
+
+
+class StatisticsDetailView(
+    LoginRequiredMixin,
+    EmailVerifiedMixin,
+    TitleContextMixin,
+    ShowroomConditionalPageMixin,
+    DetailView
+):
+    template_name = 'showroom/section_item_statistics.html'
+
+    def get_object(self, queryset=None):
+        return self.section_object
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        model_object = self.get_object()
-
-        context['object'] = model_object
-        context['statistics'] = model_object.statistics()
-        context['model'] = self._model
-        context['model_short'] = self._model_name
-        context['showroom'] = self._showroom
+        context['statistics'] = self.object.statistics()
         return context
 
 
@@ -118,151 +269,181 @@ class StatisticsListView(
     LoginRequiredMixin,
     EmailVerifiedMixin,
     TitleContextMixin,
+    ShowroomConditionalPageMixin,
     ListView
 ):
     template_name = 'showroom/section_list.html'
-    _model_name = None
-    _showroom = None
-    _model = None
     paginate_by = 20
 
     def get_queryset(self):
-        showroom_slug = self.kwargs.get('showroom_slug')
-        if not showroom_slug:
-            raise Http404
+        # Связанные объекты выводятся в таблице, поэтому читаются вместе со страницей
+        related = [
+            field.name for field in self.section_model._meta.concrete_fields
+            if field.is_relation and field.name != 'showroom'
+        ]
+        return self.section_model.objects.filter(showroom=self.showroom).select_related(*related)
 
-        self._showroom = get_object_or_404(
-            models.Showroom,
-            slug=showroom_slug,
-            owner=self.request.user
-        )
+    def get_paginate_by(self, queryset):
+        # Таблица пагинируется сама (см. get_table)
+        return None
 
-        self._model_name = self.kwargs.get('model_name')
-        if not self._model_name:
-            raise Http404
+    @property
+    def with_statistics(self):
+        return bool(self.request.GET.get('statistics'))
 
-        self._model = statistics_models.get(self._model_name)
-        if not self._model:
-            raise Http404
+    def get_table(self, queryset):
+        extra_columns = []
 
-        return self._model.objects.filter(showroom=self._showroom)
+        if self.with_statistics:
+            queryset = queryset.with_statistics()
+            extra_columns = forms.statistics_columns(self.section_model)
 
-    def get_table(self, queryset):
-        table_class = statistics_models_tables.get(self._model_name)
-        table = table_class(data=queryset)
+        table = self.section_table_class(data=queryset, extra_columns=extra_columns)
+        RequestConfig(self.request, paginate={'per_page': self.paginate_by}).configure(table)
         return table
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        queryset = self.get_queryset()
+        queryset = self.object_list
 
         context['queryset'] = queryset
-        context['statistics'] = queryset.statistics(verbose_names=True)
-        context['model'] = self._model
-        context['model_short'] = self._model_name
-        context['showroom'] = self._showroom
+        context['statistics'] = self.get_statistics(queryset)
+        context['with_statistics'] = self.with_statistics
         context['table'] = self.get_table(queryset)
         return context
 
+    def get_statistics(self, queryset):
+        return queryset.statistics(verbose_names=True, showroom=self.showroom)
 
-class StatisticsListStatView(StatisticsListView):
+
+class StatisticsListStatView(StatisticsPeriodMixin, StatisticsListView):
     template_name = 'showroom/section_statistics.html'
 
+    def get_table(self, queryset):
+        # Страница статистики не выводит таблицу объектов
+        return None
 
-class StatisticsEditView(
+    def get_statistics(self, queryset):
+        return queryset.statistics(verbose_names=True, showroom=self.showroom, **self.period)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_period_context(context['statistics']))
+        return context
+
+
+class StatisticsExportView(
     LoginRequiredMixin,
     EmailVerifiedMixin,
-    TitleContextMixin,
-    UpdateView
+    ShowroomScopeMixin,
+    View
 ):
-    template_name = 'showroom/section_item_edit.html'
-    _model_name = None
-    _showroom = None
+    """
+    Потоковая выгрузка объектов раздела в CSV или JSON Lines.
+    С параметром statistics к каждой строке добавляются statistics_row_fields модели.
+    """
 
-    def get_object(self, queryset=None):
-        showroom_slug = self.kwargs.get('showroom_slug')
-        if not showroom_slug:
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        export_format = self.kwargs.get('export_format')
+        if export_format not in export.export_formats:
             raise Http404
 
-        self._showroom = get_object_or_404(
-            models.Showroom,
-            slug=showroom_slug,
-            owner=self.request.user
+        lines = export.export_lines(
+            self.section_model.objects.filter(showroom=self.showroom),
+            export_format,
+            with_statistics=bool(request.GET.get('statistics')),
+            chunk_size=self.chunk_size
         )
 
-        self._model_name = self.kwargs.get('model_name')
-        if not self._model_name:
-            raise Http404
+        response = StreamingHttpResponse(lines, content_type=export.export_formats[export_format])
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.showroom.slug}-{self.model_name}.{export_format}"'
+        )
+        return response
 
-        model = statistics_models.get(self._model_name)
-        if not model:
-            raise Http404
 
-        self.form_class = statistics_models_forms.get(self._model_name)
+class StatisticsImportView(
+    LoginRequiredMixin,
+    EmailVerifiedMixin,
+    TitleContextMixin,
+    ShowroomScopeMixin,
+    FormView
+):
+    """
+    Массовый импорт объектов раздела из CSV-файла.
+    Строки проверяются правилами формы раздела, правильные строки сохраняются,
+    ошибки остальных строк выводятся на странице.
+    """
 
-        object_slug = self.kwargs.get('object_slug')
-        if not object_slug:
-            raise Http404
+    form_class = forms.StatisticsImportForm
+    template_name = 'showroom/section_import.html'
+    chunk_size = 500
 
-        model_object = model.objects.get(slug=object_slug, showroom=self._showroom)
-        return model_object
+    def form_valid(self, form):
+        created, errors = imports.import_rows(
+            self.showroom,
+            self.section_form_class,
+            imports.read_csv(form.cleaned_data['import_file']),
+            chunk_size=self.chunk_size
+        )
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        model_object = self.get_object()
+        messages.success(self.request, f'Импортировано записей: {created}.')
+        if not errors:
+            return redirect('statistics_list', showroom_slug=self.showroom.slug, model_name=self.model_name)
 
-        context['object'] = model_object
-        context['statistics'] = model_object.statistics()
-        context['model'] = model_object._meta.model
-        context['model_short'] = self._model_name
-        context['showroom'] = self._showroom
-        return context
+        return self.render_to_response(self.get_context_data(form=form, created=created, import_errors=errors))
 
 
-class StatisticsCreateView(
+class StatisticsEditView(
     LoginRequiredMixin,
     EmailVerifiedMixin,
     TitleContextMixin,
-    CreateView
+    ShowroomScopeMixin,
+    ConcurrentUpdateMixin,
+    UpdateView
 ):
-    template_name = 'showroom/section_item_create.html'
-    _model_name = None
-    _showroom = None
+    template_name = 'showroom/section_item_edit.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        showroom_slug = self.kwargs.get('showroom_slug')
-        if not showroom_slug:
-            raise Http404
+    def get_object(self, queryset=None):
+        return self.section_object
 
-        self._showroom = get_object_or_404(
-            models.Showroom,
-            slug=showroom_slug,
-            owner=self.request.user
-        )
+    def get_form_class(self):
+        return self.section_form_class
 
-        self._model_name = self.kwargs.get('model_name')
-        if not self._model_name:
-            raise Http404
+    def get_success_url(self):
+        return reverse_lazy('statistics_detail', kwargs={
+            'showroom_slug': self.showroom.slug,
+            'model_name': self.model_name,
+            'object_slug': self.object.slug
+        })
 
-        model = statistics_models.get(self._model_name)
-        if not model:
-            raise Http404
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['statistics'] = self.object.statistics()
+        return context
 
-        self.model = model
-        self.form_class = statistics_models_forms.get(self._model_name)
 
-        return super().dispatch(request, *args, **kwargs)
+class StatisticsCreateView(
+    LoginRequiredMixin,
+    EmailVerifiedMixin,
+    TitleContextMixin,
+    ShowroomScopeMixin,
+    CreateView
+):
+    template_name = 'showroom/section_item_add.html'
+
+    def get_form_class(self):
+        return self.section_form_class
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['object'] = None
-        context['model'] = self.model
-        context['model_short'] = self._model_name
-        context['showroom'] = self._showroom
         return context
 
     def form_valid(self, form):
-        form.instance.showroom = self._showroom
+        form.instance.showroom = self.showroom
         return super().form_valid(form)
 
 
@@ -270,84 +451,120 @@ class StatisticsDeleteView(
     LoginRequiredMixin,
     EmailVerifiedMixin,
     TitleContextMixin,
+    ShowroomScopeMixin,
     DeleteView
 ):
     template_name = 'showroom/section_item_delete.html'
-    _model_name = None
-    _showroom = None
 
     def get_object(self, queryset=None):
-        showroom_slug = self.kwargs.get('showroom_slug')
-        if not showroom_slug:
-            raise Http404
+        return self.section_object
 
-        self._showroom = get_object_or_404(
-            models.Showroom,
-            slug=showroom_slug,
-            owner=self.request.user
-        )
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['statistics'] = self.object.statistics()
+        return context
 
-        self._model_name = self.kwargs.get('model_name')
-        if not self._model_name:
-            raise Http404
 
-        model = statistics_models.get(self._model_name)
-        if not model:
-            raise Http404
+class ShowroomDetailView(
+    LoginRequiredMixin,
+    EmailVerifiedMixin,
+    TitleContextMixin,
+    ShowroomConditionalPageMixin,
+    StatisticsPeriodMixin,
+    DetailView,
+):
 
-        object_slug = self.kwargs.get('object_slug')
-        if not object_slug:
-            raise Http404
+    model = models.Showroom
+    template_name = 'showroom/showroom_detail.html'
 
-        model_object = model.objects.get(slug=object_slug, showroom=self._showroom)
-        return model_object
+    def get_object(self, queryset=None):
+        return self.showroom
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        model_object = self.get_object()
+        dashboard = load_dashboard(self.object, statistics_models)
+
+        context['statistics_models'] = statistics_models
+        context['statistics'] = dashboard['statistics']
+        context['dashboard_sections'] = dashboard['sections']
 
-        context['object'] = model_object
-        context['statistics'] = model_object.statistics()
-        context['model'] = model_object._meta.model
-        context['model_short'] = self._model_name
-        context['showroom'] = self._showroom
+        if any(self.period.values()):
+            context['statistics'] = self.object.statistics(verbose_names=True, **self.period)
+        context.update(self.get_period_context(context['statistics']))
         return context
 
 
-class ShowroomDetailView(
+class ShowroomLeaderboardView(
     LoginRequiredMixin,
     EmailVerifiedMixin,
     TitleContextMixin,
+    ShowroomScopeMixin,
     DetailView,
 ):
+    """
+    Страница с рейтингами лучших объектов каждого раздела автосалона
+    """
 
     model = models.Showroom
-    template_name = 'showroom/showroom_detail.html'
+    template_name = 'showroom/showroom_leaderboards.html'
+    leaderboard_size = 10
 
     def get_object(self, queryset=None):
-        return get_object_or_404(self.model, slug=self.kwargs.get("showroom_slug"))
+        return self.showroom
 
-    def dispatch(self, request, *args, **kwargs):
-        user = request.user
-        model_object = self.get_object()
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['leaderboards'] = load_leaderboards(
+            self.object,
+            statistics_models,
+            self.leaderboard_size
+        )
+        return context
 
-        if user.pk != model_object.owner.pk:
-            raise Http404
 
-        return super().dispatch(request, *args, **kwargs)
+class SupplyReceiveView(
+    LoginRequiredMixin,
+    EmailVerifiedMixin,
+    TitleContextMixin,
+    ShowroomScopeMixin,
+    FormView
+):
+    """
+    Страница приема накладной поставки дилера
+    """
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        object = self.model.objects.filter(pk=self.get_object().pk)
+    form_class = forms.SupplyManifestForm
+    template_name = 'showroom/supply_receive.html'
+    title = 'Прием поставки'
 
-        context['statistics_models'] = statistics_models
-        context['statistics'] = object.statistics(verbose_names=True)
-        return context
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['showroom'] = self.showroom
+        return kwargs
+
+    def get_success_url(self):
+        return reverse_lazy('showroom_detail', kwargs={'showroom_slug': self.showroom.slug})
+
+    def form_valid(self, form):
+        try:
+            _, received = services.receive_supply(
+                self.showroom,
+                form.cleaned_data['dealer'],
+                form.manifest_lines()
+            )
+        except ValidationError as error:
+            for message in error.messages:
+                form.add_error(None, message)
+            return self.form_invalid(form)
+
+        messages.success(self.request, f'Поставка принята, позиций: {received}.')
+        return super().form_valid(form)
 
 
 class ShowroomDeleteView(
     LoginRequiredMixin,
     EmailVerifiedMixin,
+    ShowroomScopeMixin,
     DeleteView
 ):
     """
@@ -360,12 +577,14 @@ class ShowroomDeleteView(
     success_url = reverse_lazy('showroom_list')
 
     def get_object(self, queryset=None):
-        return get_object_or_404(self.model, slug=self.kwargs.get("showroom_slug"))
+        return self.showroom
 
 
 class ShowroomEditView(
     LoginRequiredMixin,
     EmailVerifiedMixin,
+    ShowroomScopeMixin,
+    ConcurrentUpdateMixin,
     UpdateView
 ):
     """
@@ -375,12 +594,12 @@ class ShowroomEditView(
     form_class = forms.ShowroomForm
     template_name = 'showroom/showroom_edit.html'
     model = models.Showroom
-    success_url = None
 
     def get_object(self, queryset=None):
-        model_object = get_object_or_404(self.model, slug=self.kwargs.get("showroom_slug"))
-        self.success_url = reverse_lazy('showroom_detail', kwargs={'showroom_slug': model_object.slug})
-        return model_object
+        return self.showroom
+
+    def get_success_url(self):
+        return reverse_lazy('showroom_detail', kwargs={'showroom_slug': self.object.slug})
 
 
 class ShowroomCreateView(